@@ -1,126 +1,374 @@
 import os
-import joblib
+import time
+import logging
+import threading
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import IsolationForest
-from xgboost import XGBClassifier
-from ai_engine.feature_engineering import build_features
-from data_layer.collectors.blockchain_fetcher import get_blockchain_data
-from data_layer.collectors.mock_custodian import get_custodian_data
-from data_layer.collectors.exchange_fetcher import get_exchange_data
+from ai_engine.feature_engineering import FEATURE_COLUMNS, FEATURE_INDEX, build_feature_array
+from ai_engine.model_store import ModelSet, ModelStore
+from ai_engine.streaming_detector import HalfSpaceTrees
+from data_layer.collectors.runner import COLLECTOR_RUNNER
 
 
 MODEL_DIR = "models"
-ISO_PATH = os.path.join(MODEL_DIR, "iso_model.pkl")
-XGB_PATH = os.path.join(MODEL_DIR, "xgb_model.pkl")
+STREAM_CHECKPOINT_FILE = "stream_checkpoint.npz"
 
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+logger = logging.getLogger(__name__)
+
+
+def _risk_label(risk_score: int) -> str:
+    if risk_score > 70:
+        return "RISKY"
+    if risk_score > 40:
+        return "WARNING"
+    return "SAFE"
+
+
+class BatchAnalysis:
+    """
+    Columnar result of AnomalyEngine.analyze_batch.
+
+    ``risk_score``, ``label`` and every entry of ``explanation`` are arrays
+    with one element per scored row. Indexing returns the per-row dict that
+    analyze_snapshot has always returned (without ``raw_features``).
+    """
+
+    def __init__(self, risk_score: np.ndarray, label: np.ndarray, explanation: dict):
+        self.risk_score = risk_score
+        self.label = label
+        self.explanation = explanation
+
+    def __len__(self):
+        return len(self.risk_score)
+
+    def __getitem__(self, i: int) -> dict:
+        return {
+            "risk_score": int(self.risk_score[i]),
+            "label": str(self.label[i]),
+            "explanation": {
+                "anomaly_flag": int(self.explanation["anomaly_flag"][i]),
+                "risk_class": int(self.explanation["risk_class"][i]),
+                "risk_probability": float(self.explanation["risk_probability"][i]),
+                "diff": float(self.explanation["diff"][i]),
+                "reserve_supply_ratio": float(self.explanation["reserve_supply_ratio"][i]),
+                "delta_reserves": float(self.explanation["delta_reserves"][i]),
+                "delta_supply": float(self.explanation["delta_supply"][i]),
+            },
+        }
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def to_dicts(self) -> list:
+        return list(self)
 
 
 class AnomalyEngine:
-    def __init__(self):
-        self.iso = None
-        self.xgb = None
-        self._load_models()
+    """
+    Risk scoring engine.
+
+    Models (and joblib/sklearn/xgboost with them) are loaded on first use,
+    not at construction, so importing this module stays cheap. Call
+    ``warmup()`` to pay that cost up front instead of on the first request.
+
+    With ``use_compiled`` the engine scores with the library-free models from
+    ai_engine.tree_compiler whenever a version has them.
+
+    The active models live in one ModelSet. A reload builds a new ModelSet
+    off the request path and swaps it in with a single assignment, so a
+    scoring call always sees a consistent iso/xgb pair.
+
+    Next to the batch-trained models, ``observe()`` feeds live snapshots to
+    a streaming HalfSpaceTrees detector that adapts between retrains. Its
+    state is checkpointed to ``stream_checkpoint.npz`` in the model dir.
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR, use_compiled: bool = False):
+        self.store = ModelStore(model_dir)
+        self.use_compiled = use_compiled
+        self._models = ModelSet()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_stop = threading.Event()
+
+        self.stream = None
+        self.stream_checkpoint_every = 50
+        self._stream_prev = None
+        self._stream_updates = 0
+        self._stream_lock = threading.Lock()
+
+    @property
+    def iso(self):
+        return self._models.iso
+
+    @iso.setter
+    def iso(self, model):
+        self._models = ModelSet(model, self._models.xgb)
+
+    @property
+    def xgb(self):
+        return self._models.xgb
+
+    @xgb.setter
+    def xgb(self, model):
+        self._models = ModelSet(self._models.iso, model)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._load_models()
+                self._loaded = True
 
     def _load_models(self):
-        if os.path.exists(ISO_PATH):
-            self.iso = joblib.load(ISO_PATH)
+        self._models = self.store.load(compiled=self.use_compiled)
+
+    def warmup(self):
+        """Load the models and run one dummy prediction through them."""
+        self._ensure_loaded()
+        self.analyze_batch(np.zeros((1, len(FEATURE_COLUMNS))))
+
+    def model_info(self) -> dict:
+        """Version and load time of the active models (does not load them)."""
+        return self._models.info()
+
+    def model_version(self):
+        """Version the engine scores with, loading the models if needed."""
+        self._ensure_loaded()
+        return self._models.version
 
-        if os.path.exists(XGB_PATH):
-            self.xgb = joblib.load(XGB_PATH)
+    def reload_if_changed(self) -> bool:
+        """Swap in the store's current version if it differs from the active one."""
+        with self._load_lock:
+            version = self.store.current_version()
+            if version == self._models.version:
+                return False
+            models = self.store.load(version, compiled=self.use_compiled)
+            self._models = models
+            self._loaded = True
 
+        logger.info("Loaded model version %s", version)
+        return True
 
+    def start_watcher(self, interval: float = 30.0):
+        """Poll the model store in a daemon thread and hot-swap new versions."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._watcher_stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._watcher.start()
 
-    def _save_models(self):
-        if self.iso is not None:
-            joblib.dump(self.iso, ISO_PATH)
+    def stop_watcher(self):
+        self._watcher_stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
 
-        if self.xgb is not None:
-            joblib.dump(self.xgb, XGB_PATH)
+    def _watch(self, interval: float):
+        while not self._watcher_stop.wait(interval):
+            # Nothing to swap until something has been loaded lazily
+            if not self._loaded:
+                continue
+            try:
+                self.reload_if_changed()
+            except Exception:
+                logger.exception("Model reload failed; keeping version %s", self._models.version)
+
+    @property
+    def stream_checkpoint_path(self) -> str:
+        return os.path.join(self.store.root, STREAM_CHECKPOINT_FILE)
+
+    def _ensure_stream(self):
+        if self.stream is not None:
+            return
+        if os.path.exists(self.stream_checkpoint_path):
+            self.stream, meta = HalfSpaceTrees.load(self.stream_checkpoint_path)
+            self._stream_prev = meta.get("prev_snapshot")
+        else:
+            self.stream = HalfSpaceTrees(n_features=len(FEATURE_COLUMNS))
+
+    def last_observed(self):
+        """Delta fields of the last snapshot passed to observe(), or None."""
+        with self._stream_lock:
+            self._ensure_stream()
+            return self._stream_prev
+
+    def observe(self, snapshot: dict, prev_snapshot=None, learn: bool = True) -> dict:
+        """
+        Score a snapshot with the streaming detector, then learn from it.
+
+        Without ``prev_snapshot`` the deltas are taken against the last
+        observed snapshot. Constant time and memory per call. With
+        ``learn=False`` the snapshot is only scored: the detector's window
+        should follow the collection schedule, not how often someone asks.
+        """
+        with self._stream_lock:
+            self._ensure_stream()
+            if prev_snapshot is None:
+                prev_snapshot = self._stream_prev
+
+            x = build_feature_array(snapshot, prev_snapshot)
+            score = self.stream.score_one(x)
+            if not learn:
+                return {
+                    "stream_anomaly_score": score,
+                    "stream_anomaly_flag": int(self.stream.is_anomaly(score)),
+                }
+            self.stream.learn_one(x)
+
+            self._stream_prev = {
+                key: float(snapshot[key]) for key in ("reserves", "supply", "price") if key in snapshot
+            }
+            self._stream_updates += 1
+            if self.stream_checkpoint_every and self._stream_updates % self.stream_checkpoint_every == 0:
+                self._save_stream()
+
+            return {
+                "stream_anomaly_score": score,
+                "stream_anomaly_flag": int(self.stream.is_anomaly(score)),
+            }
+
+    def save_stream_checkpoint(self):
+        with self._stream_lock:
+            if self.stream is not None:
+                self._save_stream()
+
+    def _save_stream(self):
+        os.makedirs(self.store.root, exist_ok=True)
+        self.stream.save(self.stream_checkpoint_path, meta={"prev_snapshot": self._stream_prev})
 
     def train(self, df_features: pd.DataFrame, labels=None):
-        self.iso = IsolationForest(
+        from sklearn.ensemble import IsolationForest
+        from xgboost import XGBClassifier
+
+        iso = IsolationForest(
             contamination=0.05,
             random_state=42
         )
-        self.iso.fit(df_features.values)
+        iso.fit(df_features.values)
 
         if labels is not None:
-            self.xgb = XGBClassifier(
+            xgb = XGBClassifier(
                 eval_metric="logloss",
                 use_label_encoder=False
             )
-            self.xgb.fit(df_features.values, labels)
+            xgb.fit(df_features.values, labels)
+        else:
+            # Unsupervised retrain keeps the current classifier
+            self._ensure_loaded()
+            xgb = self.xgb
 
-        self._save_models()
+        with self._load_lock:
+            version = self.store.publish(iso, xgb)
+            self._models = ModelSet(iso, xgb, version=version, loaded_at=time.time())
+            self._loaded = True
 
-    def analyze_snapshot(self, snapshot: dict, prev_snapshot=None):
-        feats = build_features(snapshot, prev_snapshot)
-        X = feats.values
-        anomaly_flag = 0
-        if self.iso is not None:
-            iso_pred = self.iso.predict(X)[0]    
-            anomaly_flag = 1 if iso_pred == -1 else 0
+    def analyze_snapshot(self, snapshot: dict, prev_snapshot=None, include_raw_features=True):
+        """
+        Score a single snapshot.
 
+        Features are built straight into a float64 array, so no DataFrame is
+        created on this path. Pass ``include_raw_features=False`` when the
+        caller does not need the ``raw_features`` dict.
+        """
+        x = build_feature_array(snapshot, prev_snapshot)
+        result = self.analyze_batch(x.reshape(1, -1))[0]
+        if include_raw_features:
+            result["raw_features"] = dict(zip(FEATURE_COLUMNS, x.tolist()))
+        return result
 
-        risk_prob = 0.0
-        risk_class = 0
+    def analyze_features(self, feats: pd.DataFrame):
+        """Score a one-row frame of already engineered features."""
+        result = self.analyze_batch(feats)[0]
+        result["raw_features"] = feats.to_dict(orient="records")[0]
+        return result
 
-        if self.xgb is not None:
-            risk_class = int(self.xgb.predict(X)[0])
+    def analyze_batch(self, features_matrix) -> "BatchAnalysis":
+        """
+        Score every row of a feature frame with one call per model.
 
-            if hasattr(self.xgb, "predict_proba"):
-                risk_prob = float(self.xgb.predict_proba(X)[0][1])
-        else:
-            diff = feats["diff"].iloc[0]
-            ratio = feats["reserve_supply_ratio"].iloc[0]
+        The risk class is taken as the argmax of ``predict_proba``, which is
+        what ``XGBClassifier.predict`` does, so a separate predict call is
+        not needed.
 
-            if diff > 50 or ratio < 1.0:
-                risk_prob = 0.8
-                risk_class = 1
-            else:
-                risk_prob = 0.2
-                risk_class = 0
+        Args:
+            features_matrix: Engineered features in FEATURE_COLUMNS order,
+                either a DataFrame from build_features_batch or a 2-D array
 
+        Returns:
+            BatchAnalysis with one entry per row
+        """
+        self._ensure_loaded()
+        models = self._models
 
-        risk_score = int(risk_prob * 100 + anomaly_flag * 20)
+        X = np.asarray(features_matrix, dtype=np.float64)
+        n_rows = X.shape[0]
 
-        label = "SAFE"
-        if risk_score > 70:
-            label = "RISKY"
-        elif risk_score > 40:
-            label = "WARNING"
+        anomaly_flag = np.zeros(n_rows, dtype=int)
+        if models.iso is not None and n_rows:
+            anomaly_flag = (models.iso.predict(X) == -1).astype(int)
 
-        return {
-            "risk_score": risk_score,
-            "label": label,
-            "explanation": {
+        diff = X[:, FEATURE_INDEX["diff"]]
+        ratio = X[:, FEATURE_INDEX["reserve_supply_ratio"]]
+
+        if models.xgb is not None and n_rows:
+            proba = models.xgb.predict_proba(X)
+            risk_class = proba.argmax(axis=1).astype(int)
+            risk_prob = proba[:, 1].astype(np.float64)
+        else:
+            risky = (diff > 50) | (ratio < 1.0)
+            risk_class = risky.astype(int)
+            risk_prob = np.where(risky, 0.8, 0.2)
+
+        risk_score = (risk_prob * 100 + anomaly_flag * 20).astype(int)
+
+        # Same thresholds as _risk_label
+        label = np.full(n_rows, "SAFE", dtype=object)
+        label[risk_score > 40] = "WARNING"
+        label[risk_score > 70] = "RISKY"
+
+        return BatchAnalysis(
+            risk_score=risk_score,
+            label=label,
+            explanation={
                 "anomaly_flag": anomaly_flag,
                 "risk_class": risk_class,
                 "risk_probability": risk_prob,
-                "diff": float(feats["diff"].iloc[0]),
-                "reserve_supply_ratio": float(feats["reserve_supply_ratio"].iloc[0]),
-                "delta_reserves": float(feats["delta_reserves"].iloc[0]),
-                "delta_supply": float(feats["delta_supply"].iloc[0]),
+                "diff": diff,
+                "reserve_supply_ratio": ratio,
+                "delta_reserves": X[:, FEATURE_INDEX["delta_reserves"]],
+                "delta_supply": X[:, FEATURE_INDEX["delta_supply"]],
             },
-            "raw_features": feats.to_dict(orient="records")[0]
-        }
-
+        )
 
     def analyze_live(self):
-        chain = get_blockchain_data()
-        cust = get_custodian_data()
-        exch = get_exchange_data()
-
-        snapshot = {
-            "reserves": cust.get("totalReserves", 0),
-            "supply": chain.get("circulatingSupply", 0),
-            "whale_supply": chain.get("whale_supply", 0),
-            "price": exch.get("price", 1.0)
-        }
+        # All sources at once; slow ones fall back to their last result, and
+        # a source with no recent data at all is an error, not a default value
+        collected = COLLECTOR_RUNNER.collect().require()
+        snapshot = collected.snapshot()
+        del snapshot["custodians"]  # live scoring has never used the breakdown
+        price_age_s = snapshot.pop("price_age_s")
+        price_spread_bps = snapshot.pop("price_spread_bps")
+
+        prev = self.last_observed()
+        result = self.analyze_snapshot(snapshot, prev)
+
+        # The streaming detector can flag drift the batch-trained forest misses;
+        # it learns only from collected snapshots (collect_snapshot / the daemon)
+        explanation = result["explanation"]
+        explanation.update(self.observe(snapshot, prev, learn=False))
+        if explanation["stream_anomaly_flag"] and not explanation["anomaly_flag"]:
+            explanation["anomaly_flag"] = 1
+            result["risk_score"] += 20
+            result["label"] = _risk_label(result["risk_score"])
 
-        return self.analyze_snapshot(snapshot)
+        result["sources"] = collected.sources
+        result["price_age_s"] = price_age_s
+        result["price_spread_bps"] = price_spread_bps
+        return result
 
 ENGINE = AnomalyEngine()
@@ -0,0 +1,369 @@
+"""
+Multi-asset monitoring.
+
+``AssetRegistry`` holds one ``AssetConfig`` per stablecoin: its collector
+sources, price venues / feed symbol and model directory. ``ModelCache``
+keeps the AnomalyEngine of each model directory loaded in an LRU bounded by
+the models' size, so dozens of assets do not all hold models in memory.
+
+``AssetMonitor.score`` is one scheduler tick: every asset's sources are
+fetched in a single CollectorRunner call (one deadline for all of them),
+features are built for all assets in one frame, and each model set scores
+its assets with one ``analyze_batch`` call. Each asset also keeps a
+``RollingFeatureState``, so its EWMA mean/std/z-score per signal and
+window is updated in O(1) per tick and reported with its score.
+"""
+
+import importlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ai_engine.anomaly_detector import ENGINE, MODEL_DIR, AnomalyEngine
+from ai_engine.feature_engineering import build_features_batch
+from ai_engine.rolling_state import DEFAULT_WINDOWS, RollingFeatureState
+from data_layer.collectors.exchange_fetcher import DEFAULT_VENUES, exchange_source
+from data_layer.collectors.runner import COLLECTOR_RUNNER, DEFAULT_SOURCES, CollectionResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ASSET = "USDC"
+# Price venues and the default feed symbol quote against this
+QUOTE_CURRENCY = "USD"
+# The built-in collectors for these read USDC's supply and reserves, so other
+# assets must bring their own
+ASSET_SPECIFIC_SOURCES = ("chain", "custodian")
+
+
+def load_callable(path: str) -> Callable:
+    """Resolve ``"package.module:function"`` to the function."""
+    module_name, _, attr = path.partition(":")
+    if not attr:
+        raise ValueError(f"Expected 'module:function', got {path!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+class AssetConfig:
+    """
+    How to collect and score one asset.
+
+    The default asset uses the built-in chain, custodian and exchange
+    collectors under their plain names, so on the shared COLLECTOR_RUNNER it
+    reuses ``ENGINE.analyze_live``'s in-flight and last good results. Other
+    assets must configure their own ``chain`` and ``custodian`` sources (the
+    built-in ones report USDC's figures); their exchange source defaults to
+    quoting ``asset_id`` against USD on ``venues`` and all their sources are
+    named ``"<asset>:<source>"``. ``feed_symbol`` defaults to
+    ``"<asset>USD"``.
+    """
+
+    def __init__(self, asset_id: str, model_dir: str = MODEL_DIR,
+                 venues: Sequence[str] = DEFAULT_VENUES, feed_symbol: Optional[str] = None,
+                 sources: Optional[Dict[str, Callable[[], dict]]] = None):
+        self.asset_id = asset_id.upper()
+        self.model_dir = model_dir
+        self.venues = list(venues)
+
+        if feed_symbol is None and self.asset_id == QUOTE_CURRENCY:
+            raise ValueError(f"{self.asset_id}: feed_symbol is required")
+        self.feed_symbol = (feed_symbol or f"{self.asset_id}{QUOTE_CURRENCY}").upper()
+        if self.feed_symbol == self.asset_id * 2:
+            raise ValueError(f"{self.asset_id}: feed_symbol {self.feed_symbol} quotes the asset against itself")
+
+        if self.asset_id != DEFAULT_ASSET:
+            missing = [name for name in ASSET_SPECIFIC_SOURCES if name not in (sources or {})]
+            if missing:
+                raise ValueError(
+                    f"{self.asset_id}: configure its own {' and '.join(missing)} source(s); "
+                    f"the built-in ones report {DEFAULT_ASSET}'s supply and reserves"
+                )
+
+        collectors = dict(DEFAULT_SOURCES)
+        if self.asset_id != DEFAULT_ASSET:
+            collectors["exchange"] = exchange_source(self.asset_id, self.venues, self.feed_symbol)
+        collectors.update(sources or {})
+
+        prefix = "" if self.asset_id == DEFAULT_ASSET else f"{self.asset_id}:"
+        self.sources = {prefix + name: fetch for name, fetch in collectors.items()}
+        self._short_names = {prefix + name: name for name in collectors}
+
+    @classmethod
+    def from_dict(cls, entry: Dict[str, Any]) -> "AssetConfig":
+        asset_id = entry["id"]
+        return cls(
+            asset_id,
+            model_dir=entry.get("model_dir", MODEL_DIR),
+            venues=entry.get("venues", DEFAULT_VENUES),
+            feed_symbol=entry.get("feed_symbol"),
+            sources={name: load_callable(path) for name, path in entry.get("sources", {}).items()},
+        )
+
+    def result_from(self, collected: CollectionResult) -> CollectionResult:
+        """This asset's part of a multi-asset collection, under the plain source names."""
+        return CollectionResult(
+            {short: collected.data[name] for name, short in self._short_names.items()},
+            {short: collected.sources[name] for name, short in self._short_names.items()},
+        )
+
+
+class AssetRegistry:
+    """Ordered map of asset ID -> AssetConfig; always contains the default asset."""
+
+    def __init__(self, assets: Iterable[AssetConfig] = ()):
+        self._assets: Dict[str, AssetConfig] = {DEFAULT_ASSET: AssetConfig(DEFAULT_ASSET)}
+        for asset in assets:
+            self.register(asset)
+
+    @classmethod
+    def from_file(cls, path: str) -> "AssetRegistry":
+        """
+        Registry from a JSON list of assets, e.g.::
+
+            [{"id": "USDT", "model_dir": "models/assets/USDT",
+              "venues": ["kraken", "coinbase"], "feed_symbol": "USDTUSD",
+              "sources": {"chain": "my_collectors.usdt:get_supply",
+                          "custodian": "my_collectors.usdt:get_reserves"}}]
+        """
+        with open(path, "r") as f:
+            entries = json.load(f)
+        return cls(AssetConfig.from_dict(entry) for entry in entries)
+
+    def register(self, asset: AssetConfig):
+        self._assets[asset.asset_id] = asset
+
+    def get(self, asset_id: str) -> AssetConfig:
+        try:
+            return self._assets[asset_id.upper()]
+        except KeyError:
+            raise KeyError(f"Unknown asset: {asset_id}") from None
+
+    def __contains__(self, asset_id: str) -> bool:
+        return asset_id.upper() in self._assets
+
+    def __iter__(self):
+        return iter(self._assets.values())
+
+    def __len__(self):
+        return len(self._assets)
+
+    def ids(self) -> List[str]:
+        return list(self._assets)
+
+
+class ModelCache:
+    """
+    LRU of loaded AnomalyEngines keyed by model directory.
+
+    Each entry is charged the size of its model files (see
+    ModelStore.size_bytes); least recently used engines are dropped once
+    the total exceeds ``max_bytes``. The most recent entry is always kept,
+    and ``pinned`` engines (the process-wide ENGINE) are neither charged
+    nor evicted.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, use_compiled: bool = False,
+                 pinned: Optional[Dict[str, AnomalyEngine]] = None):
+        self.max_bytes = int(max_bytes)
+        self.use_compiled = use_compiled
+        self.pinned = dict(pinned or {})
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_dir: str) -> AnomalyEngine:
+        if model_dir in self.pinned:
+            return self.pinned[model_dir]
+
+        with self._lock:
+            entry = self._entries.get(model_dir)
+            if entry is not None:
+                self._entries.move_to_end(model_dir)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Load outside the lock so one slow load does not block cached assets
+        engine = AnomalyEngine(model_dir, use_compiled=self.use_compiled)
+        size = engine.store.size_bytes(engine.model_version(), compiled=self.use_compiled)
+
+        with self._lock:
+            entry = self._entries.get(model_dir)
+            if entry is not None:
+                # Another thread loaded it meanwhile; keep theirs
+                return entry[0]
+            self._entries[model_dir] = (engine, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_dir, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+                logger.info("Evicted models of %s from the model cache", evicted_dir)
+        return engine
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class AssetMonitor:
+    """
+    Scores every registered asset per tick, on demand or on a schedule.
+
+    With an ``entity_store`` each asset's deltas are taken against its own
+    last scored snapshot (entity ID = asset ID). Every scored snapshot is
+    folded into the asset's rolling state (``rolling_windows``, in ticks),
+    and the result carries its rolling features under ``rolling``.
+    """
+
+    def __init__(self, registry: AssetRegistry, models: Optional[ModelCache] = None,
+                 runner=COLLECTOR_RUNNER, entity_store=None,
+                 rolling_windows: Sequence[int] = DEFAULT_WINDOWS):
+        self.registry = registry
+        self.models = models or ModelCache(pinned={MODEL_DIR: ENGINE})
+        self.runner = runner
+        self.entity_store = entity_store
+        self.rolling_windows = tuple(rolling_windows)
+
+        self._rolling: Dict[str, RollingFeatureState] = {}
+        self._rolling_lock = threading.Lock()
+
+        self._latest: Dict[str, dict] = {}
+        self._latest_lock = threading.Lock()
+        self.last_tick_at = None
+        self.last_tick_ms = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def engine_for(self, asset_id: str) -> AnomalyEngine:
+        return self.models.get(self.registry.get(asset_id).model_dir)
+
+    def score(self, asset_ids: Optional[Sequence[str]] = None) -> Dict[str, dict]:
+        """
+        Collect and score the given assets (default: all) in one pass.
+
+        An asset with a source that has no recent data is not scored; its
+        entry carries ``error`` and ``missing_sources`` instead.
+        """
+        start = time.perf_counter()
+        assets = [self.registry.get(a) for a in asset_ids] if asset_ids else list(self.registry)
+
+        sources = {}
+        for asset in assets:
+            sources.update(asset.sources)
+        collected = self.runner.collect(sources)
+
+        results = {}
+        rows = []
+        meta = []
+        scored = []
+        for asset in assets:
+            own = asset.result_from(collected)
+            if own.missing_sources:
+                # Nothing recent to score; report it instead of scoring defaults
+                results[asset.asset_id] = {
+                    "asset": asset.asset_id,
+                    "error": "no data from: " + ", ".join(own.missing_sources),
+                    "missing_sources": own.missing_sources,
+                    "sources": own.sources,
+                }
+                continue
+            snapshot = own.snapshot()
+            del snapshot["custodians"]
+            meta.append({
+                "price_age_s": snapshot.pop("price_age_s"),
+                "price_spread_bps": snapshot.pop("price_spread_bps"),
+                "sources": own.sources,
+            })
+            snapshot["asset"] = asset.asset_id
+            rows.append(snapshot)
+            scored.append(asset)
+
+        if rows:
+            frame = pd.DataFrame(rows)
+            if self.entity_store is not None:
+                frame = self.entity_store.with_previous(frame, "asset")
+            features = build_features_batch(frame, group_by="asset")
+
+            # One analyze_batch per model set, over all of its assets
+            by_model_dir: Dict[str, List[int]] = {}
+            for i, asset in enumerate(scored):
+                by_model_dir.setdefault(asset.model_dir, []).append(i)
+
+            for model_dir, positions in by_model_dir.items():
+                analysis = self.models.get(model_dir).analyze_batch(features.iloc[positions])
+                for j, i in enumerate(positions):
+                    results[scored[i].asset_id] = {"asset": scored[i].asset_id, **analysis[j], **meta[i]}
+
+            with self._rolling_lock:
+                for asset, snapshot in zip(scored, rows):
+                    state = self._rolling.get(asset.asset_id)
+                    if state is None:
+                        state = self._rolling[asset.asset_id] = RollingFeatureState(self.rolling_windows)
+                    rolling = state.update(snapshot)
+                    results[asset.asset_id]["rolling"] = {
+                        name: value if np.isfinite(value) else 0.0 for name, value in rolling.items()
+                    }
+
+            if self.entity_store is not None:
+                self.entity_store.put_many(rows, "asset")
+
+        with self._latest_lock:
+            self._latest.update(results)
+            self.last_tick_at = time.time()
+            self.last_tick_ms = (time.perf_counter() - start) * 1000.0
+        return results
+
+    def latest(self) -> Dict[str, dict]:
+        """Results of the most recent tick per asset (empty before the first)."""
+        with self._latest_lock:
+            return dict(self._latest)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "assets": len(self.registry),
+            "scheduled": self._thread is not None and self._thread.is_alive(),
+            "last_tick_at": self.last_tick_at,
+            "last_tick_ms": self.last_tick_ms,
+            "models": self.models.stats(),
+        }
+
+    def start(self, interval: float):
+        """Score all assets every ``interval`` seconds in a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,),
+                                        name="asset-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float):
+        while True:
+            try:
+                self.score()
+            except Exception:
+                logger.exception("Asset scoring tick failed")
+            if self._stop.wait(interval):
+                break
@@ -0,0 +1,149 @@
+"""
+Micro-batching in front of AnomalyEngine.
+
+Concurrent callers of ``RequestCoalescer.submit`` are gathered for up to
+``max_wait_ms`` (or until ``max_batch_size`` requests are waiting), scored
+with a single ``analyze_batch`` call, and each caller gets its own result.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ai_engine.feature_engineering import FEATURE_COLUMNS, build_feature_array
+
+_STOP = object()
+
+
+class _Pending:
+    __slots__ = ("snapshot", "prev_snapshot", "include_raw_features", "enqueued_at", "future")
+
+    def __init__(self, snapshot, prev_snapshot, include_raw_features):
+        self.snapshot = snapshot
+        self.prev_snapshot = prev_snapshot
+        self.include_raw_features = include_raw_features
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+
+
+class RequestCoalescer:
+    def __init__(self, engine, max_wait_ms: float = 2.0, max_batch_size: int = 64):
+        self.engine = engine
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._max_batch_seen = 0
+        self._total_delay = 0.0
+        self._max_delay = 0.0
+
+    def submit(self, snapshot: Dict[str, Any], prev_snapshot: Optional[Dict[str, Any]] = None,
+               include_raw_features: bool = True, timeout: Optional[float] = None) -> dict:
+        """Score one snapshot as part of the next batch; same result as analyze_snapshot."""
+        self._ensure_worker()
+        item = _Pending(snapshot, prev_snapshot, include_raw_features)
+        self._queue.put(item)
+        return item.future.result(timeout)
+
+    def close(self):
+        """Stop the worker after it finishes the requests already queued."""
+        with self._worker_lock:
+            if self._worker is None:
+                return
+            self._queue.put(_STOP)
+            self._worker.join()
+            self._worker = None
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "batches": batches,
+                "requests": self._requests,
+                "avg_batch_size": self._requests / batches if batches else 0.0,
+                "max_batch_size": self._max_batch_seen,
+                "avg_queue_delay_ms": self._total_delay * 1000 / self._requests if self._requests else 0.0,
+                "max_queue_delay_ms": self._max_delay * 1000,
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch = [first]
+            stop = False
+            deadline = first.enqueued_at + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        rows = []
+        ready = []
+        for item in batch:
+            try:
+                rows.append(build_feature_array(item.snapshot, item.prev_snapshot))
+                ready.append(item)
+            except Exception as e:
+                item.future.set_exception(e)
+
+        started = time.monotonic()
+        self._record(batch, started)
+
+        if not ready:
+            return
+
+        try:
+            results = self.engine.analyze_batch(np.vstack(rows))
+        except Exception as e:
+            for item in ready:
+                item.future.set_exception(e)
+            return
+
+        for i, item in enumerate(ready):
+            result = results[i]
+            if item.include_raw_features:
+                result["raw_features"] = dict(zip(FEATURE_COLUMNS, rows[i].tolist()))
+            item.future.set_result(result)
+
+    def _record(self, batch, started: float):
+        delays = [started - item.enqueued_at for item in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+            self._total_delay += sum(delays)
+            self._max_delay = max(self._max_delay, max(delays))
@@ -0,0 +1,161 @@
+"""
+Server-side memory of each entity's last snapshot.
+
+Delta features need the previous snapshot of the *same* asset or company.
+``EntitySnapshotStore`` keeps that per entity ID, bounded by an LRU size
+limit and a TTL, and can persist itself to a JSON file so restarts keep
+the deltas.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Fields of a snapshot that build_features reads from prev_snapshot
+DELTA_FIELDS = ("reserves", "supply", "price")
+
+
+class EntitySnapshotStore:
+    """
+    Thread-safe LRU map of entity ID -> last snapshot's delta fields.
+
+    Entries older than ``ttl_seconds`` are dropped on access (``None``
+    disables the TTL). With a ``path`` the store is loaded at start-up and
+    written back every ``flush_every`` updates and on ``flush()``.
+    """
+
+    def __init__(self, max_entities: int = 10_000, ttl_seconds: Optional[float] = 86_400,
+                 path: Optional[str] = None, flush_every: int = 100):
+        self.max_entities = int(max_entities)
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.flush_every = int(flush_every)
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = 0
+
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, entity_id: str) -> Optional[Dict[str, float]]:
+        """Last snapshot fields for an entity, or None if unknown or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(entity_id)
+            if entry is None:
+                return None
+            fields, stored_at = entry
+            if self._expired(stored_at, now):
+                del self._entries[entity_id]
+                return None
+            self._entries.move_to_end(entity_id)
+            return dict(fields)
+
+    def peek_many(self, entity_ids: Iterable[str]) -> List[Optional[Dict[str, float]]]:
+        """Like ``get`` for each ID, without touching the LRU order or dropping expired entries."""
+        now = time.time()
+        with self._lock:
+            entries = [self._entries.get(entity_id) for entity_id in entity_ids]
+        return [
+            dict(entry[0]) if entry is not None and not self._expired(entry[1], now) else None
+            for entry in entries
+        ]
+
+    def put(self, entity_id: str, snapshot: Dict[str, Any]):
+        """Remember the delta fields of an entity's latest snapshot."""
+        fields = {
+            key: float(snapshot[key]) for key in DELTA_FIELDS
+            if snapshot.get(key) is not None
+        }
+        with self._lock:
+            self._entries[entity_id] = (fields, time.time())
+            self._entries.move_to_end(entity_id)
+            while len(self._entries) > self.max_entities:
+                self._entries.popitem(last=False)
+
+            self._dirty += 1
+            should_flush = self.path and self.flush_every and self._dirty >= self.flush_every
+
+        if should_flush:
+            self.flush()
+
+    def put_many(self, snapshots: Iterable[Dict[str, Any]], key: str):
+        """``put`` every snapshot that has an entity ID under ``key``; the last one wins."""
+        for snapshot in snapshots:
+            entity_id = snapshot.get(key)
+            if entity_id is not None:
+                self.put(str(entity_id), snapshot)
+
+    def with_previous(self, df: pd.DataFrame, key: str) -> pd.DataFrame:
+        """
+        Copy of a snapshot table with ``prev_*`` columns taken from the store.
+
+        Meant for ``build_features_batch(df, group_by=key)``, which only reads
+        ``prev_*`` on the first row of each entity. Rows of unknown entities
+        keep their existing ``prev_*`` value, or none.
+        """
+        df = df.copy()
+        if key not in df.columns:
+            return df
+
+        stored = [self.get(str(entity_id)) if entity_id is not None else None
+                  for entity_id in df[key]]
+        for field in DELTA_FIELDS:
+            column = f"prev_{field}"
+            values = np.array([
+                entry.get(field, np.nan) if entry else np.nan for entry in stored
+            ], dtype=np.float64)
+            if column in df.columns:
+                existing = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+                values = np.where(np.isnan(values), existing, values)
+            elif field in df.columns:
+                # No previous snapshot: fall back to the row itself (zero delta)
+                current = pd.to_numeric(df[field], errors="coerce").to_numpy(dtype=np.float64)
+                values = np.where(np.isnan(values), current, values)
+            df[column] = values
+        return df
+
+    def flush(self):
+        """Write the store to ``path`` (atomically); no-op without a path."""
+        if not self.path:
+            return
+
+        now = time.time()
+        with self._lock:
+            entries = [
+                [entity_id, fields, stored_at]
+                for entity_id, (fields, stored_at) in self._entries.items()
+                if not self._expired(stored_at, now)
+            ]
+            self._dirty = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _load(self):
+        with open(self.path, "r") as f:
+            entries = json.load(f)
+
+        now = time.time()
+        for entity_id, fields, stored_at in entries[-self.max_entities:]:
+            if not self._expired(stored_at, now):
+                self._entries[entity_id] = (fields, stored_at)
@@ -2,8 +2,49 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Any, Optional
 
+from ai_engine.rolling_state import RollingFeatureState
+
+# Fixed column order of the feature vector. Models are trained on this order,
+# so new features must be appended, never inserted.
+FEATURE_COLUMNS = (
+    # Core features
+    "reserves",
+    "supply",
+    "diff",
+    "price",
+    "reserve_supply_ratio",
+    "whale_ratio",
+
+    # Delta features
+    "delta_reserves",
+    "delta_supply",
+    "delta_price",
+
+    # Percentage change features
+    "pct_reserve_change",
+    "pct_supply_change",
+    "pct_price_change",
+
+    # Custodian features
+    "custodian_variance",
+
+    # Equity-specific features
+    "equity_float",
+    "market_cap",
+    "float_ratio",
+    "cash_to_market_cap",
+
+    # Derived features
+    "liquidity_score",
+    "price_volatility",
+)
+
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+
 def build_features(snapshot: Dict[str, Any],
-                   prev_snapshot: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+                   prev_snapshot: Optional[Dict[str, Any]] = None,
+                   rolling_state: Optional[RollingFeatureState] = None) -> pd.DataFrame:
     """
     Build feature set from snapshot data.
     
@@ -14,10 +55,39 @@ def build_features(snapshot: Dict[str, Any],
     Args:
         snapshot: Current snapshot dictionary
         prev_snapshot: Previous snapshot for delta calculations
+        rolling_state: Optional per-stream rolling state; when given, the
+            snapshot is folded into it and its EWMA mean/std/z-score columns
+            are appended after FEATURE_COLUMNS
         
     Returns:
         DataFrame with engineered features
     """
+    features = build_feature_array(snapshot, prev_snapshot)
+    df = pd.DataFrame(features.reshape(1, -1), columns=list(FEATURE_COLUMNS))
+
+    if rolling_state is not None:
+        rolling = rolling_state.update(snapshot)
+        for name, value in rolling.items():
+            df[name] = value if np.isfinite(value) else 0.0
+
+    return df
+
+
+def build_feature_array(snapshot: Dict[str, Any],
+                        prev_snapshot: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """
+    Build the feature vector for one snapshot without going through pandas.
+
+    Same features as ``build_features``, in ``FEATURE_COLUMNS`` order, with
+    infinities and NaNs replaced by 0.
+
+    Args:
+        snapshot: Current snapshot dictionary
+        prev_snapshot: Previous snapshot for delta calculations
+
+    Returns:
+        Contiguous float64 array of shape (len(FEATURE_COLUMNS),)
+    """
     reserves = float(snapshot.get("reserves", 0))
     supply = float(snapshot.get("supply", 0))
     price = float(snapshot.get("price", 1.0))
@@ -65,6 +135,127 @@ def build_features(snapshot: Dict[str, Any],
     # Volatility indicator (if we have price history)
     price_volatility = abs(pct_price_change)
 
+    features = np.array([
+        reserves,
+        supply,
+        diff,
+        price,
+        reserve_supply_ratio,
+        whale_ratio,
+        delta_reserves,
+        delta_supply,
+        delta_price,
+        pct_reserve_change,
+        pct_supply_change,
+        pct_price_change,
+        custodian_variance,
+        equity_float,
+        market_cap,
+        float_ratio,
+        cash_to_market_cap,
+        liquidity_score,
+        price_volatility,
+    ], dtype=np.float64)
+    features[~np.isfinite(features)] = 0.0
+
+    return features
+
+
+def _column(df: pd.DataFrame, name: str, default: float) -> np.ndarray:
+    """Return a column as float64, or a constant column if it is missing."""
+    if name in df.columns:
+        return df[name].to_numpy(dtype=np.float64)
+    return np.full(len(df), default, dtype=np.float64)
+
+
+def _previous(current: np.ndarray, df: pd.DataFrame, prev_column: str,
+              prev_rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Shift a column down by one row (or to ``prev_rows`` when given).
+
+    Rows without a predecessor fall back to their own ``prev_*`` value (or
+    themselves), exactly like ``build_features`` does when called without
+    ``prev_snapshot``.
+    """
+    if prev_rows is None:
+        prev_rows = np.arange(len(current)) - 1
+
+    has_prev = prev_rows >= 0
+    if prev_column in df.columns:
+        fallback = df[prev_column].to_numpy(dtype=np.float64)
+    else:
+        fallback = current
+    return np.where(has_prev, current[np.maximum(prev_rows, 0)], fallback)
+
+
+def _group_prev_rows(df: pd.DataFrame, group_by: str) -> np.ndarray:
+    """Index of the previous row with the same ``group_by`` value, or -1."""
+    positions = pd.Series(np.arange(len(df)), index=df.index)
+    prev_rows = positions.groupby(df[group_by], sort=False).shift(1)
+    return prev_rows.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def build_features_batch(df: pd.DataFrame, group_by: Optional[str] = None) -> pd.DataFrame:
+    """
+    Build the feature set for a whole table of snapshots at once.
+
+    Row ``i`` is treated as the snapshot and row ``i - 1`` as its previous
+    snapshot, so the result is identical to calling ``build_features`` on
+    every row with the preceding row as ``prev_snapshot`` and concatenating
+    the one-row frames - without building a DataFrame per row.
+
+    With ``group_by`` (e.g. ``"company"``) the previous snapshot is the
+    closest earlier row of the same entity instead, so deltas never mix
+    two companies; the first row of each entity uses its ``prev_*`` values.
+
+    Args:
+        df: Snapshot table (one snapshot per row, same keys as the dicts
+            accepted by ``build_features``)
+        group_by: Optional entity column to compute deltas within
+
+    Returns:
+        DataFrame with engineered features, one row per input row
+    """
+    reserves = _column(df, "reserves", 0.0)
+    supply = _column(df, "supply", 0.0)
+    price = _column(df, "price", 1.0)
+    whales = _column(df, "whale_supply", 0.0)
+
+    prev_rows = None
+    if group_by is not None and group_by in df.columns:
+        prev_rows = _group_prev_rows(df, group_by)
+
+    prev_reserves = _previous(reserves, df, "prev_reserves", prev_rows)
+    prev_supply = _previous(supply, df, "prev_supply", prev_rows)
+    prev_price = _previous(price, df, "prev_price", prev_rows)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Core metrics
+        diff = supply - reserves
+        reserve_supply_ratio = reserves / (supply + 1e-9)
+        whale_ratio = whales / (supply + 1e-9)
+
+        # Delta calculations
+        delta_reserves = reserves - prev_reserves
+        delta_supply = supply - prev_supply
+        delta_price = price - prev_price
+
+        # Percentage changes
+        pct_reserve_change = (reserves - prev_reserves) / (np.abs(prev_reserves) + 1e-9)
+        pct_supply_change = (supply - prev_supply) / (np.abs(prev_supply) + 1e-9)
+        pct_price_change = (price - prev_price) / (np.abs(prev_price) + 1e-9)
+
+        liquidity_score = reserve_supply_ratio * price
+        price_volatility = np.abs(pct_price_change)
+
+    # Custodian variance (only list values count, as in build_features)
+    custodian_variance = np.zeros(len(df), dtype=np.float64)
+    if "custodians" in df.columns:
+        custodian_variance = np.array([
+            float(np.var(balances)) if isinstance(balances, list) and len(balances) > 0 else 0.0
+            for balances in df["custodians"]
+        ], dtype=np.float64)
+
     features = {
         # Core features
         "reserves": reserves,
@@ -73,32 +264,32 @@ def build_features(snapshot: Dict[str, Any],
         "price": price,
         "reserve_supply_ratio": reserve_supply_ratio,
         "whale_ratio": whale_ratio,
-        
+
         # Delta features
         "delta_reserves": delta_reserves,
         "delta_supply": delta_supply,
         "delta_price": delta_price,
-        
+
         # Percentage change features
         "pct_reserve_change": pct_reserve_change,
         "pct_supply_change": pct_supply_change,
         "pct_price_change": pct_price_change,
-        
+
         # Custodian features
         "custodian_variance": custodian_variance,
-        
+
         # Equity-specific features
-        "equity_float": equity_float,
-        "market_cap": market_cap,
-        "float_ratio": float_ratio,
-        "cash_to_market_cap": cash_to_market_cap,
-        
+        "equity_float": _column(df, "equity_float", 0.0),
+        "market_cap": _column(df, "market_cap", 0.0),
+        "float_ratio": _column(df, "float_ratio", 0.0),
+        "cash_to_market_cap": _column(df, "cash_to_market_cap", 0.0),
+
         # Derived features
         "liquidity_score": liquidity_score,
         "price_volatility": price_volatility
     }
 
-    df = pd.DataFrame([features])
-    df = df.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+    out = pd.DataFrame(features, columns=list(FEATURE_COLUMNS))
+    out = out.replace([np.inf, -np.inf], np.nan).fillna(0.0)
 
-    return df
+    return out
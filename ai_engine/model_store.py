@@ -0,0 +1,197 @@
+"""
+Versioned on-disk model store.
+
+Layout under the model directory::
+
+    models/
+        CURRENT                      # name of the active version
+        versions/<version>/iso_model.pkl
+        versions/<version>/xgb_model.pkl
+        versions/<version>/compiled.npz  # library-free copy, see tree_compiler
+
+A version directory is written under a temporary name and renamed into
+place, and CURRENT is replaced with os.replace, so a reader never sees a
+half-written model. Directories without CURRENT fall back to the flat
+``iso_model.pkl`` / ``xgb_model.pkl`` files used before versioning.
+
+``publish`` prunes all but the newest ``keep`` versions afterwards, so
+retraining does not grow ``versions/`` without bound.
+"""
+
+import os
+import shutil
+import time
+import logging
+from datetime import datetime
+from typing import Optional
+
+from ai_engine.tree_compiler import COMPILED_FILE, load_compiled, save_compiled
+
+ISO_FILE = "iso_model.pkl"
+XGB_FILE = "xgb_model.pkl"
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+LEGACY_VERSION = "legacy"
+# Versions kept by publish() (the current one plus rollback candidates)
+DEFAULT_KEEP_VERSIONS = 5
+
+logger = logging.getLogger(__name__)
+
+
+class ModelSet:
+    """One immutable generation of models plus where it came from."""
+
+    def __init__(self, iso=None, xgb=None, version: Optional[str] = None,
+                 loaded_at: Optional[float] = None, compiled: bool = False):
+        self.iso = iso
+        self.xgb = xgb
+        self.version = version
+        self.loaded_at = loaded_at
+        self.compiled = compiled
+
+    def info(self) -> dict:
+        loaded_at = None
+        if self.loaded_at is not None:
+            loaded_at = datetime.utcfromtimestamp(self.loaded_at).isoformat() + "Z"
+        return {"version": self.version, "loaded_at": loaded_at, "compiled": self.compiled}
+
+
+class ModelStore:
+    def __init__(self, root: str, keep: int = DEFAULT_KEEP_VERSIONS):
+        self.root = root
+        # 0 keeps every version
+        self.keep = keep
+
+    @property
+    def versions_dir(self) -> str:
+        return os.path.join(self.root, VERSIONS_DIR)
+
+    def current_version(self) -> Optional[str]:
+        """Active version name, ``"legacy"`` for flat files, or None if empty."""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), "r") as f:
+                version = f.read().strip()
+            if version:
+                return version
+        except FileNotFoundError:
+            pass
+
+        if os.path.exists(os.path.join(self.root, ISO_FILE)) or \
+                os.path.exists(os.path.join(self.root, XGB_FILE)):
+            return LEGACY_VERSION
+        return None
+
+    def _version_path(self, version: str) -> str:
+        if version == LEGACY_VERSION:
+            return self.root
+        return os.path.join(self.versions_dir, version)
+
+    def load(self, version: Optional[str] = None, compiled: bool = False) -> ModelSet:
+        """
+        Load a version (default: the current one) into a new ModelSet.
+
+        With ``compiled=True`` the version's compiled.npz is used when it
+        exists, so neither joblib, sklearn nor xgboost gets imported.
+        """
+        version = version or self.current_version()
+        if version is None:
+            return ModelSet(loaded_at=time.time())
+
+        path = self._version_path(version)
+        compiled_path = os.path.join(path, COMPILED_FILE)
+        if compiled and os.path.exists(compiled_path):
+            iso, xgb = load_compiled(compiled_path)
+            return ModelSet(iso, xgb, version=version, loaded_at=time.time(), compiled=True)
+
+        import joblib
+
+        iso_path = os.path.join(path, ISO_FILE)
+        xgb_path = os.path.join(path, XGB_FILE)
+
+        iso = joblib.load(iso_path) if os.path.exists(iso_path) else None
+        xgb = joblib.load(xgb_path) if os.path.exists(xgb_path) else None
+
+        return ModelSet(iso, xgb, version=version, loaded_at=time.time())
+
+    def size_bytes(self, version: Optional[str] = None, compiled: bool = False) -> int:
+        """
+        On-disk size of the files ``load`` reads for a version.
+
+        Serialized size tracks the in-memory size of the trees closely
+        enough to budget how many model sets to keep loaded.
+        """
+        version = version or self.current_version()
+        if version is None:
+            return 0
+
+        path = self._version_path(version)
+        files = [ISO_FILE, XGB_FILE]
+        if compiled and os.path.exists(os.path.join(path, COMPILED_FILE)):
+            files = [COMPILED_FILE]
+        return sum(
+            os.path.getsize(os.path.join(path, name)) for name in files
+            if os.path.exists(os.path.join(path, name))
+        )
+
+    def publish(self, iso, xgb) -> str:
+        """Write a new version, atomically make it current, then prune to ``keep``."""
+        import joblib
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+        version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        while os.path.exists(self._version_path(version)):
+            version += "_"
+
+        tmp_dir = os.path.join(self.versions_dir, f".tmp-{version}")
+        os.makedirs(tmp_dir)
+        if iso is not None:
+            joblib.dump(iso, os.path.join(tmp_dir, ISO_FILE))
+        if xgb is not None:
+            joblib.dump(xgb, os.path.join(tmp_dir, XGB_FILE))
+        self._write_compiled(tmp_dir, iso, xgb)
+        os.rename(tmp_dir, self._version_path(version))
+
+        tmp_current = os.path.join(self.root, f".{CURRENT_FILE}.tmp")
+        with open(tmp_current, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_current, os.path.join(self.root, CURRENT_FILE))
+
+        if self.keep > 0:
+            self.prune(self.keep)
+        return version
+
+    def export_compiled(self, version: Optional[str] = None) -> Optional[str]:
+        """(Re)write compiled.npz for an existing version from its pickles."""
+        models = self.load(version)
+        if models.version is None:
+            return None
+        path = self._version_path(models.version)
+        self._write_compiled(path, models.iso, models.xgb)
+        return os.path.join(path, COMPILED_FILE)
+
+    @staticmethod
+    def _write_compiled(path: str, iso, xgb):
+        tmp_path = os.path.join(path, f".{COMPILED_FILE}.tmp")
+        try:
+            save_compiled(tmp_path, iso, xgb)
+        except ValueError as e:
+            # Unsupported model type: the pickles are still usable
+            logger.warning("Not writing compiled models: %s", e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        os.replace(tmp_path, os.path.join(path, COMPILED_FILE))
+
+    def prune(self, keep: int = 5):
+        """Delete all but the newest ``keep`` versions (never the current one)."""
+        if not os.path.isdir(self.versions_dir):
+            return
+
+        current = self.current_version()
+        versions = sorted(v for v in os.listdir(self.versions_dir) if not v.startswith("."))
+        for version in versions[:-keep] if keep > 0 else versions:
+            if version != current:
+                shutil.rmtree(self._version_path(version), ignore_errors=True)
@@ -0,0 +1,220 @@
+"""
+Streaming anomaly detection with Half-Space Trees (Tan, Ting & Liu, 2011).
+
+Each tree is a complete binary tree of fixed height whose splits are drawn
+at random, independent of the data, so scoring and learning one snapshot
+is a walk of ``height`` steps in ``n_trees`` trees: constant time and
+memory per update. Node masses are counted over tumbling windows of
+``window_size`` snapshots; the last complete window is the reference
+profile that new snapshots are scored against, so the model keeps adapting
+without a refit.
+
+Features are unbounded, so the first window is buffered to fix a per-feature
+min/max scaling before the trees start counting.
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class HalfSpaceTrees:
+    def __init__(self, n_features: int, n_trees: int = 25, height: int = 8,
+                 window_size: int = 250, size_limit: Optional[float] = None,
+                 threshold: float = 0.5, seed: int = 42):
+        self.n_features = int(n_features)
+        self.n_trees = int(n_trees)
+        self.height = int(height)
+        self.window_size = int(window_size)
+        self.size_limit = float(size_limit if size_limit is not None else 0.1 * window_size)
+        self.threshold = float(threshold)
+        self.seed = int(seed)
+
+        n_internal = 2 ** self.height - 1
+        n_nodes = 2 ** (self.height + 1) - 1
+        self.split_feature = np.zeros((self.n_trees, n_internal), dtype=np.int64)
+        self.split_value = np.zeros((self.n_trees, n_internal), dtype=np.float64)
+        self.l_mass = np.zeros((self.n_trees, n_nodes), dtype=np.int64)
+        self.r_mass = np.zeros((self.n_trees, n_nodes), dtype=np.int64)
+
+        self.feature_min = np.zeros(self.n_features, dtype=np.float64)
+        self.feature_scale = np.ones(self.n_features, dtype=np.float64)
+
+        # Warm-up buffer, dropped once the trees are built
+        self.buffer = np.zeros((self.window_size, self.n_features), dtype=np.float64)
+        self.buffered = 0
+        self.built = False
+        self.ready = False
+        self.count = 0
+
+    # -- scoring and learning -------------------------------------------------
+
+    def score_one(self, x) -> Optional[float]:
+        """
+        Anomaly score in [0, 1] (higher is more anomalous), or None while the
+        first reference window is still being collected.
+        """
+        if not self.ready:
+            return None
+
+        z = self._scale(x)
+        trees = np.arange(self.n_trees)
+        node = np.zeros(self.n_trees, dtype=np.int64)
+        mass = np.zeros(self.n_trees, dtype=np.float64)
+        done = np.zeros(self.n_trees, dtype=bool)
+
+        for depth in range(self.height + 1):
+            r = self.r_mass[trees, node]
+            stop = ~done & ((r < self.size_limit) | (depth == self.height))
+            mass[stop] = r[stop] * 2.0 ** depth
+            done |= stop
+            if done.all():
+                break
+            node = self._child(trees, node, z)
+
+        # A snapshot in a typical region keeps ~window_size mass per tree
+        normal_mass = mass.sum() / (self.n_trees * self.window_size)
+        return float(np.clip(1.0 - normal_mass, 0.0, 1.0))
+
+    def is_anomaly(self, score: Optional[float]) -> bool:
+        return score is not None and score > self.threshold
+
+    def learn_one(self, x):
+        x = np.asarray(x, dtype=np.float64)
+
+        if not self.built:
+            self.buffer[self.buffered] = x
+            self.buffered += 1
+            if self.buffered < self.window_size:
+                return
+            self._build(self.buffer)
+            for row in self.buffer:
+                self._count(row)
+            self.buffer = np.zeros((0, self.n_features), dtype=np.float64)
+            self.buffered = 0
+        else:
+            self._count(x)
+
+    def _count(self, x):
+        z = self._scale(x)
+        trees = np.arange(self.n_trees)
+        node = np.zeros(self.n_trees, dtype=np.int64)
+        for depth in range(self.height + 1):
+            self.l_mass[trees, node] += 1
+            if depth < self.height:
+                node = self._child(trees, node, z)
+
+        self.count += 1
+        if self.count >= self.window_size:
+            self.r_mass = self.l_mass
+            self.l_mass = np.zeros_like(self.r_mass)
+            self.count = 0
+            self.ready = True
+
+    def _child(self, trees, node, z):
+        go_right = z[self.split_feature[trees, node]] > self.split_value[trees, node]
+        return 2 * node + 1 + go_right
+
+    def _scale(self, x) -> np.ndarray:
+        return (np.asarray(x, dtype=np.float64) - self.feature_min) / self.feature_scale
+
+    def _build(self, window: np.ndarray):
+        """Fix the scaling from the warm-up window and draw the random splits."""
+        self.feature_min = window.min(axis=0)
+        span = window.max(axis=0) - self.feature_min
+        self.feature_scale = np.where(span > 0, span, 1.0)
+
+        rng = np.random.default_rng(self.seed)
+        n_internal = 2 ** self.height - 1
+        for t in range(self.n_trees):
+            # Randomly perturbed work space around the unit cube (paper, Alg. 1)
+            sq = rng.uniform(0.0, 1.0, self.n_features)
+            half = 2.0 * np.maximum(sq, 1.0 - sq)
+            lo = np.empty((n_internal, self.n_features))
+            hi = np.empty((n_internal, self.n_features))
+            lo[0] = sq - half
+            hi[0] = sq + half
+
+            for node in range(n_internal):
+                q = rng.integers(self.n_features)
+                p = (lo[node, q] + hi[node, q]) / 2.0
+                self.split_feature[t, node] = q
+                self.split_value[t, node] = p
+
+                for child, bound in ((2 * node + 1, "hi"), (2 * node + 2, "lo")):
+                    if child >= n_internal:
+                        continue
+                    lo[child] = lo[node]
+                    hi[child] = hi[node]
+                    if bound == "hi":
+                        hi[child, q] = p
+                    else:
+                        lo[child, q] = p
+
+        self.built = True
+
+    # -- checkpointing --------------------------------------------------------
+
+    def save(self, path: str, meta: Optional[Dict[str, Any]] = None):
+        """Write the full model state (plus optional JSON metadata) atomically."""
+        params = {
+            "n_features": self.n_features,
+            "n_trees": self.n_trees,
+            "height": self.height,
+            "window_size": self.window_size,
+            "size_limit": self.size_limit,
+            "threshold": self.threshold,
+            "seed": self.seed,
+            "built": self.built,
+            "ready": self.ready,
+            "count": self.count,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                params=np.array(json.dumps(params)),
+                meta=np.array(json.dumps(meta or {})),
+                split_feature=self.split_feature,
+                split_value=self.split_value,
+                l_mass=self.l_mass,
+                r_mass=self.r_mass,
+                feature_min=self.feature_min,
+                feature_scale=self.feature_scale,
+                buffer=self.buffer[:self.buffered],
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["HalfSpaceTrees", Dict[str, Any]]:
+        """Restore a model written by ``save``; returns (model, meta)."""
+        with np.load(path) as data:
+            params = json.loads(str(data["params"]))
+            meta = json.loads(str(data["meta"]))
+
+            model = cls(
+                n_features=params["n_features"],
+                n_trees=params["n_trees"],
+                height=params["height"],
+                window_size=params["window_size"],
+                size_limit=params["size_limit"],
+                threshold=params["threshold"],
+                seed=params["seed"],
+            )
+            model.built = params["built"]
+            model.ready = params["ready"]
+            model.count = params["count"]
+            for name in ("split_feature", "split_value", "l_mass", "r_mass",
+                         "feature_min", "feature_scale"):
+                setattr(model, name, data[name].copy())
+
+            buffered = data["buffer"]
+            model.buffered = len(buffered)
+            if not model.built:
+                model.buffer[:model.buffered] = buffered
+            else:
+                model.buffer = np.zeros((0, model.n_features), dtype=np.float64)
+
+        return model, meta
@@ -0,0 +1,297 @@
+"""
+Library-free scoring for the trained tree ensembles.
+
+``compile_isolation_forest`` and ``compile_xgb_classifier`` flatten the
+fitted sklearn / xgboost models into plain node tables (feature, threshold,
+left, right, value). The compiled objects expose the same ``predict`` /
+``predict_proba`` methods AnomalyEngine uses, evaluate all trees for all
+rows with vectorized NumPy, and can be saved to and loaded from a single
+``.npz`` file without importing sklearn or xgboost.
+"""
+
+import json
+from typing import Optional
+
+import numpy as np
+
+COMPILED_FILE = "compiled.npz"
+
+_EULER_GAMMA = 0.5772156649015329
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Expected path length of an unsuccessful BST search (as in sklearn)."""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    out = np.zeros_like(n_samples)
+
+    two = n_samples == 2
+    many = n_samples > 2
+    out[two] = 1.0
+    out[many] = (
+        2.0 * (np.log(n_samples[many] - 1.0) + _EULER_GAMMA)
+        - 2.0 * (n_samples[many] - 1.0) / n_samples[many]
+    )
+    return out
+
+
+class _NodeTable:
+    """
+    All trees of an ensemble packed into flat node arrays.
+
+    Child indices are global, ``-1`` marks a leaf, and ``roots[t]`` is the
+    first node of tree ``t``.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, default_left, roots, max_depth):
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_trees(cls, trees):
+        """Build from an iterable of (feature, threshold, left, right, value, default_left) tuples."""
+        columns = [[] for _ in range(6)]
+        roots = []
+        max_depth = 0
+        offset = 0
+        for feature, threshold, left, right, value, default_left in trees:
+            left = np.asarray(left, dtype=np.int64)
+            right = np.asarray(right, dtype=np.int64)
+            roots.append(offset)
+            max_depth = max(max_depth, _tree_depth(left, right))
+
+            columns[0].append(np.asarray(feature))
+            columns[1].append(np.asarray(threshold))
+            columns[2].append(np.where(left >= 0, left + offset, -1))
+            columns[3].append(np.where(right >= 0, right + offset, -1))
+            columns[4].append(np.asarray(value))
+            columns[5].append(np.asarray(default_left))
+            offset += len(left)
+
+        return cls(*(np.concatenate(c) if c else np.zeros(0) for c in columns), roots, max_depth)
+
+    def leaves(self, X: np.ndarray, less_than: bool) -> np.ndarray:
+        """
+        Leaf node index reached by every row in every tree, shape (n_rows, n_trees).
+
+        ``less_than`` selects xgboost's ``x < threshold`` split rule instead
+        of sklearn's ``x <= threshold``. NaN follows ``default_left``.
+        """
+        n_rows = X.shape[0]
+        node = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        rows = np.arange(n_rows)[:, None]
+
+        for _ in range(self.max_depth):
+            is_leaf = self.left[node] < 0
+            if is_leaf.all():
+                break
+            x = X[rows, np.maximum(self.feature[node], 0)]
+            go_left = x < self.threshold[node] if less_than else x <= self.threshold[node]
+            go_left = np.where(np.isnan(x), self.default_left[node], go_left)
+            child = np.where(go_left, self.left[node], self.right[node])
+            node = np.where(is_leaf, node, child)
+
+        return node
+
+    def to_arrays(self, prefix: str) -> dict:
+        return {
+            f"{prefix}feature": self.feature,
+            f"{prefix}threshold": self.threshold,
+            f"{prefix}left": self.left,
+            f"{prefix}right": self.right,
+            f"{prefix}value": self.value,
+            f"{prefix}default_left": self.default_left,
+            f"{prefix}roots": self.roots,
+            f"{prefix}max_depth": np.array(self.max_depth),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str):
+        return cls(*(arrays[f"{prefix}{name}"] for name in (
+            "feature", "threshold", "left", "right", "value", "default_left", "roots", "max_depth"
+        )))
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    if len(left) == 0:
+        return 0
+    max_depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        max_depth = max(max_depth, depth)
+        if left[node] >= 0:
+            stack.append((left[node], depth + 1))
+            stack.append((right[node], depth + 1))
+    return max_depth
+
+
+def _as_float32_input(X) -> np.ndarray:
+    # Both libraries evaluate splits on float32 copies of the input
+    return np.asarray(X, dtype=np.float64).astype(np.float32).astype(np.float64)
+
+
+class CompiledIsolationForest:
+    def __init__(self, nodes: _NodeTable, n_trees: int, max_samples: float, offset: float):
+        self.nodes = nodes
+        self.n_trees = int(n_trees)
+        self.max_samples = float(max_samples)
+        self.offset_ = float(offset)
+
+    def score_samples(self, X) -> np.ndarray:
+        X = _as_float32_input(X)
+        depths = self.nodes.value[self.nodes.leaves(X, less_than=False)].sum(axis=1)
+        denominator = self.n_trees * _average_path_length([self.max_samples])[0]
+        if denominator == 0:
+            return -np.ones(X.shape[0])
+        return -(2 ** (-depths / denominator))
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X) -> np.ndarray:
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def to_arrays(self) -> dict:
+        arrays = self.nodes.to_arrays("iso_")
+        arrays["iso_params"] = np.array([self.n_trees, self.max_samples, self.offset_])
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        n_trees, max_samples, offset = arrays["iso_params"]
+        return cls(_NodeTable.from_arrays(arrays, "iso_"), n_trees, max_samples, offset)
+
+
+class CompiledXGBClassifier:
+    def __init__(self, nodes: _NodeTable, tree_class: np.ndarray, n_classes: int, base_margin: float):
+        self.nodes = nodes
+        self.tree_class = np.asarray(tree_class, dtype=np.int64)
+        self.n_classes = int(n_classes)
+        self.base_margin = float(base_margin)
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = _as_float32_input(X)
+        leaf_values = self.nodes.value[self.nodes.leaves(X, less_than=True)]
+
+        n_outputs = 1 if self.n_classes == 2 else self.n_classes
+        margin = np.full((X.shape[0], n_outputs), self.base_margin)
+        for k in range(n_outputs):
+            margin[:, k] += leaf_values[:, self.tree_class == k].sum(axis=1)
+
+        if self.n_classes == 2:
+            p = 1.0 / (1.0 + np.exp(-margin[:, 0]))
+            return np.column_stack([1.0 - p, p])
+
+        margin -= margin.max(axis=1, keepdims=True)
+        expm = np.exp(margin)
+        return expm / expm.sum(axis=1, keepdims=True)
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_proba(X).argmax(axis=1)
+
+    def to_arrays(self) -> dict:
+        arrays = self.nodes.to_arrays("xgb_")
+        arrays["xgb_tree_class"] = self.tree_class
+        arrays["xgb_params"] = np.array([self.n_classes, self.base_margin])
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        n_classes, base_margin = arrays["xgb_params"]
+        return cls(_NodeTable.from_arrays(arrays, "xgb_"), arrays["xgb_tree_class"], n_classes, base_margin)
+
+
+def compile_isolation_forest(iso) -> CompiledIsolationForest:
+    """Flatten a fitted sklearn IsolationForest."""
+    trees = []
+    for estimator, features in zip(iso.estimators_, iso.estimators_features_):
+        tree = estimator.tree_
+        left = tree.children_left
+        right = tree.children_right
+
+        # Node depth counting the root as 1, like sklearn's decision path length
+        depth = np.ones(tree.node_count, dtype=np.float64)
+        for i in range(tree.node_count):
+            if left[i] >= 0:
+                depth[left[i]] = depth[i] + 1
+                depth[right[i]] = depth[i] + 1
+
+        value = depth + _average_path_length(tree.n_node_samples) - 1.0
+        feature = np.where(tree.feature >= 0, np.asarray(features)[np.maximum(tree.feature, 0)], -1)
+        trees.append((feature, tree.threshold, left, right, value, np.zeros(tree.node_count, dtype=bool)))
+
+    return CompiledIsolationForest(
+        _NodeTable.from_trees(trees),
+        n_trees=len(iso.estimators_),
+        max_samples=iso._max_samples,
+        offset=iso.offset_,
+    )
+
+
+def compile_xgb_classifier(xgb) -> CompiledXGBClassifier:
+    """Flatten a fitted XGBClassifier (gbtree booster, logistic or softprob objective)."""
+    model = json.loads(xgb.get_booster().save_raw(raw_format="json"))
+    learner = model["learner"]
+
+    booster = learner["gradient_booster"]
+    if booster["name"] != "gbtree":
+        raise ValueError(f"Unsupported booster: {booster['name']}")
+
+    objective = learner["objective"]["name"]
+    base_score = float(learner["learner_model_param"]["base_score"])
+    if objective == "binary:logistic":
+        n_classes = 2
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+    elif objective == "multi:softprob":
+        n_classes = int(learner["learner_model_param"]["num_class"])
+        base_margin = base_score
+    else:
+        raise ValueError(f"Unsupported objective: {objective}")
+
+    trees = []
+    for tree in booster["model"]["trees"]:
+        left = np.asarray(tree["left_children"], dtype=np.int64)
+        right = np.asarray(tree["right_children"], dtype=np.int64)
+        # Leaves keep their weight in split_conditions
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32).astype(np.float64)
+        is_leaf = left < 0
+        feature = np.where(is_leaf, -1, tree["split_indices"])
+        value = np.where(is_leaf, conditions, 0.0)
+        default_left = np.asarray(tree["default_left"], dtype=bool)
+        trees.append((feature, conditions, left, right, value, default_left))
+
+    return CompiledXGBClassifier(
+        _NodeTable.from_trees(trees),
+        tree_class=booster["model"]["tree_info"],
+        n_classes=n_classes,
+        base_margin=base_margin,
+    )
+
+
+def save_compiled(path: str, iso=None, xgb=None):
+    """Compile whichever models are given and write them to one .npz file."""
+    arrays = {}
+    if iso is not None:
+        arrays.update(compile_isolation_forest(iso).to_arrays())
+    if xgb is not None:
+        arrays.update(compile_xgb_classifier(xgb).to_arrays())
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def load_compiled(path: str):
+    """Return (iso, xgb) compiled models from a .npz file; missing models are None."""
+    with np.load(path) as arrays:
+        iso: Optional[CompiledIsolationForest] = None
+        xgb: Optional[CompiledXGBClassifier] = None
+        if "iso_params" in arrays:
+            iso = CompiledIsolationForest.from_arrays(arrays)
+        if "xgb_params" in arrays:
+            xgb = CompiledXGBClassifier.from_arrays(arrays)
+    return iso, xgb
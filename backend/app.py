@@ -1,7 +1,15 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from backend.routes import data_routes, risk_routes, governance_routes
+from backend.collection_setup import configure_collection
 from backend.config import Config
+from ai_engine.anomaly_detector import ENGINE, MODEL_DIR
+from ai_engine.assets import AssetMonitor, ModelCache
+from ai_engine.entity_store import EntitySnapshotStore
+from data_layer.snapshot_segments import SnapshotCompactor
+from data_layer.snapshot_store import SnapshotStore
+from data_layer.upload_cache import UploadCache
+import atexit
 import logging
 
 def create_app():
@@ -20,9 +28,67 @@ def create_app():
     app.register_blueprint(risk_routes.bp)
     app.register_blueprint(governance_routes.gov_bp)
 
+    ENGINE.use_compiled = app.config['USE_COMPILED_MODELS']
+    ENGINE.store.keep = app.config['MODEL_KEEP_VERSIONS']
+    # Same collector / venue / HTTP settings as the collection daemon
+    asset_registry = configure_collection(app.config)
+
+    if app.config['WARMUP_MODELS']:
+        ENGINE.warmup()
+        logger.info("AI engine models loaded")
+
+    if app.config['MODEL_RELOAD_INTERVAL'] > 0:
+        ENGINE.start_watcher(app.config['MODEL_RELOAD_INTERVAL'])
+
+    if app.config['COALESCE_REQUESTS']:
+        from ai_engine.coalescer import RequestCoalescer
+        app.extensions['risk_coalescer'] = RequestCoalescer(
+            ENGINE,
+            max_wait_ms=app.config['COALESCE_MAX_WAIT_MS'],
+            max_batch_size=app.config['COALESCE_MAX_BATCH'],
+        )
+
+    entity_store = EntitySnapshotStore(
+        max_entities=app.config['ENTITY_STORE_MAX'],
+        ttl_seconds=app.config['ENTITY_STORE_TTL'],
+        path=app.config['ENTITY_STORE_PATH'],
+    )
+    app.extensions['entity_store'] = entity_store
+    if entity_store.path:
+        atexit.register(entity_store.flush)
+
+    asset_monitor = AssetMonitor(
+        asset_registry,
+        ModelCache(
+            max_bytes=int(app.config['MODEL_CACHE_MAX_MB'] * 1024 * 1024),
+            use_compiled=app.config['USE_COMPILED_MODELS'],
+            pinned={MODEL_DIR: ENGINE},
+        ),
+        entity_store=entity_store,
+        rolling_windows=app.config['ROLLING_WINDOWS'],
+    )
+    app.extensions['asset_monitor'] = asset_monitor
+    if app.config['ASSET_SCORE_INTERVAL'] > 0:
+        asset_monitor.start(app.config['ASSET_SCORE_INTERVAL'])
+
+    app.extensions['snapshot_store'] = SnapshotStore(app.config['SNAPSHOT_STORE_DIR'])
+    if app.config['SNAPSHOT_COMPACT_INTERVAL_S'] > 0:
+        compactor = SnapshotCompactor(
+            interval=app.config['SNAPSHOT_COMPACT_INTERVAL_S'],
+            min_age_s=app.config['SNAPSHOT_COMPACT_MIN_AGE_S'],
+        )
+        compactor.start()
+        app.extensions['snapshot_compactor'] = compactor
+
+    if app.config['UPLOAD_CACHE_MAX_MB'] > 0:
+        app.extensions['upload_cache'] = UploadCache(
+            app.config['UPLOAD_CACHE_DIR'],
+            max_bytes=int(app.config['UPLOAD_CACHE_MAX_MB'] * 1024 * 1024),
+        )
+
     @app.route("/health")
     def health_check():
-        return jsonify({"status": "healthy"}), 200
+        return jsonify({"status": "healthy", "model": ENGINE.model_info()}), 200
 
     @app.errorhandler(404)
     def not_found(error):
@@ -0,0 +1,48 @@
+"""
+Process-wide collection settings, shared by the API server (create_app)
+and the collection daemon (scripts/collector_daemon.py) so both fetch
+live data the same way.
+"""
+
+from ai_engine.assets import DEFAULT_ASSET, AssetRegistry
+from backend.http_client import HTTP_CLIENT
+from data_layer.collectors.exchange_fetcher import PRICE_AGGREGATOR, PRICE_CACHE, start_price_feed
+from data_layer.collectors.price_aggregator import build_venues
+from data_layer.collectors.runner import COLLECTOR_RUNNER
+
+
+def configure_collection(config) -> AssetRegistry:
+    """
+    Apply the collector, price venue, cache, HTTP pool and price feed
+    settings from ``config`` (``app.config`` or any mapping with the Config
+    keys) and return the asset registry.
+    """
+    COLLECTOR_RUNNER.deadline = config['COLLECT_DEADLINE_MS'] / 1000.0
+    COLLECTOR_RUNNER.set_max_workers(config['COLLECT_MAX_WORKERS'])
+    COLLECTOR_RUNNER.max_stale = config['COLLECT_MAX_STALE_S']
+    PRICE_AGGREGATOR.budget = config['PRICE_BUDGET_MS'] / 1000.0
+    PRICE_AGGREGATOR.hedge_after = config['PRICE_HEDGE_MS'] / 1000.0
+    PRICE_AGGREGATOR.failure_threshold = config['PRICE_BREAKER_FAILURES']
+    PRICE_AGGREGATOR.reset_timeout = config['PRICE_BREAKER_RESET_S']
+    PRICE_AGGREGATOR.set_venues(build_venues(config['PRICE_VENUES']))
+    PRICE_CACHE.ttl = config['PRICE_CACHE_TTL']
+    PRICE_CACHE.max_stale = config['PRICE_CACHE_MAX_STALE']
+
+    # Built after PRICE_AGGREGATOR is configured: asset exchange sources copy its settings
+    if config['ASSETS_FILE']:
+        asset_registry = AssetRegistry.from_file(config['ASSETS_FILE'])
+    else:
+        asset_registry = AssetRegistry()
+
+    if config['PRICE_FEED_URL']:
+        start_price_feed(
+            config['PRICE_FEED_URL'],
+            symbol=config['PRICE_FEED_SYMBOL'],
+            max_age=config['PRICE_FEED_MAX_AGE_S'],
+            extra_symbols=[a.feed_symbol for a in asset_registry if a.asset_id != DEFAULT_ASSET],
+        )
+    HTTP_CLIENT.configure(
+        pool_maxsize=config['HTTP_POOL_MAXSIZE'],
+        timeout=(config['HTTP_CONNECT_TIMEOUT'], config['HTTP_READ_TIMEOUT']),
+    )
+    return asset_registry
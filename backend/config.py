@@ -14,5 +14,87 @@ class Config:
     RPC_URL = os.getenv('RPC_URL', 'http://127.0.0.1:8545')
     DAO_CONTRACT_ADDRESS = os.getenv('DAO_CONTRACT_ADDRESS')
     
+    # AI engine: load models at startup instead of on the first scoring request
+    WARMUP_MODELS = os.getenv('WARMUP_MODELS', 'False').lower() in ('true', '1', 't')
+    # Seconds between checks for a newly published model version (0 disables)
+    MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', 30))
+    # Model versions kept under models/versions when a new one is published (0 keeps all)
+    MODEL_KEEP_VERSIONS = int(os.getenv('MODEL_KEEP_VERSIONS', 5))
+    # Score with the NumPy tree evaluator instead of sklearn/xgboost when available
+    USE_COMPILED_MODELS = os.getenv('USE_COMPILED_MODELS', 'False').lower() in ('true', '1', 't')
+
+    # Micro-batching of concurrent /api/risk/analyze requests
+    COALESCE_REQUESTS = os.getenv('COALESCE_REQUESTS', 'False').lower() in ('true', '1', 't')
+    COALESCE_MAX_WAIT_MS = float(os.getenv('COALESCE_MAX_WAIT_MS', 2))
+    COALESCE_MAX_BATCH = int(os.getenv('COALESCE_MAX_BATCH', 64))
+
+    # Last snapshot per asset/company, used for delta features
+    ENTITY_STORE_MAX = int(os.getenv('ENTITY_STORE_MAX', 10000))
+    ENTITY_STORE_TTL = float(os.getenv('ENTITY_STORE_TTL', 86400))
+    ENTITY_STORE_PATH = os.getenv('ENTITY_STORE_PATH') or None
+
+    # Shared outbound HTTP client (per-host keep-alive pools)
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 10))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 5))
+
+    # Exchange price cache: fresh for PRICE_CACHE_TTL s, then served stale
+    # (with a background refresh) for up to PRICE_CACHE_MAX_STALE s
+    PRICE_CACHE_TTL = float(os.getenv('PRICE_CACHE_TTL', 2))
+    PRICE_CACHE_MAX_STALE = float(os.getenv('PRICE_CACHE_MAX_STALE', 30))
+
+    # Exchange venues queried concurrently for the median price
+    PRICE_VENUES = [v.strip() for v in os.getenv('PRICE_VENUES', 'binance,kraken,coinbase').split(',') if v.strip()]
+    PRICE_BUDGET_MS = float(os.getenv('PRICE_BUDGET_MS', 200))
+    # A venue slower than this gets a second (hedged) request
+    PRICE_HEDGE_MS = float(os.getenv('PRICE_HEDGE_MS', 80))
+    # Consecutive failures before a venue is skipped, and for how long
+    PRICE_BREAKER_FAILURES = int(os.getenv('PRICE_BREAKER_FAILURES', 3))
+    PRICE_BREAKER_RESET_S = float(os.getenv('PRICE_BREAKER_RESET_S', 30))
+
+    # Streaming trade feed for the price (empty disables; REST venues are the fallback)
+    PRICE_FEED_URL = os.getenv('PRICE_FEED_URL', '')
+    PRICE_FEED_SYMBOL = os.getenv('PRICE_FEED_SYMBOL', 'USDCUSD')
+    PRICE_FEED_MAX_AGE_S = float(os.getenv('PRICE_FEED_MAX_AGE_S', 5))
+
+    # Overall deadline for fetching all live data sources concurrently
+    COLLECT_DEADLINE_MS = float(os.getenv('COLLECT_DEADLINE_MS', 250))
+    COLLECT_MAX_WORKERS = int(os.getenv('COLLECT_MAX_WORKERS', 8))
+    # Oldest last good result a failing source falls back to; older means no data
+    COLLECT_MAX_STALE_S = float(os.getenv('COLLECT_MAX_STALE_S', 300))
+
+    # Monitored stablecoins (JSON list; USDC is always included)
+    ASSETS_FILE = os.getenv('ASSETS_FILE') or None
+    # Loaded per-asset model sets are evicted (LRU) above this size
+    MODEL_CACHE_MAX_MB = float(os.getenv('MODEL_CACHE_MAX_MB', 512))
+    # Seconds between scoring ticks over all assets (0 disables the scheduler)
+    ASSET_SCORE_INTERVAL = float(os.getenv('ASSET_SCORE_INTERVAL', 0))
+    # Window lengths (in scoring ticks) of each asset's rolling EWMA features
+    ROLLING_WINDOWS = [int(w) for w in os.getenv('ROLLING_WINDOWS', '10,60,360').split(',') if w.strip()]
+
+    # Rows per chunk when streaming large uploads (/api/data/analyze-excel?stream=true)
+    IMPORT_CHUNK_ROWS = int(os.getenv('IMPORT_CHUNK_ROWS', 50000))
+
+    # Columnar snapshot history written by scripts/collect_snapshot.py
+    SNAPSHOT_STORE_DIR = os.getenv('SNAPSHOT_STORE_DIR', 'data/snapshot_store')
+    # Collection daemon (scripts/collector_daemon.py): tick interval +/- jitter
+    # (fraction of the interval), buffered snapshots, and batch flush triggers
+    COLLECT_INTERVAL_S = float(os.getenv('COLLECT_INTERVAL_S', 60))
+    COLLECT_JITTER = float(os.getenv('COLLECT_JITTER', 0.1))
+    COLLECT_BUFFER_SIZE = int(os.getenv('COLLECT_BUFFER_SIZE', 1000))
+    COLLECT_FLUSH_ROWS = int(os.getenv('COLLECT_FLUSH_ROWS', 100))
+    COLLECT_FLUSH_INTERVAL_S = float(os.getenv('COLLECT_FLUSH_INTERVAL_S', 5))
+    # On shutdown, give up on failing writes (dropping their rows) after this long
+    COLLECT_DRAIN_TIMEOUT_S = float(os.getenv('COLLECT_DRAIN_TIMEOUT_S', 30))
+    # Packing of old data_layer/snapshots/*.json files into segments (0 disables)
+    SNAPSHOT_COMPACT_INTERVAL_S = float(os.getenv('SNAPSHOT_COMPACT_INTERVAL_S', 0))
+    SNAPSHOT_COMPACT_MIN_AGE_S = float(os.getenv('SNAPSHOT_COMPACT_MIN_AGE_S', 86400))
+    # Largest page /api/data/history returns
+    HISTORY_MAX_LIMIT = int(os.getenv('HISTORY_MAX_LIMIT', 10000))
+
+    # Disk cache of parsed uploads and their scores (0 disables)
+    UPLOAD_CACHE_DIR = os.getenv('UPLOAD_CACHE_DIR', 'data/upload_cache')
+    UPLOAD_CACHE_MAX_MB = float(os.getenv('UPLOAD_CACHE_MAX_MB', 256))
+
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -1,6 +1,10 @@
 
+import threading
+import time
+
 import requests
 from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from urllib3.util.retry import Retry
 
 def get_retry_session(
@@ -21,3 +25,138 @@ def get_retry_session(
     session.mount("http://", adapter)
     session.mount("https://", adapter)
     return session
+
+
+class _PoolStats:
+    """Per-host counters shared by the tracked connection pools."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, pool):
+        key = f"{pool.scheme}://{pool.host}" + (f":{pool.port}" if pool.port else "")
+        return self._hosts.setdefault(key, {
+            "requests": 0,
+            "hits": 0,
+            "new_connections": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        })
+
+    def record_checkout(self, pool, wait_ms, new):
+        with self._lock:
+            host = self._host(pool)
+            host["requests"] += 1
+            host["hits"] += 0 if new else 1
+            host["new_connections"] += 1 if new else 0
+            host["wait_ms_total"] += wait_ms
+            host["wait_ms_max"] = max(host["wait_ms_max"], wait_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(host) for key, host in self._hosts.items()}
+
+
+class _TrackedPoolMixin:
+    """Times connection checkouts and whether they reuse an open (keep-alive) socket."""
+
+    pool_stats = None
+
+    def _get_conn(self, timeout=None):
+        start = time.perf_counter()
+        conn = super()._get_conn(timeout)
+        # Connections connect lazily: no socket yet means a new (or re-opened) connection
+        new = getattr(conn, "sock", None) is None
+        self.pool_stats.record_checkout(self, (time.perf_counter() - start) * 1000.0, new)
+        return conn
+
+
+class _TrackedAdapter(HTTPAdapter):
+    def __init__(self, pool_stats, **kwargs):
+        self.pool_stats = pool_stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {"pool_stats": self.pool_stats}
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": type("TrackedHTTPConnectionPool", (_TrackedPoolMixin, HTTPConnectionPool), attrs),
+            "https": type("TrackedHTTPSConnectionPool", (_TrackedPoolMixin, HTTPSConnectionPool), attrs),
+        }
+
+
+class HTTPClientRegistry:
+    """
+    Process-wide HTTP client shared by all collectors.
+
+    One ``requests.Session`` with keep-alive connection pools (one pool of
+    up to ``pool_maxsize`` connections per host, for up to
+    ``pool_connections`` hosts), retries and default timeouts. ``stats()``
+    reports per-host connection reuse, new connections and pool wait time.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 timeout=(3.05, 5), retries=3, backoff_factor=0.3,
+                 status_forcelist=(500, 502, 504)):
+        self._lock = threading.Lock()
+        self._session = None
+        self._stats = _PoolStats()
+        self.configure(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            timeout=timeout,
+            retries=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=status_forcelist,
+        )
+
+    def configure(self, **settings):
+        """Change pool/timeout/retry settings; the session is rebuilt on next use."""
+        with self._lock:
+            for name, value in settings.items():
+                setattr(self, name, value)
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                retry = Retry(
+                    total=self.retries,
+                    read=self.retries,
+                    connect=self.retries,
+                    backoff_factor=self.backoff_factor,
+                    status_forcelist=self.status_forcelist,
+                )
+                adapter = _TrackedAdapter(
+                    self._stats,
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    pool_block=self.pool_block,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session().request(method, url, **kwargs)
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def stats(self):
+        return self._stats.snapshot()
+
+    def close(self):
+        self.configure()
+
+
+# Singleton instance
+HTTP_CLIENT = HTTPClientRegistry()
@@ -1,9 +1,14 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from backend.http_client import HTTP_CLIENT
 from data_layer.collectors.exchange_fetcher import get_exchange_data
 from data_layer.collectors.mock_custodian import get_custodian_data
 from data_layer.collectors.blockchain_fetcher import get_blockchain_data
+from data_layer.collectors.runner import COLLECTOR_RUNNER
 from data_layer.collectors.excel_importer import EXCEL_IMPORTER
+from data_layer.upload_cache import cache_key
 from werkzeug.utils import secure_filename
+import itertools
+import json
 import os
 import tempfile
 
@@ -12,19 +17,87 @@ bp = Blueprint("data", __name__, url_prefix="/api/data")
 @bp.route("/snapshot", methods=["GET"])
 def snapshot():
 
-    exch = get_exchange_data()
-    cust = get_custodian_data()
-    chain = get_blockchain_data()
+    asset = request.args.get("asset")
+    if asset:
+        monitor = current_app.extensions["asset_monitor"]
+        if asset not in monitor.registry:
+            return jsonify({"error": f"Unknown asset: {asset}"}), 404
+        config = monitor.registry.get(asset)
+        collected = config.result_from(COLLECTOR_RUNNER.collect(config.sources))
+        return jsonify({"asset": config.asset_id, **collected.snapshot(),
+                        "missing_sources": collected.missing_sources, "sources": collected.sources})
 
+    collected = COLLECTOR_RUNNER.collect({
+        "chain": get_blockchain_data,
+        "custodian": get_custodian_data,
+        "exchange": get_exchange_data,
+    })
+
+    return jsonify({**collected.snapshot(), "missing_sources": collected.missing_sources,
+                    "sources": collected.sources})
+
+
+@bp.route("/history", methods=["GET"])
+def history():
+    """
+    Collected snapshots in a time range, oldest first.
+
+    Query parameters: ``from`` (inclusive) and ``to`` (exclusive) as ISO
+    timestamps, ``fields`` (comma-separated columns; timestamp is always
+    included), ``limit`` and ``offset`` for paging.
+    """
+    from data_layer.snapshot_store import COLUMNS, TIMESTAMP
+
+    store = current_app.extensions["snapshot_store"]
+    start = request.args.get("from")
+    end = request.args.get("to")
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+    fields = [TIMESTAMP] + [f for f in fields if f != TIMESTAMP] if fields else None
+    try:
+        limit = min(int(request.args.get("limit", 1000)), current_app.config["HISTORY_MAX_LIMIT"])
+        offset = int(request.args.get("offset", 0))
+        if limit < 0 or offset < 0:
+            raise ValueError("limit and offset must be non-negative")
+        total = store.count(start, end)
+        df = store.query(start, end, columns=fields, offset=offset, limit=limit)
+    except (KeyError, ValueError) as e:
+        message = e.args[0] if isinstance(e, KeyError) else str(e)
+        return jsonify({"error": message, "fields": list(COLUMNS)}), 400
+
+    df[TIMESTAMP] = df[TIMESTAMP].dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    if "custodians" in df.columns:
+        df["custodians"] = [balances.tolist() for balances in df["custodians"]]
+
+    next_offset = offset + len(df)
     return jsonify({
-        "price": exch["price"],
-        "reserves": cust["totalReserves"],
-        "custodians": cust["custodians"],
-        "supply": chain["circulatingSupply"],
-        "whale_supply": chain["whale_supply"]
+        "from": start,
+        "to": end,
+        "fields": list(df.columns),
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset if next_offset < total else None,
+        "rows": df.to_dict(orient="records"),
     })
 
 
+@bp.route("/http/stats", methods=["GET"])
+def http_stats():
+    """Connection pool statistics of the shared outbound HTTP client, per host"""
+    return jsonify(HTTP_CLIENT.stats())
+
+
+@bp.route("/price-feed/stats", methods=["GET"])
+def price_feed_stats():
+    """Connection and sequence-gap counters of the streaming price feed"""
+    from data_layer.collectors import exchange_fetcher
+
+    feed = exchange_fetcher.PRICE_FEED
+    if feed is None:
+        return jsonify({"streaming": False})
+    return jsonify({"streaming": True, "age_s": feed.age(exchange_fetcher.FEED_SYMBOL), **feed.stats()})
+
+
 @bp.route("/upload-excel", methods=["POST"])
 def upload_excel():
     """
@@ -41,6 +114,11 @@ def upload_excel():
     Returns JSON with:
     - snapshots: List of processed data snapshots
     - summary: Data statistics
+
+    With ``?stream=true`` the file is read in chunks of IMPORT_CHUNK_ROWS
+    rows and the response is NDJSON (one snapshot per line, then a line
+    with ``count``, ``skipped_rows`` and the one-pass ``summary``), so
+    memory does not grow with the file size.
     """
     try:
         # Check if file is in request
@@ -62,12 +140,6 @@ def upload_excel():
                 "error": f"Unsupported file format. Allowed: {', '.join(allowed_extensions)}"
             }), 400
         
-        # Read file bytes
-        file_bytes = file.read()
-        
-        # Import and transform data
-        df = EXCEL_IMPORTER.import_from_bytes(file_bytes, filename)
-        
         # Validate required columns
         required_columns = [
             'Company',
@@ -76,6 +148,51 @@ def upload_excel():
             'eqy_sh_out',
             'px_last'
         ]
+
+        if request.args.get('stream', 'false').lower() in ('true', '1', 't'):
+            chunks = EXCEL_IMPORTER.iter_chunks(
+                file.stream, filename, chunk_rows=current_app.config['IMPORT_CHUNK_ROWS'],
+                sheet_name=request.form.get('sheet')
+            )
+            # Read and validate the first chunk now so bad files still get a 400/500
+            first = next(chunks, None)
+            if first is not None:
+                is_valid, missing_cols = EXCEL_IMPORTER.validate_data(first, required_columns)
+                if not is_valid:
+                    return jsonify({
+                        "error": "Missing required columns",
+                        "missing_columns": missing_cols,
+                        "found_columns": list(first.columns)
+                    }), 400
+                chunks = itertools.chain([first], chunks)
+            else:
+                chunks = iter(())
+
+            def generate():
+                summary = EXCEL_IMPORTER.summary_accumulator()
+                count = skipped = 0
+                try:
+                    for chunk in chunks:
+                        snapshots = EXCEL_IMPORTER.transform_equity_to_frame(chunk)
+                        summary.update(chunk)
+                        skipped += int(snapshots.invalid.sum())
+                        for snapshot in snapshots:
+                            count += 1
+                            yield json.dumps(snapshot) + "\n"
+                except Exception as e:
+                    # Headers are sent: report the failure in-band instead of just stopping
+                    yield json.dumps({"error": str(e), "count": count}) + "\n"
+                    return
+                yield json.dumps({"success": True, "filename": filename, "count": count,
+                                  "skipped_rows": skipped, "summary": summary.result()}) + "\n"
+
+            return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+        # Read file bytes
+        file_bytes = file.read()
+        
+        # Import and transform data
+        df = _parse_upload(file_bytes, filename, request.form.get('sheet'))
         
         is_valid, missing_cols = EXCEL_IMPORTER.validate_data(df, required_columns)
         
@@ -87,7 +204,7 @@ def upload_excel():
             }), 400
         
         # Transform to snapshots
-        snapshots = EXCEL_IMPORTER.transform_equity_to_snapshots(df)
+        snapshots = EXCEL_IMPORTER.transform_equity_to_frame(df)
         
         # Get summary statistics
         summary = EXCEL_IMPORTER.get_data_summary(df)
@@ -95,25 +212,109 @@ def upload_excel():
         return jsonify({
             "success": True,
             "filename": filename,
-            "snapshots": snapshots,
+            "snapshots": snapshots.to_dicts(),
             "summary": summary,
-            "count": len(snapshots)
+            "count": len(snapshots),
+            "skipped_rows": int(snapshots.invalid.sum())
         }), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _parse_upload(file_bytes, filename, sheet_name=None):
+    """Parse an uploaded file, reusing the cached frame for identical bytes."""
+    cache = current_app.extensions.get("upload_cache")
+    file_ext = os.path.splitext(filename)[1].lower()
+    key = cache_key(file_bytes, file_ext, sheet_name or 0)
+
+    if cache is not None:
+        df = cache.get(key, "frame")
+        if df is not None:
+            return df
+
+    df = EXCEL_IMPORTER.import_from_bytes(file_bytes, filename, sheet_name)
+    if cache is not None:
+        cache.put(key, "frame", df)
+    return df
+
+
+def _entity_state(entity_store, companies):
+    """The entity store's last snapshot of each company, as a comparable string."""
+    if entity_store is None:
+        return None
+    return json.dumps(entity_store.peek_many(companies), sort_keys=True)
+
+
+def _reusable(entry, entity_store):
+    """
+    Whether cached results still hold: the entity store has the previous
+    snapshots they were scored against, or already the upload's own.
+    """
+    if not isinstance(entry, dict):
+        return False
+    state = _entity_state(entity_store, entry["companies"])
+    return state in (entry["previous"], entry["after"])
+
+
+def _analyze_snapshots(snapshots, entity_store=None, start=0):
+    """Score one EquitySnapshots table and yield one result per row"""
+    from ai_engine.anomaly_detector import ENGINE
+    from ai_engine.feature_engineering import build_features_batch
+
+    frame = snapshots.frame
+    if entity_store is not None:
+        frame = entity_store.with_previous(frame, "company")
+    analyses = ENGINE.analyze_batch(build_features_batch(frame, group_by="company"))
+    if entity_store is not None:
+        entity_store.put_many(snapshots, "company")
+
+    for i, (snapshot, analysis) in enumerate(zip(snapshots, analyses), start):
+        yield {
+            "company": snapshot.get("company", f"Company_{i}"),
+            "risk_score": analysis["risk_score"],
+            "risk_label": analysis["label"],
+            "explanation": analysis["explanation"],
+            "metrics": {
+                "reserves": snapshot["reserves"],
+                "supply": snapshot["supply"],
+                "price": snapshot["price"],
+                "market_cap": snapshot.get("market_cap", 0),
+                "cash_to_market_cap": snapshot.get("cash_to_market_cap", 0)
+            }
+        }
+
+
+def _analyze_chunks(chunks, entity_store=None, summary=None):
+    """
+    Score snapshot DataFrames chunk by chunk and yield one result per row
+
+    Deltas are per company; the entity store carries each company's last
+    snapshot from one chunk (or upload) to the next. Each chunk is also
+    fed to the ``summary`` accumulator, if given.
+    """
+    i = 0
+    for chunk in chunks:
+        snapshots = EXCEL_IMPORTER.transform_equity_to_frame(chunk)
+        if summary is not None:
+            summary.update(chunk)
+        yield from _analyze_snapshots(snapshots, entity_store, i)
+        i += len(snapshots)
+
+
 @bp.route("/analyze-excel", methods=["POST"])
 def analyze_excel():
     """
     Upload Excel file and immediately analyze for risks
     
-    Returns risk analysis for each company in the dataset
+    Returns risk analysis for each company in the dataset.
+
+    With ``?stream=true`` the file is read and scored in chunks of
+    IMPORT_CHUNK_ROWS rows and the response is NDJSON (one result per
+    line, then a line with ``total_analyzed`` and the one-pass
+    ``summary``), so memory does not grow with the file size.
     """
     try:
-        from ai_engine.anomaly_detector import ENGINE
-        
         # Check if file is in request
         if 'file' not in request.files:
             return jsonify({"error": "No file provided"}), 400
@@ -124,38 +325,69 @@ def analyze_excel():
             return jsonify({"error": "No file selected"}), 400
         
         filename = secure_filename(file.filename)
+        entity_store = current_app.extensions.get("entity_store")
+
+        if request.args.get('stream', 'false').lower() in ('true', '1', 't'):
+            chunks = EXCEL_IMPORTER.iter_chunks(
+                file.stream, filename, chunk_rows=current_app.config['IMPORT_CHUNK_ROWS']
+            )
+            # Read the first chunk now so format errors still get a 400/500
+            first = next(chunks, None)
+            chunks = itertools.chain([first], chunks) if first is not None else iter(())
+
+            def generate():
+                summary = EXCEL_IMPORTER.summary_accumulator()
+                total = 0
+                try:
+                    for result in _analyze_chunks(chunks, entity_store, summary):
+                        total += 1
+                        yield json.dumps(result) + "\n"
+                except Exception as e:
+                    # Headers are sent: report the failure in-band instead of just stopping
+                    yield json.dumps({"error": str(e), "total_analyzed": total}) + "\n"
+                    return
+                yield json.dumps({"filename": filename, "total_analyzed": total,
+                                  "summary": summary.result()}) + "\n"
+
+            return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+        # Identical bytes, sheet and model version give identical scores, as
+        # long as the entity store holds the same previous snapshots
+        from ai_engine.anomaly_detector import ENGINE
+
         file_bytes = file.read()
-        
-        # Import and transform data
-        df = EXCEL_IMPORTER.import_from_bytes(file_bytes, filename)
-        snapshots = EXCEL_IMPORTER.transform_equity_to_snapshots(df)
-        
-        # Analyze each snapshot
-        results = []
-        for i, snapshot in enumerate(snapshots):
-            prev_snapshot = snapshots[i-1] if i > 0 else None
-            
-            analysis = ENGINE.analyze_snapshot(snapshot, prev_snapshot)
-            
-            results.append({
-                "company": snapshot.get("company", f"Company_{i}"),
-                "risk_score": analysis["risk_score"],
-                "risk_label": analysis["label"],
-                "explanation": analysis["explanation"],
-                "metrics": {
-                    "reserves": snapshot["reserves"],
-                    "supply": snapshot["supply"],
-                    "price": snapshot["price"],
-                    "market_cap": snapshot.get("market_cap", 0),
-                    "cash_to_market_cap": snapshot.get("cash_to_market_cap", 0)
-                }
-            })
-        
+        sheet_name = request.form.get('sheet')
+        cache = current_app.extensions.get("upload_cache")
+        results_key = cache_key(file_bytes, os.path.splitext(filename)[1].lower(), sheet_name or 0,
+                                ENGINE.model_version())
+
+        entry = cache.get(results_key, "results") if cache is not None else None
+        cached = _reusable(entry, entity_store)
+        if cached:
+            results = entry["results"]
+            if entity_store is not None:
+                # Leave the store as scoring the upload would have
+                entity_store.put_many(({"company": r["company"], **r["metrics"]} for r in results), "company")
+        else:
+            # Transform and analyze in one batched pass
+            snapshots = EXCEL_IMPORTER.transform_equity_to_frame(_parse_upload(file_bytes, filename, sheet_name))
+            companies = snapshots.frame["company"].unique().tolist()
+            previous = _entity_state(entity_store, companies)
+            results = list(_analyze_snapshots(snapshots, entity_store))
+            if cache is not None:
+                cache.put(results_key, "results", {
+                    "results": results,
+                    "companies": companies,
+                    "previous": previous,
+                    "after": _entity_state(entity_store, companies),
+                })
+
         return jsonify({
             "success": True,
             "filename": filename,
             "results": results,
-            "total_analyzed": len(results)
+            "total_analyzed": len(results),
+            "cached": cached
         }), 200
         
     except Exception as e:
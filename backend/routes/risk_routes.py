@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from ai_engine.anomaly_detector import ENGINE
 from backend.schemas import RiskAnalysisRequest
+from data_layer.collectors.runner import SourcesUnavailable
 
 bp = Blueprint("risk_routes", __name__, url_prefix="/api/risk")
 
@@ -13,7 +14,7 @@ def debug_alert():
         "price": 1.0
     }
 
-    result = ENGINE.analyze_snapshot(test_snapshot)
+    result = ENGINE.analyze_snapshot(test_snapshot, include_raw_features=False)
 
     alert_msg = "Anomaly Detected!" if result["label"] in ["RISKY", "WARNING"] else "All Good"
 
@@ -32,49 +33,95 @@ def analyze_snapshot_api():
         # Pydantic validation
         data = request.get_json(force=True)
         validated_data = RiskAnalysisRequest(**data)
-        
+
+        engine = ENGINE
+        entity_id = validated_data.entity_id
+        if validated_data.asset:
+            monitor = current_app.extensions["asset_monitor"]
+            engine = monitor.engine_for(validated_data.asset)
+            entity_id = entity_id or monitor.registry.get(validated_data.asset).asset_id
+
+        # Without explicit prev_* values, deltas come from the entity's last snapshot
+        entity_store = current_app.extensions.get("entity_store")
+        previous = {}
+        if entity_id and entity_store is not None:
+            previous = entity_store.get(entity_id) or {}
+
         snapshot = {
             "reserves": validated_data.reserves,
             "supply": validated_data.supply,
             "whale_supply": validated_data.whales,
             "price": validated_data.price,
-            "prev_reserves": validated_data.prev_reserves if validated_data.prev_reserves is not None else validated_data.reserves,
-            "prev_supply": validated_data.prev_supply if validated_data.prev_supply is not None else validated_data.supply,
+            "prev_reserves": validated_data.prev_reserves if validated_data.prev_reserves is not None else previous.get("reserves", validated_data.reserves),
+            "prev_supply": validated_data.prev_supply if validated_data.prev_supply is not None else previous.get("supply", validated_data.supply),
+            "prev_price": previous.get("price", validated_data.price),
             "custodians": validated_data.custodians
         }
 
-        result = ENGINE.analyze_snapshot(snapshot)
+        coalescer = current_app.extensions.get("risk_coalescer")
+        if coalescer is not None and engine is ENGINE:
+            result = coalescer.submit(snapshot)
+        else:
+            result = engine.analyze_snapshot(snapshot)
+
+        if entity_id and entity_store is not None:
+            entity_store.put(entity_id, snapshot)
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
+@bp.route("/analyze/stats", methods=["GET"])
+def analyze_stats():
+    coalescer = current_app.extensions.get("risk_coalescer")
+    if coalescer is None:
+        return jsonify({"coalescing": False})
+    return jsonify({"coalescing": True, **coalescer.stats()})
+
+
 @bp.route("/analyze/live", methods=["GET"])
 def analyze_live():
-    result = ENGINE.analyze_live()
+    asset = request.args.get("asset")
+    if asset:
+        monitor = current_app.extensions["asset_monitor"]
+        if asset not in monitor.registry:
+            return jsonify({"error": f"Unknown asset: {asset}"}), 404
+        asset_id = monitor.registry.get(asset).asset_id
+        result = monitor.score([asset_id])[asset_id]
+        if "error" in result:
+            return jsonify(result), 503
+        return jsonify(result)
+
+    try:
+        result = ENGINE.analyze_live()
+    except SourcesUnavailable as e:
+        return jsonify({"error": str(e), "missing_sources": e.missing, "sources": e.sources}), 503
     return jsonify(result)
 
+
+@bp.route("/assets", methods=["GET"])
+def assets_overview():
+    """Latest score of every registered asset; scores them now if no tick has run yet"""
+    monitor = current_app.extensions["asset_monitor"]
+    results = monitor.latest()
+    if not results or request.args.get("refresh", "false").lower() in ("true", "1"):
+        results = monitor.score()
+    return jsonify({"assets": results, **monitor.stats()})
+
 @bp.route("/rescore/history", methods=["GET"])
 def rescore_history_api():
-    import pandas as pd
-    import os
-    from ai_engine.anomaly_detector import ENGINE
+    from ai_engine.feature_engineering import build_features_batch
+    from data_layer.snapshot_store import load_history
 
-    path = "data/historical_snapshots.csv"
-    if not os.path.exists(path):
+    df = load_history(current_app.config["SNAPSHOT_STORE_DIR"])
+    if df is None:
         return jsonify({"error": "No historical data found"}), 404
 
-    df = pd.read_csv(path)
-    rescored = []
-
-    for i in range(len(df)):
-        snap = df.iloc[i].to_dict()
-        prev = df.iloc[i - 1].to_dict() if i > 0 else None
-
-        out = ENGINE.analyze_snapshot(snap, prev)
-        snap["risk_score"] = out["risk_score"]
-        snap["risk_label"] = out["label"]
+    results = ENGINE.analyze_batch(build_features_batch(df))
 
-        rescored.append(snap)
+    df["risk_score"] = results.risk_score
+    df["risk_label"] = results.label
+    if "timestamp" in df.columns and df["timestamp"].dtype.kind == "M":
+        df["timestamp"] = df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
-    return jsonify(rescored)
\ No newline at end of file
+    return jsonify(df.to_dict(orient="records"))
@@ -11,6 +11,8 @@ class RiskAnalysisRequest(BaseModel):
     prev_reserves: Optional[float] = Field(None, ge=0)
     prev_supply: Optional[float] = Field(None, ge=0)
     custodians: Optional[List[Dict[str, Any]]] = Field(default_factory=list)
+    entity_id: Optional[str] = Field(None, description="Asset/company ID; deltas use its last analyzed snapshot")
+    asset: Optional[str] = Field(None, description="Registered asset whose models score the snapshot (default USDC)")
 
     @field_validator('price')
     def price_must_be_positive(cls, v):
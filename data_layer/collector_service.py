@@ -0,0 +1,299 @@
+"""
+Long-running snapshot collection with batched, durable writes.
+
+``CollectorService`` runs two threads around a bounded queue:
+
+- the collector ticks every ``interval`` seconds (plus random jitter, so
+  many instances do not hit the sources in lockstep), fetches all sources
+  concurrently through a CollectorRunner and enqueues the snapshot;
+- the writer drains the queue into the SnapshotStore in batches of up to
+  ``flush_rows`` rows or ``flush_interval`` seconds, with one fsync per
+  column file per batch instead of per snapshot.
+
+When storage falls behind, the queue fills and the collector blocks on
+it (backpressure) instead of growing memory; ticks that could not run on
+time are counted as skipped, not made up. A failed write is retried with
+only the rows of the batch the store had not committed (it may have
+written some months of it), so nothing is lost while the store is
+unavailable (rows the store rejects as out of time order are dropped and
+counted) - except during shutdown: once ``drain_timeout`` seconds have
+passed since ``stop()``, a failing write is given up and its rows dropped
+and counted, so a broken disk cannot keep the process from exiting. Ticks
+where a source has neither fresh nor recent last good data are skipped
+and counted rather than stored with made-up values.
+``stop()`` stops collecting and drains the queue before returning.
+"""
+
+import datetime
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from data_layer.collectors.runner import COLLECTOR_RUNNER
+from data_layer.snapshot_store import SnapshotStore, to_ns
+
+logger = logging.getLogger(__name__)
+
+
+class CollectorService:
+    def __init__(self, store: SnapshotStore, runner=COLLECTOR_RUNNER, interval: float = 60.0,
+                 jitter: float = 0.1, buffer_size: int = 1000, flush_rows: int = 100,
+                 flush_interval: float = 5.0, drain_timeout: float = 30.0,
+                 on_snapshot: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.store = store
+        self.runner = runner
+        self.interval = interval
+        self.jitter = jitter
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.drain_timeout = drain_timeout
+        self.on_snapshot = on_snapshot
+
+        self._buffer: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=buffer_size)
+        self._stop = threading.Event()
+        self._drain_deadline = None
+        self._collector = None
+        self._writer = None
+        self._last_timestamp = None
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "ticks": 0,
+            "skipped_ticks": 0,
+            "stale_sources": 0,
+            "incomplete_ticks": 0,
+            "last_tick_ms": None,
+            "max_tick_ms": 0.0,
+            "blocked_ms": 0.0,
+            "flushes": 0,
+            "rows_written": 0,
+            "last_flush_ms": None,
+            "max_flush_ms": 0.0,
+            "write_errors": 0,
+            "dropped_rows": 0,
+        }
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def start(self):
+        if self._collector is not None and self._collector.is_alive():
+            return
+        self._stop.clear()
+        self._drain_deadline = None
+        self._writer = threading.Thread(target=self._write_loop, name="snapshot-writer", daemon=True)
+        self._collector = threading.Thread(target=self._collect_loop, name="snapshot-collector", daemon=True)
+        self._writer.start()
+        self._collector.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop collecting, then wait until everything buffered is written or,
+        if writes keep failing, until ``drain_timeout`` has passed.
+        """
+        self._drain_deadline = time.monotonic() + self.drain_timeout
+        self._stop.set()
+        if self._collector is not None:
+            self._collector.join(timeout)
+        if self._writer is not None:
+            self._writer.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._collector is not None and self._collector.is_alive()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics["buffered"] = self._buffer.qsize()
+        metrics["buffer_size"] = self._buffer.maxsize
+        return metrics
+
+    def _add(self, **deltas):
+        with self._metrics_lock:
+            for key, value in deltas.items():
+                self._metrics[key] += value
+
+    # -- collecting -----------------------------------------------------------
+
+    def collect_once(self) -> Optional[Dict[str, Any]]:
+        """
+        Fetch one snapshot (all sources concurrently) and enqueue it.
+
+        Returns None, and stores nothing, when a source has no recent data.
+        """
+        start = time.perf_counter()
+        collected = self.runner.collect()
+        if collected.missing_sources:
+            logger.warning("Skipping tick; no data from %s", ", ".join(collected.missing_sources))
+            self._add(ticks=1, incomplete_ticks=1)
+            return None
+
+        now = datetime.datetime.utcnow()
+        if self._last_timestamp is not None and now < self._last_timestamp:
+            # The store is append-only in time order; don't let a clock step break it
+            logger.warning("Clock went backwards by %s; reusing the last timestamp", self._last_timestamp - now)
+            now = self._last_timestamp
+        self._last_timestamp = now
+
+        snapshot = {
+            "timestamp": now.isoformat() + "Z",
+            **collected.snapshot(),
+            "stale_sources": collected.stale_sources,
+        }
+        tick_ms = (time.perf_counter() - start) * 1000.0
+        with self._metrics_lock:
+            self._metrics["ticks"] += 1
+            self._metrics["stale_sources"] += len(collected.stale_sources)
+            self._metrics["last_tick_ms"] = tick_ms
+            self._metrics["max_tick_ms"] = max(self._metrics["max_tick_ms"], tick_ms)
+
+        if self.on_snapshot is not None:
+            try:
+                self.on_snapshot(snapshot)
+            except Exception:
+                logger.exception("on_snapshot hook failed")
+
+        self._enqueue(snapshot)
+        return snapshot
+
+    def _enqueue(self, snapshot: Dict[str, Any]):
+        try:
+            self._buffer.put_nowait(snapshot)
+            return
+        except queue.Full:
+            pass
+
+        # Backpressure: wait for the writer rather than buffering without bound
+        start = time.perf_counter()
+        while True:
+            try:
+                self._buffer.put(snapshot, timeout=0.1)
+                break
+            except queue.Full:
+                if self._writer is None or not self._writer.is_alive():
+                    logger.error("Snapshot writer is not running; dropping snapshot %s", snapshot["timestamp"])
+                    self._add(dropped_rows=1)
+                    break
+        self._add(blocked_ms=(time.perf_counter() - start) * 1000.0)
+
+    def _next_delay(self) -> float:
+        return max(0.0, self.interval * (1.0 + random.uniform(-self.jitter, self.jitter)))
+
+    def _collect_loop(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.collect_once()
+            except Exception:
+                logger.exception("Snapshot collection failed")
+
+            next_tick += self._next_delay()
+            now = time.monotonic()
+            if now > next_tick:
+                # Fell behind (slow sources or backpressure): skip, don't burst
+                missed = int((now - next_tick) // self.interval) + 1 if self.interval > 0 else 0
+                self._add(skipped_ticks=missed)
+                next_tick = now
+            if self._stop.wait(next_tick - now):
+                break
+
+    # -- writing --------------------------------------------------------------
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """Up to ``flush_rows`` snapshots, waiting at most ``flush_interval`` after the first."""
+        try:
+            first = self._buffer.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                # Time is up (or shutting down): take only what is already there
+                try:
+                    batch.append(self._buffer.get_nowait())
+                except queue.Empty:
+                    break
+                continue
+            try:
+                # Short waits so stop() is noticed promptly
+                batch.append(self._buffer.get(timeout=min(remaining, 0.1)))
+            except queue.Empty:
+                pass
+        return batch
+
+    def _write_loop(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._stop.is_set() and not (self._collector and self._collector.is_alive()):
+                    break
+                continue
+            self._flush(batch)
+
+    def _flush(self, batch: List[Dict[str, Any]]):
+        # In the store's order, so the rows it commits before failing are a prefix
+        stamps = to_ns([row["timestamp"] for row in batch])
+        pending = [batch[i] for i in np.argsort(stamps, kind="stable")]
+        since = pending[0]["timestamp"]
+        stored = None  # rows at or after ``since`` already in the store
+        written = 0
+        delay = 0.1
+        while True:
+            start = time.perf_counter()
+            try:
+                if stored is None:
+                    stored = self.store.count(since)
+                self.store.append_many(pending, fsync=True)
+                written += len(pending)
+                break
+            except ValueError:
+                # Out of time order with what is stored: retrying cannot help
+                self._add(write_errors=1, dropped_rows=len(pending))
+                logger.exception("Dropping %d snapshots the store rejected", len(pending))
+                break
+            except Exception:
+                self._add(write_errors=1)
+                pending, committed = self._uncommitted(pending, since, stored)
+                written += committed
+                if stored is not None:
+                    stored += committed
+                if not pending:
+                    break
+                if self._stop.is_set():
+                    remaining = self._drain_deadline - time.monotonic()
+                    if remaining <= 0:
+                        # Shutting down and out of time: give up rather than hang
+                        self._add(dropped_rows=len(pending))
+                        logger.exception("Dropping %d snapshots; writes still failing at shutdown", len(pending))
+                        break
+                    delay = min(delay, remaining)
+                logger.exception("Writing %d snapshots failed; retrying in %.1fs", len(pending), delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 10.0)
+
+        if not written:
+            return
+        flush_ms = (time.perf_counter() - start) * 1000.0
+        with self._metrics_lock:
+            self._metrics["flushes"] += 1
+            self._metrics["rows_written"] += written
+            self._metrics["last_flush_ms"] = flush_ms
+            self._metrics["max_flush_ms"] = max(self._metrics["max_flush_ms"], flush_ms)
+
+    def _uncommitted(self, pending: List[Dict[str, Any]], since: str, stored: Optional[int]) -> tuple:
+        """The rows of a failed append the store did not commit, and how many it did."""
+        if stored is None:
+            return pending, 0
+        try:
+            committed = self.store.count(since) - stored
+        except Exception:
+            logger.exception("Could not tell how much of the failed batch was written")
+            return pending, 0
+        return pending[committed:], committed
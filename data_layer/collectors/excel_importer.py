@@ -5,16 +5,58 @@ Handles importing equity and financial data from Excel files for risk analysis
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Any, Optional, Union
 from datetime import datetime
+import logging
 import os
 
+from data_layer.summary_stats import DEFAULT_PERCENTILES, SummaryAccumulator, percentile_key
+
+logger = logging.getLogger(__name__)
+
+
+class EquitySnapshots:
+    """
+    Columnar result of ``ExcelImporter.transform_equity_to_frame``
+
+    ``frame`` holds one snapshot per valid input row; ``invalid`` is a
+    boolean mask over the input rows that could not be converted.
+    Iterating yields snapshot dictionaries lazily.
+    """
+
+    _CHUNK_ROWS = 1024
+
+    def __init__(self, frame: pd.DataFrame, invalid: np.ndarray):
+        self.frame = frame
+        self.invalid = invalid
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        columns = list(self.frame.columns)
+        for start in range(0, len(self.frame), self._CHUNK_ROWS):
+            chunk = self.frame.iloc[start:start + self._CHUNK_ROWS]
+            # tolist() turns NumPy scalars into plain Python values
+            for values in zip(*(chunk[column].tolist() for column in columns)):
+                snapshot = dict(zip(columns, values))
+                snapshot['custodians'] = []  # No custodian breakdown in this dataset
+                yield snapshot
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return list(self)
+
 
 class ExcelImporter:
     """
     Import and transform Excel data into formats suitable for risk analysis
     """
 
+    # Larger tables are summarized in one pass with an approximate median
+    EXACT_SUMMARY_ROWS = 100_000
+    # Percentiles (0-100) reported per numeric column as p5, p25, ...
+    SUMMARY_PERCENTILES = DEFAULT_PERCENTILES
+
     def __init__(self):
         self.supported_formats = ['.xlsx', '.xls', '.csv']
 
@@ -47,13 +89,15 @@ class ExcelImporter:
         except Exception as e:
             raise Exception(f"Error reading file: {str(e)}")
 
-    def import_from_bytes(self, file_bytes: bytes, filename: str) -> pd.DataFrame:
+    def import_from_bytes(self, file_bytes: bytes, filename: str,
+                          sheet_name: Optional[str] = None) -> pd.DataFrame:
         """
         Import data from file bytes (for API uploads)
         
         Args:
             file_bytes: Binary file content
             filename: Original filename (used to determine format)
+            sheet_name: Optional sheet name (default: first sheet)
             
         Returns:
             DataFrame with imported data
@@ -69,82 +113,161 @@ class ExcelImporter:
             if file_ext == '.csv':
                 df = pd.read_csv(io.BytesIO(file_bytes))
             else:
-                df = pd.read_excel(io.BytesIO(file_bytes))
+                df = pd.read_excel(io.BytesIO(file_bytes), sheet_name=sheet_name or 0)
             
             return df
         except Exception as e:
             raise Exception(f"Error reading file: {str(e)}")
 
-    def transform_equity_to_snapshots(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def iter_chunks(self, source: Union[str, BinaryIO], filename: Optional[str] = None,
+                    chunk_rows: int = 50_000, sheet_name: Optional[str] = None) -> Iterator[pd.DataFrame]:
         """
-        Transform equity data to risk snapshot format
-        
+        Read a file in DataFrames of at most ``chunk_rows`` rows
+
+        CSV is read with ``pandas.read_csv(chunksize=...)`` and .xlsx row by
+        row through openpyxl's read-only mode, so memory stays bounded by
+        the chunk size rather than the file size. Legacy .xls has no
+        streaming reader and is loaded whole, then sliced. Chunk indexes
+        continue across chunks, as if the file had been read in one go.
+
+        Args:
+            source: File path or binary file object
+            filename: Original filename, used for the format if ``source`` is a file object
+            chunk_rows: Maximum rows per chunk
+            sheet_name: Optional sheet name (default: first sheet)
+
+        Yields:
+            DataFrames with consecutive rows of the file
+        """
+        name = source if isinstance(source, str) else filename or ''
+        file_ext = os.path.splitext(name)[1].lower()
+
+        if file_ext not in self.supported_formats:
+            raise ValueError(f"Unsupported file format: {file_ext}")
+        if isinstance(source, str) and not os.path.exists(source):
+            raise FileNotFoundError(f"File not found: {source}")
+
+        if file_ext == '.csv':
+            yield from pd.read_csv(source, chunksize=chunk_rows)
+        elif file_ext == '.xlsx':
+            yield from self._iter_xlsx_chunks(source, chunk_rows, sheet_name)
+        else:
+            df = pd.read_excel(source, sheet_name=sheet_name or 0)
+            for start in range(0, len(df), chunk_rows):
+                yield df.iloc[start:start + chunk_rows]
+
+    @staticmethod
+    def _iter_xlsx_chunks(source, chunk_rows: int, sheet_name: Optional[str]) -> Iterator[pd.DataFrame]:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        try:
+            sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(c) if c is not None else f'Unnamed: {i}' for i, c in enumerate(header)]
+
+            offset = 0
+            buffer = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                buffer.append(row)
+                if len(buffer) == chunk_rows:
+                    yield pd.DataFrame(buffer, columns=columns,
+                                       index=pd.RangeIndex(offset, offset + len(buffer)))
+                    offset += len(buffer)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame(buffer, columns=columns,
+                                   index=pd.RangeIndex(offset, offset + len(buffer)))
+        finally:
+            workbook.close()
+
+    def transform_equity_to_frame(self, df: pd.DataFrame) -> EquitySnapshots:
+        """
+        Transform equity data to risk snapshots, column by column
+
         Expected columns:
         - Company: Company name/identifier
         - bs_cash_cash_equivalents_and_sti: Cash and cash equivalents (reserves proxy)
         - eqy_float: Equity float (circulation metric)
         - eqy_sh_out: Equity shares outstanding (supply)
         - px_last: Last price
-        
+
+        Missing numeric columns count as 0. Rows with a value that cannot
+        be converted to a number are left out and flagged in ``invalid``.
+
         Returns:
-            List of snapshot dictionaries
+            EquitySnapshots with the columnar snapshot frame
         """
-        snapshots = []
-        
         # Standardize column names (handle various naming conventions)
         df.columns = df.columns.str.strip()
-        
-        # Map columns
-        column_mapping = {
-            'Company': 'company',
-            'bs_cash_cash_equivalents_and_sti': 'cash_reserves',
-            'eqy_float': 'float',
-            'eqy_sh_out': 'shares_out',
-            'px_last': 'price'
-        }
-        
-        for idx, row in df.iterrows():
-            try:
-                # Extract values with safe conversion
-                company = str(row.get('Company', f'Company_{idx}'))
-                cash_reserves = float(row.get('bs_cash_cash_equivalents_and_sti', 0))
-                equity_float = float(row.get('eqy_float', 0))
-                shares_out = float(row.get('eqy_sh_out', 0))
-                price = float(row.get('px_last', 0))
-                
-                # Calculate derived metrics
-                market_cap = shares_out * price
-                float_ratio = equity_float / (shares_out + 1e-9)
-                cash_to_market_cap = cash_reserves / (market_cap + 1e-9)
-                
-                # Create snapshot in stablecoin format
-                # Map: cash_reserves -> reserves, shares_out -> supply
-                snapshot = {
-                    'company': company,
-                    'reserves': cash_reserves,  # Cash as reserves
-                    'supply': shares_out,  # Total shares as supply
-                    'price': price,
-                    'whale_supply': shares_out - equity_float,  # Non-float shares (institutional holdings)
-                    'custodians': [],  # No custodian breakdown in this dataset
-                    
-                    # Additional equity-specific metrics
-                    'equity_float': equity_float,
-                    'market_cap': market_cap,
-                    'float_ratio': float_ratio,
-                    'cash_to_market_cap': cash_to_market_cap,
-                    
-                    # Metadata
-                    'timestamp': datetime.utcnow().isoformat(),
-                    'data_type': 'equity'
-                }
-                
-                snapshots.append(snapshot)
-                
-            except Exception as e:
-                print(f"Warning: Error processing row {idx} for {row.get('Company', 'unknown')}: {str(e)}")
-                continue
-        
-        return snapshots
+
+        invalid = np.zeros(len(df), dtype=bool)
+
+        def numeric(column: str) -> np.ndarray:
+            if column not in df.columns:
+                return np.zeros(len(df), dtype=np.float64)
+            raw = df[column]
+            values = pd.to_numeric(raw, errors='coerce')
+            invalid[values.isna().to_numpy() & raw.notna().to_numpy()] = True
+            return values.to_numpy(dtype=np.float64)
+
+        if 'Company' in df.columns:
+            company = df['Company'].astype(str).to_numpy()
+        else:
+            company = ('Company_' + df.index.astype(str)).to_numpy()
+
+        cash_reserves = numeric('bs_cash_cash_equivalents_and_sti')
+        equity_float = numeric('eqy_float')
+        shares_out = numeric('eqy_sh_out')
+        price = numeric('px_last')
+
+        # Calculate derived metrics
+        with np.errstate(divide='ignore', invalid='ignore'):
+            market_cap = shares_out * price
+            float_ratio = equity_float / (shares_out + 1e-9)
+            cash_to_market_cap = cash_reserves / (market_cap + 1e-9)
+
+        # Snapshot in stablecoin format: cash_reserves -> reserves, shares_out -> supply
+        frame = pd.DataFrame({
+            'company': company,
+            'reserves': cash_reserves,  # Cash as reserves
+            'supply': shares_out,  # Total shares as supply
+            'price': price,
+            'whale_supply': shares_out - equity_float,  # Non-float shares (institutional holdings)
+
+            # Additional equity-specific metrics
+            'equity_float': equity_float,
+            'market_cap': market_cap,
+            'float_ratio': float_ratio,
+            'cash_to_market_cap': cash_to_market_cap,
+
+            # Metadata
+            'timestamp': datetime.utcnow().isoformat(),
+            'data_type': 'equity'
+        })
+        frame = frame[~invalid].reset_index(drop=True)
+
+        if invalid.any():
+            logger.warning("Skipped %d rows with non-numeric values", int(invalid.sum()))
+
+        return EquitySnapshots(frame, invalid)
+
+    def transform_equity_to_snapshots(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Transform equity data to risk snapshot format
+
+        Same as ``transform_equity_to_frame``, materialized as a list of
+        snapshot dictionaries.
+
+        Returns:
+            List of snapshot dictionaries
+        """
+        return self.transform_equity_to_frame(df).to_dicts()
 
     def validate_data(self, df: pd.DataFrame, required_columns: List[str]) -> tuple[bool, List[str]]:
         """
@@ -164,37 +287,74 @@ class ExcelImporter:
         
         return (len(missing) == 0, list(missing))
 
-    def get_data_summary(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def get_data_summary(self, df: pd.DataFrame, exact: Optional[bool] = None) -> Dict[str, Any]:
         """
         Get summary statistics of imported data
         
         Args:
             df: DataFrame to summarize
+            exact: Exact median via pandas (default: only up to
+                EXACT_SUMMARY_ROWS rows); otherwise one pass with an
+                approximate median
             
         Returns:
             Dictionary with summary statistics
         """
+        if exact is None:
+            exact = len(df) <= self.EXACT_SUMMARY_ROWS
+        if not exact:
+            return self.summarize_chunks([df])
+
         summary = {
             'row_count': len(df),
             'column_count': len(df.columns),
             'columns': list(df.columns),
             'null_counts': df.isnull().sum().to_dict(),
             'numeric_columns': list(df.select_dtypes(include=[np.number]).columns),
-            'basic_stats': {}
+            'basic_stats': {},
+            'exact': True
         }
         
-        # Add basic stats for numeric columns
+        # Add basic stats for numeric columns, each statistic computed for all of them at once
+        numeric = df[summary['numeric_columns']]
+        minimum, maximum, mean, std = numeric.min(), numeric.max(), numeric.mean(), numeric.std()
+        quantiles = numeric.quantile([0.5] + [p / 100.0 for p in self.SUMMARY_PERCENTILES])
         for col in summary['numeric_columns']:
+            levels = quantiles[col].tolist()
             summary['basic_stats'][col] = {
-                'min': float(df[col].min()),
-                'max': float(df[col].max()),
-                'mean': float(df[col].mean()),
-                'median': float(df[col].median()),
-                'std': float(df[col].std())
+                'min': float(minimum[col]),
+                'max': float(maximum[col]),
+                'mean': float(mean[col]),
+                'median': float(levels[0]),
+                'std': float(std[col]),
+                **{percentile_key(p): float(q) for p, q in zip(self.SUMMARY_PERCENTILES, levels[1:])}
             }
         
         return summary
 
+    def summarize_chunks(self, chunks: Iterable[pd.DataFrame]) -> Dict[str, Any]:
+        """
+        Summary statistics over chunked input in a single pass
+
+        Same fields as ``get_data_summary``; count, nulls, min, max, mean
+        and std are exact, the median and percentiles come from a quantile
+        sketch.
+
+        Args:
+            chunks: DataFrames with consecutive rows, e.g. from ``iter_chunks``
+
+        Returns:
+            Dictionary with summary statistics
+        """
+        return self.summary_accumulator().update_all(chunks).result()
+
+    def summary_accumulator(self) -> SummaryAccumulator:
+        """
+        Empty one-pass summary, for callers that consume the chunks
+        themselves: ``update(chunk)`` each one, then ``result()``.
+        """
+        return SummaryAccumulator(percentiles=self.SUMMARY_PERCENTILES)
+
 
 # Singleton instance
 EXCEL_IMPORTER = ExcelImporter()
@@ -1,12 +1,98 @@
-from backend.http_client import get_retry_session
+from data_layer.collectors.price_aggregator import PriceAggregator, PriceUnavailable, build_venues
+from data_layer.collectors.price_feed import PriceFeedClient
+from data_layer.ttl_cache import TTLCache
+
+DEFAULT_VENUES = ("binance", "kraken", "coinbase")
+# USD-quoted like the REST venues, so stream and REST prices are comparable
+FEED_SYMBOL = "USDCUSD"
+
+PRICE_AGGREGATOR = PriceAggregator(build_venues(DEFAULT_VENUES))
+
+# Dashboards poll this many times a second; one venue fan-out per TTL is enough
+PRICE_CACHE = TTLCache(ttl=2.0, max_stale=30.0)
+
+# Streaming feed, if started; ticks older than FEED_MAX_AGE fall back to REST
+PRICE_FEED = None
+FEED_MAX_AGE = 5.0
+
+
+def start_price_feed(url, symbol=FEED_SYMBOL, max_age=FEED_MAX_AGE, extra_symbols=()):
+    """
+    Start the process-wide streaming price feed (idempotent).
+
+    ``symbol`` is the one get_exchange_data reads; ``extra_symbols`` are
+    subscribed on the same connection for other assets' exchange sources.
+    """
+    global PRICE_FEED, FEED_SYMBOL, FEED_MAX_AGE
+    if PRICE_FEED is None:
+        FEED_SYMBOL = symbol.upper()
+        FEED_MAX_AGE = max_age
+        symbols = [FEED_SYMBOL] + [s.upper() for s in extra_symbols if s.upper() != FEED_SYMBOL]
+        PRICE_FEED = PriceFeedClient(url, symbols=symbols)
+        PRICE_FEED.start()
+    return PRICE_FEED
+
+
+def stop_price_feed():
+    global PRICE_FEED
+    if PRICE_FEED is not None:
+        PRICE_FEED.stop()
+        PRICE_FEED = None
+
 
 def get_exchange_data():
-    url = "https://api.binance.com/api/v3/ticker/price?symbol=USDCUSDT"
-    try:
-        session = get_retry_session()
-        response = session.get(url, timeout=5)
-        data = response.json()
-        price = float(data.get("price", 1.0))
-    except Exception:
-        price = 1.0
-    return {"price": price}
\ No newline at end of file
+    """
+    USDC price with its age in seconds.
+
+    Served from the streaming feed's in-memory table when it has a recent
+    tick; otherwise the median across REST venues, with the cross-venue
+    spread (cached, see PRICE_CACHE).
+
+    Raises PriceUnavailable when no venue answers and no cached quote is
+    left, rather than pretending the peg holds.
+    """
+    return _quote("USDC", PRICE_AGGREGATOR, FEED_SYMBOL)
+
+
+def exchange_source(asset, venues=DEFAULT_VENUES, feed_symbol=None):
+    """
+    ``get_exchange_data`` for another asset.
+
+    The returned function quotes ``asset`` on its own venue pairs, with its
+    own circuit breakers and PRICE_CACHE entry; the aggregator settings and
+    thread pool are shared with PRICE_AGGREGATOR.
+    """
+    aggregator = PriceAggregator(
+        build_venues(venues, asset=asset),
+        budget=PRICE_AGGREGATOR.budget,
+        hedge_after=PRICE_AGGREGATOR.hedge_after,
+        failure_threshold=PRICE_AGGREGATOR.failure_threshold,
+        reset_timeout=PRICE_AGGREGATOR.reset_timeout,
+        executor=PRICE_AGGREGATOR._executor,
+    )
+    return lambda: _quote(asset, aggregator, feed_symbol)
+
+
+def _quote(asset, aggregator, feed_symbol):
+    feed = PRICE_FEED
+    if feed is not None and feed_symbol:
+        tick = feed.get(feed_symbol)
+        if tick is not None:
+            age = feed.age(feed_symbol)
+            if age <= FEED_MAX_AGE:
+                return {"price": tick.price, "age_s": age, "source": "stream", "seq": tick.seq}
+
+    quote, age = PRICE_CACHE.get(asset, aggregator.aggregate)
+    if age > PRICE_CACHE.max_stale:
+        # The cache falls back to its last value when every venue fails; past
+        # max_stale that value says nothing about the current peg
+        raise PriceUnavailable(f"{asset}: last quote is {age:.0f}s old and no venue answered")
+    return {
+        "price": quote["price"],
+        "spread": quote["spread"],
+        "spread_bps": quote["spread_bps"],
+        "venue_count": quote["venue_count"],
+        "venues": quote["venues"],
+        "age_s": age,
+        "source": "rest",
+    }
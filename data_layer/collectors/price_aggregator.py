@@ -0,0 +1,231 @@
+"""
+Multi-venue stablecoin price aggregation.
+
+``PriceAggregator.aggregate`` asks every venue adapter concurrently and
+returns the median price and the spread across venues, within one latency
+budget:
+
+- a venue that has not answered after ``hedge_after`` seconds gets a
+  second, identical request (hedging), and whichever answers first wins;
+- a venue that fails ``failure_threshold`` times in a row is skipped by
+  its circuit breaker for ``reset_timeout`` seconds, then a single probe
+  request is let through (concurrent callers keep skipping it until the
+  probe has succeeded or failed);
+- anything still outstanding when the budget runs out is a timeout.
+"""
+
+import statistics
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from backend.http_client import HTTP_CLIENT
+
+
+class PriceUnavailable(Exception):
+    """No venue returned a price within the budget."""
+
+
+class VenueAdapter:
+    """One venue's ticker endpoint and how to read the price from its JSON."""
+
+    def __init__(self, name: str, base_url: str, path: str, parse: Callable[[Any], float]):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.path = path
+        self.parse = parse
+
+    @property
+    def url(self) -> str:
+        return self.base_url + self.path
+
+    def fetch(self, timeout: float) -> float:
+        response = HTTP_CLIENT.get(self.url, timeout=timeout)
+        response.raise_for_status()
+        price = float(self.parse(response.json()))
+        if not price > 0:
+            raise ValueError(f"{self.name} returned a non-positive price: {price}")
+        return price
+
+
+def _kraken_price(data):
+    if data.get("error"):
+        raise ValueError(f"kraken: {data['error']}")
+    return next(iter(data["result"].values()))["c"][0]
+
+
+# Adapters keyed by name, all quoting ``asset`` against USD so the median and
+# spread compare like with like (binance.com only lists USDT pairs, and USDT
+# is itself a stablecoin that can depeg, so Binance.US's USD book is used);
+# base URLs can be overridden (e.g. for a mock server)
+VENUES = {
+    "binance": lambda base_url="https://api.binance.us", asset="USDC": VenueAdapter(
+        "binance", base_url, f"/api/v3/ticker/price?symbol={asset}USD", lambda d: d["price"]),
+    "kraken": lambda base_url="https://api.kraken.com", asset="USDC": VenueAdapter(
+        "kraken", base_url, f"/0/public/Ticker?pair={asset}USD", _kraken_price),
+    "coinbase": lambda base_url="https://api.coinbase.com", asset="USDC": VenueAdapter(
+        "coinbase", base_url, f"/v2/prices/{asset}-USD/spot", lambda d: d["data"]["amount"]),
+}
+
+
+def build_venues(names: Sequence[str], base_urls: Optional[Dict[str, str]] = None,
+                 asset: str = "USDC") -> List[VenueAdapter]:
+    base_urls = base_urls or {}
+    venues = []
+    for name in names:
+        if name not in VENUES:
+            raise ValueError(f"Unknown price venue: {name}. Known: {sorted(VENUES)}")
+        factory = VENUES[name]
+        if name in base_urls:
+            venues.append(factory(base_urls[name], asset=asset))
+        else:
+            venues.append(factory(asset=asset))
+    return venues
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+                return False
+            # Half-open: this caller is the one probe until it reports back
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            # A failed half-open probe re-opens the breaker for another period
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class PriceAggregator:
+    def __init__(self, venues: Sequence[VenueAdapter], budget: float = 0.2,
+                 hedge_after: float = 0.08, failure_threshold: int = 3,
+                 reset_timeout: float = 30.0, max_workers: int = 16,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.budget = budget
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.set_venues(venues)
+        # Per-asset aggregators can share one pool instead of 16 threads each
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="price-venue")
+
+    def set_venues(self, venues: Sequence[VenueAdapter]):
+        """Replace the venue list; known venues keep their breaker state."""
+        old = getattr(self, "breakers", {})
+        self.venues = list(venues)
+        self.breakers = {}
+        for venue in self.venues:
+            breaker = old.get(venue.name) or CircuitBreaker()
+            breaker.failure_threshold = self.failure_threshold
+            breaker.reset_timeout = self.reset_timeout
+            self.breakers[venue.name] = breaker
+
+    def _timed_fetch(self, venue: VenueAdapter, timeout: float):
+        start = time.perf_counter()
+        price = venue.fetch(timeout)
+        return price, (time.perf_counter() - start) * 1000.0
+
+    def aggregate(self) -> Dict[str, Any]:
+        """
+        Median price and spread over the venues that answered in time.
+
+        Raises PriceUnavailable if none did.
+        """
+        start = time.monotonic()
+        deadline = start + self.budget
+        report = {}
+        attempts = {}
+
+        for venue in self.venues:
+            if not self.breakers[venue.name].allow():
+                report[venue.name] = {"status": "circuit_open"}
+                continue
+            attempts[venue.name] = [self._executor.submit(self._timed_fetch, venue, self.budget)]
+
+        # Hedge the venues that are still slow after hedge_after
+        all_futures = [f for futures in attempts.values() for f in futures]
+        wait(all_futures, timeout=max(0.0, min(self.hedge_after, self.budget)))
+        for venue in self.venues:
+            futures = attempts.get(venue.name)
+            if futures and not futures[0].done() and time.monotonic() < deadline:
+                remaining = deadline - time.monotonic()
+                futures.append(self._executor.submit(self._timed_fetch, venue, remaining))
+
+        # Each venue is done as soon as one attempt succeeds or all have failed
+        pending = {name: list(futures) for name, futures in attempts.items()}
+        while pending:
+            for name in list(pending):
+                futures = pending[name]
+                winner = next((f for f in futures if f.done() and f.exception() is None), None)
+                if winner is not None:
+                    price, latency_ms = winner.result()
+                    report[name] = {
+                        "status": "ok",
+                        "price": price,
+                        "latency_ms": latency_ms,
+                        "hedged": len(futures) > 1,
+                    }
+                    self.breakers[name].record_success()
+                    del pending[name]
+                elif all(f.done() for f in futures):
+                    report[name] = {"status": "error", "error": str(futures[-1].exception())}
+                    self.breakers[name].record_failure()
+                    del pending[name]
+
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            wait([f for futures in pending.values() for f in futures if not f.done()],
+                 timeout=remaining, return_when=FIRST_COMPLETED)
+
+        for name in pending:
+            report[name] = {"status": "timeout"}
+            self.breakers[name].record_failure()
+
+        prices = [v["price"] for v in report.values() if v["status"] == "ok"]
+        if not prices:
+            raise PriceUnavailable(
+                "no venue answered: " + ", ".join(f"{n}={v['status']}" for n, v in report.items())
+            )
+
+        median = statistics.median(prices)
+        spread = max(prices) - min(prices)
+        return {
+            "price": median,
+            "spread": spread,
+            "spread_bps": spread / median * 1e4,
+            "venue_count": len(prices),
+            "venues": report,
+            "latency_ms": (time.monotonic() - start) * 1000.0,
+        }
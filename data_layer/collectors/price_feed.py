@@ -0,0 +1,140 @@
+"""
+Streaming price feed client.
+
+``PriceFeedClient`` keeps one websocket open to a trade stream (Binance's
+``<symbol>@trade`` format by default) on a background thread and writes
+every tick into an in-memory table. Readers call ``get``, which is a plain
+dict lookup: no lock, no network. The connection is re-established with
+exponential backoff, and per-symbol sequence numbers (trade IDs) are
+checked so that missed or out-of-order messages show up in ``stats()``.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PriceTick(NamedTuple):
+    symbol: str
+    price: float
+    seq: int
+    received_at: float  # time.monotonic()
+
+
+def parse_binance_trade(message: Dict[str, Any]) -> Optional[tuple]:
+    """(symbol, price, seq) from a Binance trade event; None for other messages."""
+    if message.get("e") != "trade":
+        return None
+    return message["s"], float(message["p"]), int(message["t"])
+
+
+class PriceFeedClient:
+    def __init__(self, url: str, symbols: Iterable[str] = ("USDCUSD",),
+                 parse: Callable[[Dict[str, Any]], Optional[tuple]] = parse_binance_trade,
+                 reconnect_initial: float = 0.5, reconnect_max: float = 30.0):
+        self.url = url
+        self.symbols = [s.upper() for s in symbols]
+        self.parse = parse
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+
+        # Replaced entry by entry from the feed thread; reads need no lock
+        self._ticks: Dict[str, PriceTick] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._ws = None
+
+        self.connected = threading.Event()
+        self.connects = 0
+        self.messages = 0
+        self.missed = 0
+        self.out_of_order = 0
+
+    # -- reading --------------------------------------------------------------
+
+    def get(self, symbol: str) -> Optional[PriceTick]:
+        return self._ticks.get(symbol.upper())
+
+    def age(self, symbol: str) -> Optional[float]:
+        tick = self.get(symbol)
+        return None if tick is None else time.monotonic() - tick.received_at
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected.is_set(),
+            "reconnects": max(0, self.connects - 1),
+            "messages": self.messages,
+            "missed": self.missed,
+            "out_of_order": self.out_of_order,
+        }
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="price-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            ws.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        from websockets.sync.client import connect
+
+        delay = self.reconnect_initial
+        while not self._stop.is_set():
+            try:
+                with connect(self.url, open_timeout=5) as ws:
+                    self._ws = ws
+                    self._subscribe(ws)
+                    self.connects += 1
+                    self.connected.set()
+                    delay = self.reconnect_initial
+                    self._receive(ws)
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning("Price feed %s disconnected: %s", self.url, e)
+            finally:
+                self._ws = None
+                self.connected.clear()
+
+            # Exponential backoff with jitter so many workers don't reconnect in lockstep
+            if self._stop.wait(delay * random.uniform(0.5, 1.0)):
+                break
+            delay = min(delay * 2, self.reconnect_max)
+
+    def _subscribe(self, ws):
+        streams = [f"{symbol.lower()}@trade" for symbol in self.symbols]
+        ws.send(json.dumps({"method": "SUBSCRIBE", "params": streams, "id": 1}))
+
+    def _receive(self, ws):
+        while not self._stop.is_set():
+            try:
+                raw = ws.recv(timeout=1.0)
+            except TimeoutError:
+                continue
+            parsed = self.parse(json.loads(raw))
+            if parsed is not None:
+                self._on_tick(*parsed)
+
+    def _on_tick(self, symbol: str, price: float, seq: int):
+        self.messages += 1
+        previous = self._ticks.get(symbol)
+        if previous is not None:
+            if seq <= previous.seq:
+                self.out_of_order += 1
+                return
+            self.missed += seq - previous.seq - 1
+        self._ticks[symbol] = PriceTick(symbol, price, seq, time.monotonic())
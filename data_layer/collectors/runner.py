@@ -0,0 +1,189 @@
+"""
+Concurrent collector fan-out.
+
+``CollectorRunner.collect`` starts every source on a shared thread pool and
+waits for all of them up to one overall deadline, so a live snapshot costs
+the slowest source (capped at the deadline) instead of the sum of all of
+them. A source that misses the deadline or fails is reported as stale and
+its last good result is used instead, as long as that is at most
+``max_stale`` seconds old; otherwise the source has no data and is listed
+in ``missing_sources``. Callers must not store or score a snapshot with
+missing sources (its fields are None, not made-up defaults). A source that
+is still running from an earlier call is not started again; the pending
+call is awaited.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from data_layer.collectors.blockchain_fetcher import get_blockchain_data
+from data_layer.collectors.exchange_fetcher import get_exchange_data
+from data_layer.collectors.mock_custodian import get_custodian_data
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCES = {
+    "chain": get_blockchain_data,
+    "custodian": get_custodian_data,
+    "exchange": get_exchange_data,
+}
+
+
+class SourcesUnavailable(Exception):
+    """Required sources have neither a fresh nor a recent enough last good result."""
+
+    def __init__(self, missing, sources):
+        super().__init__("no data from: " + ", ".join(missing))
+        self.missing = list(missing)
+        self.sources = sources
+
+
+def _number(data: Optional[dict], key: str) -> Optional[float]:
+    if not data or data.get(key) is None:
+        return None
+    return float(data[key])
+
+
+class CollectionResult:
+    """Per-source data (None if unavailable) plus freshness metadata."""
+
+    def __init__(self, data: Dict[str, Optional[dict]], sources: Dict[str, Dict[str, Any]]):
+        self.data = data
+        self.sources = sources
+
+    @property
+    def stale_sources(self):
+        return [name for name, meta in self.sources.items() if meta["stale"]]
+
+    @property
+    def missing_sources(self):
+        """Sources with no usable data: failed now and no recent last good result."""
+        return [name for name, value in self.data.items() if value is None]
+
+    def require(self):
+        """Raise SourcesUnavailable if any source is missing."""
+        if self.missing_sources:
+            raise SourcesUnavailable(self.missing_sources, self.sources)
+        return self
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Risk snapshot from the chain, custodian and exchange results.
+
+        Fields of a missing source are None; check ``missing_sources``
+        before storing or scoring it.
+        """
+        chain = self.data.get("chain")
+        cust = self.data.get("custodian")
+        exch = self.data.get("exchange")
+        return {
+            "reserves": _number(cust, "totalReserves"),
+            "custodians": cust.get("custodians", []) if cust else None,
+            "supply": _number(chain, "circulatingSupply"),
+            "whale_supply": _number(chain, "whale_supply"),
+            "price": _number(exch, "price"),
+            "price_age_s": exch.get("age_s") if exch else None,
+            "price_spread_bps": exch.get("spread_bps") if exch else None,
+        }
+
+
+class CollectorRunner:
+    def __init__(self, sources: Optional[Dict[str, Callable[[], dict]]] = None,
+                 deadline: float = 0.25, max_workers: int = 8, max_stale: float = 300.0):
+        self.sources = dict(sources or DEFAULT_SOURCES)
+        self.deadline = deadline
+        # Oldest last good result a failed source may fall back to
+        self.max_stale = max_stale
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collector")
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_good = {}
+
+    def set_max_workers(self, max_workers: int):
+        """Swap in a pool of a different size; running fetches finish on the old one."""
+        if max_workers == self.max_workers:
+            return
+        old = self._executor
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collector")
+        self.max_workers = max_workers
+        old.shutdown(wait=False)
+
+    def _timed(self, fetch: Callable[[], dict]):
+        start = time.perf_counter()
+        value = fetch()
+        return value, (time.perf_counter() - start) * 1000.0, time.time()
+
+    def _submit(self, name: str, fetch: Callable[[], dict]):
+        with self._lock:
+            future = self._pending.get(name)
+            if future is not None and not future.done():
+                return future
+            future = self._executor.submit(self._timed, fetch)
+            self._pending[name] = future
+
+        # Late results still refresh the fallback for the next call
+        future.add_done_callback(lambda f: self._record(name, f))
+        return future
+
+    def _record(self, name: str, future):
+        if future.exception() is not None:
+            return
+        value, _, fetched_at = future.result()
+        with self._lock:
+            _, last_fetched_at = self._last_good.get(name, (None, 0.0))
+            if fetched_at >= last_fetched_at:
+                self._last_good[name] = (value, fetched_at)
+
+    def collect(self, sources: Optional[Dict[str, Callable[[], dict]]] = None,
+                deadline: Optional[float] = None) -> CollectionResult:
+        """
+        Fetch all sources concurrently, waiting at most ``deadline`` seconds.
+
+        Args:
+            sources: name -> fetch function (default: the runner's sources)
+            deadline: overall wait in seconds (default: ``self.deadline``)
+        """
+        sources = sources or self.sources
+        deadline = self.deadline if deadline is None else deadline
+
+        futures = {name: self._submit(name, fetch) for name, fetch in sources.items()}
+        wait(futures.values(), timeout=deadline)
+
+        now = time.time()
+        data = {}
+        meta = {}
+        for name, future in futures.items():
+            error = None
+            latency_ms = None
+            if future.done():
+                if future.exception() is not None:
+                    error = str(future.exception())
+                    logger.warning("Collector %s failed: %s", name, error)
+                else:
+                    latency_ms = future.result()[1]
+                    # The done-callback may not have run yet
+                    self._record(name, future)
+            else:
+                error = "deadline exceeded"
+
+            with self._lock:
+                value, fetched_at = self._last_good.get(name, (None, None))
+            if fetched_at is not None and now - fetched_at > self.max_stale:
+                value = None
+            data[name] = value
+            meta[name] = {
+                "stale": error is not None,
+                "error": error,
+                "latency_ms": latency_ms,
+                "age_s": None if fetched_at is None else max(0.0, now - fetched_at),
+            }
+
+        return CollectionResult(data, meta)
+
+
+# Singleton instance
+COLLECTOR_RUNNER = CollectorRunner()
@@ -0,0 +1,327 @@
+"""
+Compacted segments for the per-snapshot JSON files in data_layer/snapshots.
+
+``compact_snapshots`` packs old ``snapshot_<ts>.json`` files into segment
+files under ``data_layer/snapshots/segments/`` and deletes each original
+only after its record has been read back from the written segment and
+compared. A segment is::
+
+    b"SNAPSEG1" | u32 len | zlib dictionary      header
+    zlib(json) | zlib(json) | ...                 one record per snapshot
+    index                                         (timestamp ns, offset, length, crc32) per record
+    u64 index offset | u32 count | u32 index crc32 | b"SNAPSEG1"
+
+Records are compressed one by one, primed with a dictionary (the first
+snapshot's JSON) since individual snapshots are too small to compress
+well on their own, so any snapshot can be read without inflating its
+neighbours. The index is sorted by timestamp and memory-mapped for
+lookups, and segment file names carry their first and last timestamp, so
+finding a snapshot opens only the segment that can contain it.
+"""
+
+import bisect
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from data_layer.snapshot_store import to_ns
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = "data_layer/snapshots"
+SEGMENT_SUBDIR = "segments"
+
+MAGIC = b"SNAPSEG1"
+INDEX_DTYPE = np.dtype([("timestamp", "<i8"), ("offset", "<i8"), ("length", "<u4"), ("crc32", "<u4")])
+_FOOTER = struct.Struct("<QII8s")
+
+
+class CorruptSegment(Exception):
+    """A segment or one of its records failed its checksum."""
+
+
+def snapshot_timestamp(filename: str) -> Optional[str]:
+    """ISO timestamp from a ``snapshot_2025-12-23T19-28-36.344209Z.json`` name, or None."""
+    name = os.path.basename(filename)
+    if not (name.startswith("snapshot_") and name.endswith(".json")):
+        return None
+    date, _, clock = name[len("snapshot_"):-len(".json")].partition("T")
+    if not clock:
+        return None
+    # collect_snapshot replaced ':' with '-' to make the name file-safe
+    return f"{date}T{clock.replace('-', ':', 2)}"
+
+
+def _ns(timestamp: Any) -> int:
+    if isinstance(timestamp, (int, np.integer)):
+        return int(timestamp)
+    return int(to_ns([timestamp])[0])
+
+
+def _segment_range(name: str) -> Optional[Tuple[int, int]]:
+    if not (name.startswith("segment_") and name.endswith(".seg")):
+        return None
+    try:
+        # A third part, if any, only makes the name unique
+        first, last = name[len("segment_"):-len(".seg")].split("_")[:2]
+        return int(first), int(last)
+    except ValueError:
+        return None
+
+
+class Segment:
+    """Read-only access to one segment file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            header = f.read(len(MAGIC) + 4)
+            if header[:len(MAGIC)] != MAGIC or size < len(header) + _FOOTER.size:
+                raise CorruptSegment(f"{path}: not a snapshot segment")
+            (dict_len,) = struct.unpack("<I", header[len(MAGIC):])
+            self._zdict = f.read(dict_len)
+
+            f.seek(size - _FOOTER.size)
+            index_offset, count, index_crc, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            if magic != MAGIC:
+                raise CorruptSegment(f"{path}: truncated (no footer)")
+            f.seek(index_offset)
+            if zlib.crc32(f.read(count * INDEX_DTYPE.itemsize)) != index_crc:
+                raise CorruptSegment(f"{path}: index checksum mismatch")
+
+        if count:
+            self.index = np.memmap(path, dtype=INDEX_DTYPE, mode="r", offset=index_offset, shape=(count,))
+        else:
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.index["timestamp"]
+
+    def _read(self, f, entry) -> Dict[str, Any]:
+        f.seek(int(entry["offset"]))
+        data = f.read(int(entry["length"]))
+        if zlib.crc32(data) != int(entry["crc32"]):
+            raise CorruptSegment(f"{self.path}: record at offset {int(entry['offset'])} fails its checksum")
+        inflate = zlib.decompressobj(zdict=self._zdict)
+        return json.loads(inflate.decompress(data) + inflate.flush())
+
+    def get(self, timestamp: Any) -> Optional[Dict[str, Any]]:
+        """The snapshot taken at ``timestamp`` (exact match), or None."""
+        ns = _ns(timestamp)
+        i = int(np.searchsorted(self.timestamps, ns))
+        if i == len(self) or int(self.timestamps[i]) != ns:
+            return None
+        with open(self.path, "rb") as f:
+            return self._read(f, self.index[i])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, "rb") as f:
+            for entry in self.index:
+                yield self._read(f, entry)
+
+
+def write_segment(path: str, snapshots: List[Dict[str, Any]]) -> str:
+    """Write snapshots (sorted by timestamp) to ``path`` atomically."""
+    stamps = to_ns([s["timestamp"] for s in snapshots])
+    order = np.argsort(stamps, kind="stable")
+    zdict = json.dumps(snapshots[int(order[0])], separators=(",", ":")).encode() if snapshots else b""
+
+    index = np.zeros(len(snapshots), dtype=INDEX_DTYPE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(zdict)) + zdict)
+        for row, i in enumerate(order):
+            deflate = zlib.compressobj(level=9, zdict=zdict)
+            data = deflate.compress(json.dumps(snapshots[i], separators=(",", ":")).encode()) + deflate.flush()
+            index[row] = (stamps[i], f.tell(), len(data), zlib.crc32(data))
+            f.write(data)
+
+        index_offset = f.tell()
+        index_bytes = index.tobytes()
+        f.write(index_bytes)
+        f.write(_FOOTER.pack(index_offset, len(index), zlib.crc32(index_bytes), MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+class SegmentSet:
+    """
+    All segments in a directory, located by the time range in their names.
+
+    The directory is listed on the first lookup and segments stay open
+    once used, so a lookup costs a binary search over the names plus an
+    index search in the (usually one) segment whose range covers it.
+    """
+
+    def __init__(self, segment_dir: str):
+        self.segment_dir = segment_dir
+        self._firsts = None
+        self._reach = None
+        self._bounds = None
+        self._open: Dict[str, Segment] = {}
+
+    def segments(self) -> List[Tuple[int, int, str]]:
+        if not os.path.isdir(self.segment_dir):
+            return []
+        found = []
+        for entry in os.scandir(self.segment_dir):
+            bounds = _segment_range(entry.name)
+            if bounds is not None:
+                found.append((bounds[0], bounds[1], entry.path))
+        return sorted(found)
+
+    def _covering(self, ns: int) -> Iterator[Segment]:
+        """Open segments whose name range includes ``ns``, latest-starting first."""
+        if self._bounds is None:
+            self._bounds = self.segments()
+            self._firsts = [first for first, _, _ in self._bounds]
+            # Largest last timestamp up to each position: ranges may overlap
+            self._reach = np.maximum.accumulate([last for _, last, _ in self._bounds]) if self._bounds else []
+
+        i = bisect.bisect_right(self._firsts, ns)
+        while i > 0 and self._reach[i - 1] >= ns:
+            i -= 1
+            _, last, path = self._bounds[i]
+            if last >= ns:
+                if path not in self._open:
+                    self._open[path] = Segment(path)
+                yield self._open[path]
+
+    def get(self, timestamp: Any) -> Optional[Dict[str, Any]]:
+        ns = _ns(timestamp)
+        for segment in self._covering(ns):
+            snapshot = segment.get(ns)
+            if snapshot is not None:
+                return snapshot
+        return None
+
+
+def segment_dir_for(snapshot_dir: str) -> str:
+    return os.path.join(snapshot_dir, SEGMENT_SUBDIR)
+
+
+def load_snapshot(path: str) -> Dict[str, Any]:
+    """
+    Read a snapshot JSON file, or - once it has been compacted - the same
+    snapshot out of the segments next to it.
+    """
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    timestamp = snapshot_timestamp(path)
+    if timestamp is not None:
+        snapshot = SegmentSet(segment_dir_for(os.path.dirname(path) or ".")).get(timestamp)
+        if snapshot is not None:
+            return snapshot
+    raise FileNotFoundError(f"Snapshot not found: {path}")
+
+
+def compact_snapshots(snapshot_dir: str = SNAPSHOT_DIR, min_age_s: float = 86_400,
+                      max_per_segment: int = 100_000, delete: bool = True) -> List[str]:
+    """
+    Pack snapshot JSON files older than ``min_age_s`` into segments.
+
+    Originals are deleted (with ``delete``) only after every record of the
+    new segment has been read back and matched. Files already present in
+    an earlier segment (e.g. after a crash before deletion) are not packed
+    again. Returns the paths of the new segments.
+    """
+    segment_dir = segment_dir_for(snapshot_dir)
+    os.makedirs(segment_dir, exist_ok=True)
+    # Looks candidates up by the ranges in the segment names, without reading every index
+    existing = SegmentSet(segment_dir)
+
+    cutoff = time.time() - min_age_s
+    candidates = []
+    for entry in os.scandir(snapshot_dir):
+        timestamp = snapshot_timestamp(entry.name)
+        if timestamp is None or not entry.is_file() or entry.stat().st_mtime > cutoff:
+            continue
+        candidates.append((_ns(timestamp), entry.path))
+    candidates.sort()
+
+    written = []
+    for start in range(0, len(candidates), max_per_segment):
+        batch = []
+        for ns, path in candidates[start:start + max_per_segment]:
+            with open(path, "r") as f:
+                snapshot = json.load(f)
+            if existing.get(ns) == snapshot:
+                if delete:
+                    os.remove(path)
+                continue
+            batch.append((path, snapshot))
+        if not batch:
+            continue
+
+        snapshots = [snapshot for _, snapshot in batch]
+        stamps = to_ns([s["timestamp"] for s in snapshots])
+        segment_path = os.path.join(segment_dir, f"segment_{stamps.min():019d}_{stamps.max():019d}.seg")
+        if os.path.exists(segment_path):
+            segment_path = segment_path[:-len(".seg")] + f"_{int(time.time() * 1e6)}.seg"
+        write_segment(segment_path, snapshots)
+
+        # Verify before deleting anything
+        segment = Segment(segment_path)
+        stored = {}
+        for record in segment:
+            stored.setdefault(record["timestamp"], []).append(record)
+        for path, snapshot in batch:
+            if snapshot not in stored.get(snapshot["timestamp"], []):
+                raise CorruptSegment(f"{segment_path}: {path} did not read back identically")
+
+        if delete:
+            for path, _ in batch:
+                os.remove(path)
+        logger.info("Compacted %d snapshots into %s", len(batch), segment_path)
+        written.append(segment_path)
+    return written
+
+
+class SnapshotCompactor:
+    """Runs compact_snapshots every ``interval`` seconds in a daemon thread."""
+
+    def __init__(self, snapshot_dir: str = SNAPSHOT_DIR, interval: float = 3600.0,
+                 min_age_s: float = 86_400):
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self.min_age_s = min_age_s
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not os.path.isdir(self.snapshot_dir):
+                continue
+            try:
+                compact_snapshots(self.snapshot_dir, min_age_s=self.min_age_s)
+            except Exception:
+                logger.exception("Snapshot compaction failed")
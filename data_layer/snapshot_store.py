@@ -0,0 +1,317 @@
+"""
+Append-only, time-partitioned columnar store for collected snapshots.
+
+Layout (one directory per UTC month)::
+
+    data/snapshot_store/
+        2025-12/timestamp.i8          # int64 ns since epoch, non-decreasing
+        2025-12/reserves.f8           # float64, one value per row
+        2025-12/supply.f8
+        2025-12/whale_supply.f8
+        2025-12/price.f8
+        2025-12/custodians.values.f8  # all custodian balances, concatenated
+        2025-12/custodians.ends.i8    # end offset of each row's balances
+
+Every column is a raw little-endian array, so appending is a plain write
+at the end of each file and reading is ``np.memmap`` - no parsing. The
+timestamp column is written last and defines the row count: a crash in
+the middle of an append (or a write that failed part-way) leaves extra
+bytes in the other columns, which readers ignore and every append
+truncates before writing.
+
+Timestamps are sorted within and across partitions, so they double as the
+time index: ``query(start, end)`` skips months outside the range by name
+and binary-searches the mapped timestamp column of the others, then
+slices just those rows out of the requested columns.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_ROOT = "data/snapshot_store"
+LEGACY_CSV = "data/historical_snapshots.csv"
+
+TIMESTAMP = "timestamp"
+CUSTODIANS = "custodians"
+# Fixed-width columns besides the timestamp
+NUMERIC_COLUMNS = ("reserves", "supply", "whale_supply", "price")
+COLUMNS = (TIMESTAMP,) + NUMERIC_COLUMNS + (CUSTODIANS,)
+
+_TIMESTAMP_FILE = "timestamp.i8"
+_VALUES_FILE = "custodians.values.f8"
+_ENDS_FILE = "custodians.ends.i8"
+
+
+def to_ns(timestamps: Sequence[Any]) -> np.ndarray:
+    """Nanoseconds since the epoch (UTC) of ISO strings, datetimes or Timestamps."""
+    return pd.to_datetime(list(timestamps), utc=True, format="ISO8601").asi8
+
+
+def _balances(custodians: Any) -> np.ndarray:
+    if not isinstance(custodians, (list, tuple, np.ndarray)):
+        return np.empty(0)
+    return np.asarray(custodians, dtype=np.float64).ravel()
+
+
+def _column_file(name: str) -> str:
+    return _TIMESTAMP_FILE if name == TIMESTAMP else f"{name}.f8"
+
+
+def _map(path: str, dtype, count: int) -> np.ndarray:
+    """Read-only view of the first ``count`` items of a column file."""
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class Partition:
+    """Read-only view of one month; the arrays are memory-mapped."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        ts_path = os.path.join(path, _TIMESTAMP_FILE)
+        self.rows = os.path.getsize(ts_path) // 8 if os.path.exists(ts_path) else 0
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name: str) -> np.ndarray:
+        dtype = np.int64 if name == TIMESTAMP else np.float64
+        return _map(os.path.join(self.path, _column_file(name)), dtype, self.rows)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self.column(TIMESTAMP)
+
+    def custodians(self, start: int = 0, stop: Optional[int] = None) -> List[np.ndarray]:
+        """Custodian balances of rows ``start:stop``, one array per row."""
+        all_ends = _map(os.path.join(self.path, _ENDS_FILE), np.int64, self.rows)
+        ends = all_ends[start:stop]
+        if len(ends) == 0:
+            return []
+        first = int(all_ends[start - 1]) if start else 0
+        values = _map(os.path.join(self.path, _VALUES_FILE), np.float64, int(ends[-1]))
+        return np.split(np.asarray(values[first:]), np.asarray(ends[:-1]) - first)
+
+
+class SnapshotStore:
+    """
+    Single-writer, many-reader snapshot history.
+
+    Appends must be in time order (a batch is sorted first); an append
+    older than the newest stored row raises ValueError. With ``fsync`` the
+    column files are flushed to disk before ``append_many`` returns.
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def partitions(self) -> List[Partition]:
+        if not os.path.isdir(self.root):
+            return []
+        names = sorted(
+            entry.name for entry in os.scandir(self.root)
+            if entry.is_dir() and not entry.name.startswith(".")
+        )
+        return [Partition(os.path.join(self.root, name)) for name in names]
+
+    def __len__(self):
+        return sum(len(p) for p in self.partitions())
+
+    def last_timestamp(self) -> Optional[int]:
+        for partition in reversed(self.partitions()):
+            if len(partition):
+                return int(partition.timestamps[-1])
+        return None
+
+    # -- writing --------------------------------------------------------------
+
+    def append(self, snapshot: Dict[str, Any], fsync: bool = False):
+        self.append_many([snapshot], fsync=fsync)
+
+    def append_many(self, snapshots: Iterable[Dict[str, Any]], fsync: bool = False) -> int:
+        """Append snapshots (dicts with a ``timestamp``); returns the number written."""
+        rows = list(snapshots)
+        if not rows:
+            return 0
+        stamps = to_ns(row[TIMESTAMP] for row in rows)
+        order = np.argsort(stamps, kind="stable")
+        rows = [rows[i] for i in order]
+        stamps = stamps[order]
+
+        with self._lock:
+            last = self.last_timestamp()
+            if last is not None and stamps[0] < last:
+                raise ValueError(
+                    f"Snapshot at {np.datetime64(int(stamps[0]), 'ns')} is older than the "
+                    f"newest stored one ({np.datetime64(last, 'ns')}); the store is append-only"
+                )
+
+            months = stamps.view("datetime64[ns]").astype("datetime64[M]").astype(str)
+            for month in dict.fromkeys(months):
+                index = np.flatnonzero(months == month)
+                self._append_partition(month, [rows[i] for i in index], stamps[index], fsync)
+        return len(rows)
+
+    def _append_partition(self, month: str, rows: List[Dict[str, Any]],
+                          stamps: np.ndarray, fsync: bool):
+        path = os.path.join(self.root, month)
+        os.makedirs(path, exist_ok=True)
+        # Every time, not once per process: a failed write earlier in this
+        # process leaves bytes that would shift the rows appended after it
+        self._repair(path)
+
+        n_rows = Partition(path).rows
+        ends_path = os.path.join(path, _ENDS_FILE)
+        offset = int(_map(ends_path, np.int64, n_rows)[-1]) if n_rows else 0
+
+        balances = [_balances(row.get(CUSTODIANS)) for row in rows]
+        ends = offset + np.cumsum([len(b) for b in balances], dtype=np.int64)
+
+        writes = [
+            (_column_file(name), np.array([np.nan if row.get(name) is None else row[name] for row in rows],
+                                          dtype="<f8"))
+            for name in NUMERIC_COLUMNS
+        ]
+        writes.append((_VALUES_FILE, np.concatenate(balances).astype("<f8")))
+        writes.append((_ENDS_FILE, ends.astype("<i8")))
+        # Last: a row exists once its timestamp is written
+        writes.append((_TIMESTAMP_FILE, stamps.astype("<i8")))
+
+        for name, array in writes:
+            with open(os.path.join(path, name), "ab") as f:
+                f.write(array.tobytes())
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    def _repair(self, path: str):
+        """Cut columns back to the committed row count after an interrupted or failed append."""
+        rows = Partition(path).rows
+        for name in [_TIMESTAMP_FILE, _ENDS_FILE] + [_column_file(n) for n in NUMERIC_COLUMNS]:
+            self._truncate(os.path.join(path, name), rows * 8)
+        n_values = int(_map(os.path.join(path, _ENDS_FILE), np.int64, rows)[-1]) if rows else 0
+        self._truncate(os.path.join(path, _VALUES_FILE), n_values * 8)
+
+    @staticmethod
+    def _truncate(path: str, size: int):
+        if not os.path.exists(path):
+            # Create missing files so every column has the same rows
+            open(path, "ab").close()
+        if os.path.getsize(path) > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    # -- reading --------------------------------------------------------------
+
+    def _ranges(self, start: Optional[int], end: Optional[int]) -> List[tuple]:
+        """(partition, lo, hi) row ranges with ``start <= timestamp < end``."""
+        ranges = []
+        for partition in self.partitions():
+            if not len(partition):
+                continue
+            # Months entirely outside the range are skipped without mapping anything
+            month = np.datetime64(partition.name, "M")
+            if start is not None and (month + 1).astype("datetime64[ns]").astype(np.int64) <= start:
+                continue
+            if end is not None and month.astype("datetime64[ns]").astype(np.int64) >= end:
+                continue
+
+            # Binary search over the mapped index touches O(log n) pages
+            timestamps = partition.timestamps
+            lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+            hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="left"))
+            if hi > lo:
+                ranges.append((partition, lo, hi))
+        return ranges
+
+    def count(self, start: Any = None, end: Any = None) -> int:
+        """Number of snapshots with ``start <= timestamp < end``."""
+        start, end = self._bounds(start, end)
+        return sum(hi - lo for _, lo, hi in self._ranges(start, end))
+
+    @staticmethod
+    def _bounds(start: Any, end: Any) -> tuple:
+        return (None if start is None else int(to_ns([start])[0]),
+                None if end is None else int(to_ns([end])[0]))
+
+    def query(self, start: Any = None, end: Any = None, columns: Optional[Sequence[str]] = None,
+              offset: int = 0, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Snapshots with ``start <= timestamp < end``, oldest first.
+
+        ``start``/``end`` are anything ``pd.Timestamp`` accepts (naive means
+        UTC); None leaves that side open. ``columns`` defaults to the
+        timestamp and numeric columns; ask for ``"custodians"`` explicitly to
+        get one balance array per row. ``offset``/``limit`` page through the
+        range. Only the matching rows of the requested columns are read, and
+        ``timestamp`` is returned as naive UTC datetime64[ns].
+        """
+        columns = list(columns or (TIMESTAMP,) + NUMERIC_COLUMNS)
+        unknown = [name for name in columns if name not in COLUMNS]
+        if unknown:
+            raise KeyError(f"Unknown column(s): {unknown}. Known: {list(COLUMNS)}")
+
+        ranges = []
+        skip, remaining = offset, limit
+        for partition, lo, hi in self._ranges(*self._bounds(start, end)):
+            if remaining is not None and remaining <= 0:
+                break
+            if skip >= hi - lo:
+                skip -= hi - lo
+                continue
+            lo, skip = lo + skip, 0
+            if remaining is not None:
+                hi = min(hi, lo + remaining)
+                remaining -= hi - lo
+            ranges.append((partition, lo, hi))
+
+        data = {}
+        for name in columns:
+            if name == CUSTODIANS:
+                data[name] = [b for partition, lo, hi in ranges for b in partition.custodians(lo, hi)]
+            else:
+                dtype = np.int64 if name == TIMESTAMP else np.float64
+                parts = [partition.column(name)[lo:hi] for partition, lo, hi in ranges]
+                data[name] = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+        if TIMESTAMP in data:
+            data[TIMESTAMP] = data[TIMESTAMP].view("datetime64[ns]")
+        return pd.DataFrame(data, columns=columns)
+
+    def read(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """The whole history as a DataFrame (see ``query``)."""
+        return self.query(columns=columns)
+
+    def import_csv(self, path: str = LEGACY_CSV) -> int:
+        """Append the rows of a legacy historical_snapshots.csv; returns the count."""
+        snapshots = pd.read_csv(path).to_dict(orient="records")
+        for snapshot in snapshots:
+            if isinstance(snapshot.get(CUSTODIANS), str):
+                snapshot[CUSTODIANS] = json.loads(snapshot[CUSTODIANS])
+        return self.append_many(snapshots, fsync=True)
+
+
+def load_history(root: str = DEFAULT_ROOT, legacy_csv: str = LEGACY_CSV,
+                 offset: int = 0) -> Optional[pd.DataFrame]:
+    """
+    Snapshot history for training, evaluation and rescoring.
+
+    Reads the columnar store; falls back to the legacy CSV if the store is
+    empty (run ``scripts/migrate_snapshots.py`` once to import it). None if
+    there is no history at all. With ``offset`` only the rows from that
+    position on are returned (from the store, only those are read).
+    """
+    store = SnapshotStore(root)
+    if len(store):
+        return store.query(offset=offset)
+    if os.path.exists(legacy_csv):
+        return pd.read_csv(legacy_csv).iloc[offset:].reset_index(drop=True)
+    return None
@@ -0,0 +1,178 @@
+"""
+Single-pass summary statistics for tables read in chunks.
+
+``SummaryAccumulator`` folds DataFrame chunks into per-column count, null
+count, min, max, mean and variance (merged with Chan et al.'s parallel
+update, so each chunk is reduced with vectorized NumPy) and a
+``QuantileSketch`` for the median and percentiles. Memory depends on the
+number of columns, not the number of rows.
+"""
+
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Reported as p5, p25, ... next to the median
+DEFAULT_PERCENTILES = (5, 25, 75, 95)
+
+
+def percentile_key(p: float) -> str:
+    return f"p{p:g}"
+
+
+class QuantileSketch:
+    """
+    KLL-style quantile sketch.
+
+    Level ``h`` holds items of weight ``2 ** h``. When a level grows past
+    ``k`` items it is sorted and every other item (random offset) moves up
+    a level, so the sketch keeps about ``k`` items per level and
+    ``log2(n / k)`` levels. Rank error is a small fraction of a percent
+    for the default ``k``.
+    """
+
+    def __init__(self, k: int = 1024, seed: int = 0):
+        self.k = int(k)
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compact()
+
+    def _compact(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self.k:
+                level = np.sort(level)
+                # An odd item out stays at this level
+                remainder = level[len(level) - len(level) % 2:]
+                level = level[:len(level) - len(level) % 2]
+
+                promoted = level[self._rng.integers(2)::2]
+                self.levels[h] = remainder
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return float("nan")
+
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        return float(values[order][min(index, len(values) - 1)])
+
+
+class _ColumnStats:
+    def __init__(self, sketch_k: int):
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch(sketch_k)
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        n_b = len(values)
+        if n_b == 0:
+            return
+
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * n_a * n_b / n
+        self.count = n
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.sketch.update(values)
+
+    def result(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        if self.count == 0:
+            nan = float("nan")
+            result = {"min": nan, "max": nan, "mean": nan, "median": nan, "std": nan}
+            result.update({percentile_key(p): nan for p in percentiles})
+            return result
+        std = float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float("nan")
+        result = {
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "median": self.sketch.quantile(0.5),
+            "std": std,
+        }
+        result.update({percentile_key(p): self.sketch.quantile(p / 100.0) for p in percentiles})
+        return result
+
+
+class SummaryAccumulator:
+    """
+    Builds the ``ExcelImporter.get_data_summary`` dict from DataFrame chunks.
+
+    A column counts as numeric only if it was numeric in every chunk seen.
+    ``percentiles`` (0-100) are reported per numeric column as ``p<n>``.
+    """
+
+    def __init__(self, sketch_k: int = 1024, percentiles: Sequence[float] = DEFAULT_PERCENTILES):
+        self.sketch_k = sketch_k
+        self.percentiles = tuple(percentiles)
+        self.row_count = 0
+        self.columns: List[str] = []
+        self.null_counts: Dict[str, int] = {}
+        self._stats: Dict[str, _ColumnStats] = {}
+        self._non_numeric = set()
+
+    def update(self, chunk: pd.DataFrame):
+        self.row_count += len(chunk)
+
+        for column, nulls in chunk.isnull().sum().items():
+            if column not in self.null_counts:
+                self.columns.append(column)
+                self.null_counts[column] = 0
+            self.null_counts[column] += int(nulls)
+
+        numeric = set(chunk.select_dtypes(include=[np.number]).columns)
+        for column in chunk.columns:
+            if column in self._non_numeric:
+                continue
+            if column not in numeric:
+                self._non_numeric.add(column)
+                self._stats.pop(column, None)
+                continue
+            stats = self._stats.setdefault(column, _ColumnStats(self.sketch_k))
+            stats.update(chunk[column].to_numpy(dtype=np.float64))
+
+    def update_all(self, chunks: Iterable[pd.DataFrame]) -> "SummaryAccumulator":
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def result(self) -> Dict[str, Any]:
+        numeric_columns = [c for c in self.columns if c in self._stats]
+        return {
+            'row_count': self.row_count,
+            'column_count': len(self.columns),
+            'columns': list(self.columns),
+            'null_counts': dict(self.null_counts),
+            'numeric_columns': numeric_columns,
+            'basic_stats': {c: self._stats[c].result(self.percentiles) for c in numeric_columns},
+            'exact': False,
+        }
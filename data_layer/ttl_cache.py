@@ -0,0 +1,94 @@
+"""
+In-memory TTL cache with stale-while-revalidate and single-flight refresh.
+
+Within ``ttl`` a cached value is served as is. Between ``ttl`` and
+``max_stale`` it is still served immediately while one background refresh
+runs. Without a value, or past ``max_stale``, callers wait for a fetch -
+but concurrent callers for the same key share a single fetch.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    def __init__(self, ttl: float = 2.0, max_stale: float = 30.0):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        self._values: Dict[Hashable, Tuple[Any, float]] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+
+    def get(self, key: Hashable, fetch: Callable[[], Any]) -> Tuple[Any, float]:
+        """
+        Return ``(value, age_seconds)`` for a key, fetching it if needed.
+
+        Raises whatever ``fetch`` raises when there is no usable cached value.
+        """
+        with self._lock:
+            cached = self._values.get(key)
+
+        if cached is not None:
+            value, fetched_at = cached
+            age = time.monotonic() - fetched_at
+            if age <= self.ttl:
+                return value, age
+            if age <= self.max_stale:
+                self._refresh(key, fetch, background=True)
+                return value, age
+
+        try:
+            return self._refresh(key, fetch, background=False).result(), 0.0
+        except Exception:
+            if cached is None:
+                raise
+            # Too old to serve without trying, but better than nothing
+            value, fetched_at = cached
+            return value, time.monotonic() - fetched_at
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Any], background: bool) -> Future:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._inflight[key] = future
+
+        if background:
+            threading.Thread(target=self._run, args=(key, fetch, future), daemon=True).start()
+        else:
+            self._run(key, fetch, future)
+        return future
+
+    def _run(self, key: Hashable, fetch: Callable[[], Any], future: Future):
+        try:
+            value = fetch()
+        except Exception as e:
+            logger.warning("Refresh of %r failed: %s", key, e)
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self._values[key] = (value, time.monotonic())
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def peek(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Cached ``(value, age_seconds)`` without fetching, or None."""
+        with self._lock:
+            cached = self._values.get(key)
+        if cached is None:
+            return None
+        value, fetched_at = cached
+        return value, time.monotonic() - fetched_at
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
@@ -0,0 +1,133 @@
+"""
+Content-addressed disk cache for parsed uploads and their scores.
+
+Entries are keyed by a SHA-256 over the inputs that determine them (file
+bytes, sheet, model version, ...) and stored as pickles, which load a
+DataFrame or a result list much faster than re-parsing the workbook. The
+cache is bounded by total size; the least recently used entries (by file
+mtime, touched on every hit) are evicted first.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = ".pkl"
+
+
+def cache_key(*parts: Any) -> str:
+    """SHA-256 hex digest of the given parts (bytes, or anything str()-able)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode()
+        # Length prefix keeps ("ab", "c") and ("a", "bc") apart
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class UploadCache:
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # The directory is created on the first put, not just by starting the app
+        self._sizes = {}
+        if os.path.isdir(root):
+            for entry in os.scandir(root):
+                if entry.name.endswith(_SUFFIX):
+                    self._sizes[entry.name] = entry.stat().st_size
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def get(self, key: str, kind: str) -> Optional[Any]:
+        """Cached object for (key, kind), or None."""
+        name = f"{key}.{kind}{_SUFFIX}"
+        path = self._path(name)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                self._sizes.pop(name, None)
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning("Dropping unreadable cache entry %s: %s", name, e)
+            self._remove(name)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, kind: str, value: Any):
+        """Store an object for (key, kind), then evict down to ``max_bytes``."""
+        name = f"{key}.{kind}{_SUFFIX}"
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._path(f".{name}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(name))
+
+        with self._lock:
+            self._sizes[name] = len(data)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            total = sum(self._sizes.values())
+            if total <= self.max_bytes:
+                return
+            by_age = []
+            for name in self._sizes:
+                try:
+                    by_age.append((os.path.getmtime(self._path(name)), name))
+                except FileNotFoundError:
+                    by_age.append((0.0, name))
+            by_age.sort()
+
+        for _, name in by_age:
+            if total <= self.max_bytes:
+                break
+            total -= self._sizes.get(name, 0)
+            self._remove(name)
+
+    def _remove(self, name: str):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._sizes.pop(name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._sizes),
+                "bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
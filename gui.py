@@ -16,6 +16,8 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 from data_layer.collectors.excel_importer import EXCEL_IMPORTER
 from ai_engine.anomaly_detector import ENGINE
+from ai_engine.entity_store import EntitySnapshotStore
+from ai_engine.feature_engineering import build_features_batch
 
 
 class RiskMonitorGUI:
@@ -29,6 +31,8 @@ class RiskMonitorGUI:
         self.current_data = None
         self.analysis_results = None
         self.file_path = None
+        # Last analyzed snapshot per company, for delta features across files
+        self.entity_store = EntitySnapshotStore()
         
         # Configure styles
         self.setup_styles()
@@ -508,15 +512,18 @@ class RiskMonitorGUI:
             self.update_status("Transforming data...")
             
             # Transform to snapshots
-            snapshots = EXCEL_IMPORTER.transform_equity_to_snapshots(self.current_data)
+            snapshots = EXCEL_IMPORTER.transform_equity_to_frame(self.current_data)
             
             self.update_status(f"Analyzing {len(snapshots)} companies...")
             
-            # Analyze each
+            # Analyze all companies in one batched pass; deltas are per company,
+            # against the same company in previously analyzed files
+            frame = self.entity_store.with_previous(snapshots.frame, 'company')
+            analyses = ENGINE.analyze_batch(build_features_batch(frame, group_by='company'))
+            self.entity_store.put_many(snapshots, 'company')
+
             results = []
-            for i, snapshot in enumerate(snapshots):
-                prev_snapshot = snapshots[i-1] if i > 0 else None
-                analysis = ENGINE.analyze_snapshot(snapshot, prev_snapshot)
+            for i, (snapshot, analysis) in enumerate(zip(snapshots, analyses)):
                 
                 results.append({
                     'company': snapshot.get('company', f'Company_{i}'),
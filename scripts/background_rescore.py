@@ -1,39 +1,140 @@
+"""
+Score the snapshot history into a side file, incrementally.
+
+    python scripts/background_rescore.py [--full]
+
+Scores (timestamp, risk_score, risk_label per history row) go to
+SCORES_PATH, and WATERMARK_PATH records how far they reach: the number of
+rows scored, the timestamp of the last one, the model version that scored
+them and the size of the scores file at that point. A run reads and scores
+only the rows appended since (plus the row before them, which their deltas
+are taken against); everything is rescored only when the model version
+changed, the history no longer matches the watermark, or with --full.
+
+New scores are appended to the scores file in place: it is truncated to
+the watermark's byte count (dropping rows of a run that died before
+updating the watermark), appended to and fsynced, and only then is the
+watermark replaced atomically. A full rescore writes the scores to a
+temporary file and renames it into place instead.
+"""
+
+import datetime
+import json
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 import pandas as pd
 
 from ai_engine.anomaly_detector import ENGINE
-from ai_engine.feature_engineering import build_features
+from ai_engine.feature_engineering import build_features_batch
+from data_layer.snapshot_store import DEFAULT_ROOT, LEGACY_CSV, TIMESTAMP, load_history
 
-DATA_PATH = "data/historical_snapshots.csv"
+# The snapshot store is append-only, so scores go to a side file
+SCORES_PATH = "data/history_scores.csv"
+WATERMARK_PATH = "data/history_scores.watermark.json"
 
 
-def rescore_history():
+def load_watermark(path=WATERMARK_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    if not os.path.exists(DATA_PATH):
-        print("[WARN] No historical snapshots found at:", DATA_PATH)
-        return
 
-    print("[INFO] Loading historical dataset...")
-    df = pd.read_csv(DATA_PATH)
+def _replace(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
 
-    rescored_rows = []
+def _append(path, size, data):
+    """Cut ``path`` back to ``size`` bytes, append ``data`` and fsync."""
+    with open(path, "r+b") as f:
+        f.truncate(size)
+        f.seek(size)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _timestamps(df):
+    if TIMESTAMP not in df.columns:
+        return pd.Series([None] * len(df), index=df.index)
+    stamps = pd.to_datetime(df[TIMESTAMP], utc=True, format="ISO8601")
+    return stamps.dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def rescore_history(full=False, root=DEFAULT_ROOT, legacy_csv=LEGACY_CSV,
+                    scores_path=SCORES_PATH, watermark_path=WATERMARK_PATH, engine=ENGINE):
+    version = engine.model_version()
+    watermark = None if full else load_watermark(watermark_path)
+    if watermark is not None and watermark.get("model_version") != version:
+        print(f"[INFO] Model version changed ({watermark.get('model_version')} → {version}). Rescoring everything...")
+        watermark = None
+    if watermark is not None and (not os.path.exists(scores_path)
+                                  or os.path.getsize(scores_path) < watermark["scores_bytes"]):
+        print("[WARN] Scores file is missing or shorter than the watermark. Rescoring everything...")
+        watermark = None
+
+    scored = watermark["rows"] if watermark else 0
+
+    print("[INFO] Loading historical dataset...")
+    # Start one row early: the first new row's deltas are taken against it
+    df = load_history(root, legacy_csv, offset=max(scored - 1, 0))
+    if df is None:
+        print("[WARN] No historical snapshots found at:", root)
+        return None
 
-    print(f"[INFO] Found {len(df)} snapshots. Rescoring...")
+    stamps = _timestamps(df)
+    if scored and (df.empty or stamps.iloc[0] != watermark["last_timestamp"]):
+        print("[WARN] History no longer matches the watermark. Rescoring everything...")
+        scored = 0
+        df = load_history(root, legacy_csv)
+        stamps = _timestamps(df)
 
-    for i in range(len(df)):
-        snap = df.iloc[i].to_dict()
-        prev = df.iloc[i - 1].to_dict() if i > 0 else None
+    context = 1 if scored else 0
+    new_rows = len(df) - context
+    if scored and not new_rows:
+        print("[INFO] No new snapshots since", watermark["last_timestamp"])
+        return watermark
 
-        result = ENGINE.analyze_snapshot(snap, prev)
+    if scored:
+        print(f"[INFO] {scored} snapshots already scored. Scoring {new_rows} new ones...")
+    else:
+        print(f"[INFO] Found {len(df)} snapshots. Rescoring...")
 
-        snap["risk_score"] = result["risk_score"]
-        snap["risk_label"] = result["label"]
+    features = build_features_batch(df).iloc[context:]
+    results = engine.analyze_batch(features)
+    scores = pd.DataFrame({
+        TIMESTAMP: stamps.iloc[context:].to_numpy(),
+        "risk_score": results.risk_score,
+        "risk_label": results.label,
+    })
 
-        rescored_rows.append(snap)
+    os.makedirs(os.path.dirname(scores_path) or ".", exist_ok=True)
+    rows_csv = scores.to_csv(index=False, header=not scored).encode()
+    if scored:
+        _append(scores_path, watermark["scores_bytes"], rows_csv)
+    else:
+        _replace(scores_path, rows_csv)
 
-    pd.DataFrame(rescored_rows).to_csv(DATA_PATH, index=False)
-    print("[INFO] Rescoring complete. Saved back to:", DATA_PATH)
+    watermark = {
+        "rows": scored + new_rows,
+        "last_timestamp": stamps.iloc[-1] if len(stamps) else None,
+        "model_version": version,
+        "scores_bytes": os.path.getsize(scores_path),
+        "scored_at": datetime.datetime.utcnow().isoformat() + "Z",
+    }
+    _replace(watermark_path, json.dumps(watermark, indent=2).encode())
+    print("[INFO] Rescoring complete. Saved to:", scores_path)
+    return watermark
 
 
 if __name__ == "__main__":
-    rescore_history()
+    rescore_history(full="--full" in sys.argv[1:])
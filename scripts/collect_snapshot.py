@@ -1,69 +1,44 @@
 import os
 import sys
-import csv
-import json
 import datetime
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from data_layer.collectors.blockchain_fetcher import get_blockchain_data
-from data_layer.collectors.mock_custodian import get_custodian_data
-from data_layer.collectors.exchange_fetcher import get_exchange_data
+from data_layer.collectors.runner import COLLECTOR_RUNNER
+from data_layer.snapshot_store import DEFAULT_ROOT, SnapshotStore
+from ai_engine.anomaly_detector import ENGINE
 
-SNAPSHOT_DIR = "data_layer/snapshots"
-CSV_PATH = "data/historical_snapshots.csv"
-
-os.makedirs(SNAPSHOT_DIR, exist_ok=True)
-os.makedirs(os.path.dirname(CSV_PATH), exist_ok=True)
+STORE = SnapshotStore(DEFAULT_ROOT)
 
 
 def collect_snapshot():
-    chain = get_blockchain_data()
-    cust = get_custodian_data()
-    exch = get_exchange_data()
-
+    collected = COLLECTOR_RUNNER.collect()
+    if collected.missing_sources:
+        for name in collected.missing_sources:
+            print(f"[WARN] No recent data from {name} ({collected.sources[name]['error']})")
+        print("[WARN] Snapshot not stored")
+        return None
 
     snapshot = {
         "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
-        "reserves": float(cust.get("totalReserves", 0)),
-        "custodians": cust.get("custodians", []),
-        "supply": float(chain.get("circulatingSupply", 0)),
-        "whale_supply": float(chain.get("whale_supply", 0)),
-        "price": float(exch.get("price", 1.0))
+        **collected.snapshot(),
+        "stale_sources": collected.stale_sources
     }
 
-    file_safe_ts = snapshot["timestamp"].replace(":", "-")
-    json_path = os.path.join(SNAPSHOT_DIR, f"snapshot_{file_safe_ts}.json")
-
-    with open(json_path, "w") as f:
-        json.dump(snapshot, f, indent=4)
-
-    write_header = not os.path.exists(CSV_PATH)
-
-    with open(CSV_PATH, "a", newline="") as f:
-        writer = csv.writer(f)
-
-        if write_header:
-            writer.writerow([
-                "timestamp",
-                "reserves",
-                "supply",
-                "whale_supply",
-                "price",
-                "custodians"
-            ])
+    STORE.append(snapshot, fsync=True)
 
-        writer.writerow([
-            snapshot["timestamp"],
-            snapshot["reserves"],
-            snapshot["supply"],
-            snapshot["whale_supply"],
-            snapshot["price"],
-            json.dumps(snapshot["custodians"])
-        ])
+    # Feed the streaming detector; checkpoint every run since this process is one-shot
+    stream = ENGINE.observe(snapshot)
+    ENGINE.save_stream_checkpoint()
 
-    print(f"[INFO] Snapshot saved → {json_path}")
-    print(f"[INFO] CSV updated → {CSV_PATH}")
+    for name in snapshot["stale_sources"]:
+        print(f"[WARN] {name} missed the deadline ({collected.sources[name]['error']}); using last known data")
+    print(f"[INFO] Snapshot appended → {STORE.root} ({len(STORE)} total)")
+    if stream["stream_anomaly_score"] is None:
+        print("[INFO] Streaming detector warming up")
+    else:
+        print(f"[INFO] Streaming anomaly score: {stream['stream_anomaly_score']:.3f}"
+              f"{' (ANOMALY)' if stream['stream_anomaly_flag'] else ''}")
 
     return snapshot
 
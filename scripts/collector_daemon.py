@@ -0,0 +1,61 @@
+"""
+Collect snapshots on a schedule until SIGINT/SIGTERM, writing them to the
+snapshot store in batches (see data_layer/collector_service.py). On
+shutdown the buffer is drained and the streaming detector checkpointed.
+
+    python -m scripts.collector_daemon
+"""
+
+import logging
+import os
+import signal
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai_engine.anomaly_detector import ENGINE
+from backend.collection_setup import configure_collection
+from backend.config import Config
+from data_layer.collector_service import CollectorService
+from data_layer.snapshot_store import SnapshotStore
+
+logger = logging.getLogger("collector_daemon")
+
+# How often the tick/flush metrics are logged
+STATS_INTERVAL_S = 60
+
+
+def run_daemon():
+    logging.basicConfig(level=Config.LOG_LEVEL)
+    # Collect exactly as the API server does (venues, budgets, pools, feed)
+    configure_collection({name: getattr(Config, name) for name in dir(Config) if name.isupper()})
+
+    service = CollectorService(
+        SnapshotStore(Config.SNAPSHOT_STORE_DIR),
+        interval=Config.COLLECT_INTERVAL_S,
+        jitter=Config.COLLECT_JITTER,
+        buffer_size=Config.COLLECT_BUFFER_SIZE,
+        flush_rows=Config.COLLECT_FLUSH_ROWS,
+        flush_interval=Config.COLLECT_FLUSH_INTERVAL_S,
+        drain_timeout=Config.COLLECT_DRAIN_TIMEOUT_S,
+        on_snapshot=ENGINE.observe,
+    )
+
+    shutdown = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: shutdown.set())
+    signal.signal(signal.SIGTERM, lambda *_: shutdown.set())
+
+    service.start()
+    logger.info("Collecting every %.1fs into %s", Config.COLLECT_INTERVAL_S, Config.SNAPSHOT_STORE_DIR)
+    while not shutdown.wait(STATS_INTERVAL_S):
+        logger.info("Collector stats: %s", service.stats())
+
+    logger.info("Shutting down; draining %d buffered snapshots", service.stats()["buffered"])
+    service.stop()
+    ENGINE.save_stream_checkpoint()
+    logger.info("Collector stopped: %s", service.stats())
+
+
+if __name__ == "__main__":
+    run_daemon()
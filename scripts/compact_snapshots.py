@@ -0,0 +1,32 @@
+"""
+Pack old data_layer/snapshots/snapshot_<ts>.json files into compressed,
+checksummed segments (data_layer/snapshots/segments/) and delete the
+originals once the segment has been verified. annotate_snapshot keeps
+working on the old paths; it reads the snapshot out of its segment.
+
+    python scripts/compact_snapshots.py [min_age_seconds]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_layer.snapshot_segments import SNAPSHOT_DIR, compact_snapshots
+
+
+def run_compaction(min_age_s=86_400, snapshot_dir=SNAPSHOT_DIR):
+    if not os.path.isdir(snapshot_dir):
+        print("[WARN] No snapshot directory at:", snapshot_dir)
+        return []
+
+    segments = compact_snapshots(snapshot_dir, min_age_s=min_age_s)
+    if not segments:
+        print("[INFO] Nothing to compact")
+    for path in segments:
+        print(f"[INFO] Segment written → {path}")
+    return segments
+
+
+if __name__ == "__main__":
+    run_compaction(float(sys.argv[1]) if len(sys.argv) > 1 else 86_400)
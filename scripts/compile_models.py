@@ -0,0 +1,28 @@
+"""
+Write compiled.npz (library-free node tables) for the current model version,
+so the server can score with USE_COMPILED_MODELS=True without importing
+sklearn or xgboost.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai_engine.anomaly_detector import MODEL_DIR
+from ai_engine.model_store import ModelStore
+
+
+def compile_models(model_dir=MODEL_DIR):
+    store = ModelStore(model_dir)
+    path = store.export_compiled()
+    if path is None:
+        print("[WARN] No trained models found in:", model_dir)
+        return None
+
+    print(f"[INFO] Compiled version {store.current_version()} → {path}")
+    return path
+
+
+if __name__ == "__main__":
+    compile_models()
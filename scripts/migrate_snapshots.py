@@ -0,0 +1,31 @@
+"""
+One-off import of data/historical_snapshots.csv into the columnar snapshot
+store (data/snapshot_store). The CSV is left in place; readers switch to
+the store as soon as it has rows.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_layer.snapshot_store import DEFAULT_ROOT, LEGACY_CSV, SnapshotStore
+
+
+def migrate_snapshots(csv_path=LEGACY_CSV, root=DEFAULT_ROOT):
+    if not os.path.exists(csv_path):
+        print("[WARN] No CSV history found at:", csv_path)
+        return 0
+
+    store = SnapshotStore(root)
+    if len(store):
+        print(f"[WARN] {root} already holds {len(store)} snapshots; not importing twice")
+        return 0
+
+    count = store.import_csv(csv_path)
+    print(f"[INFO] Imported {count} snapshots → {root}")
+    return count
+
+
+if __name__ == "__main__":
+    migrate_snapshots(*sys.argv[1:3])
@@ -12,7 +12,8 @@ import pandas as pd
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from ai_engine.anomaly_detector import ENGINE
-from ai_engine.feature_engineering import build_features
+from ai_engine.feature_engineering import build_features_batch
+from backend.config import Config
 
 
 def generate_training_data(n_samples=500):
@@ -78,13 +79,7 @@ def generate_training_data(n_samples=500):
         labels.append(label)
     
     # Build features for all snapshots
-    feature_dfs = []
-    for i, snapshot in enumerate(training_snapshots):
-        prev_snapshot = training_snapshots[i-1] if i > 0 else None
-        features = build_features(snapshot, prev_snapshot)
-        feature_dfs.append(features)
-    
-    df_features = pd.concat(feature_dfs, ignore_index=True)
+    df_features = build_features_batch(pd.DataFrame(training_snapshots))
     
     print(f"✓ Generated {len(df_features)} feature vectors with {len(df_features.columns)} features")
     print(f"  Features: {list(df_features.columns)}")
@@ -108,7 +103,8 @@ def retrain_models():
     print()
     print("Training models...")
     
-    # Train the models
+    # Train the models (older versions beyond MODEL_KEEP_VERSIONS are pruned)
+    ENGINE.store.keep = Config.MODEL_KEEP_VERSIONS
     ENGINE.train(df_features, labels)
     
     print("✓ Models trained and saved successfully!")
@@ -165,7 +161,7 @@ def retrain_models():
     print("-" * 70)
     
     for case in test_cases:
-        result = ENGINE.analyze_snapshot(case['snapshot'])
+        result = ENGINE.analyze_snapshot(case['snapshot'], include_raw_features=False)
         print(f"{case['name']:<20} {result['risk_score']:<12} {result['label']:<12} "
               f"R/S ratio: {result['explanation']['reserve_supply_ratio']:.2f}")
     
@@ -0,0 +1,603 @@
+import sys
+import os
+import json
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sklearn.ensemble import IsolationForest
+from xgboost import XGBClassifier
+
+from ai_engine.anomaly_detector import AnomalyEngine
+from ai_engine.assets import AssetConfig, AssetMonitor, AssetRegistry, ModelCache
+from ai_engine.coalescer import RequestCoalescer
+from ai_engine.entity_store import EntitySnapshotStore
+from ai_engine.model_store import ModelStore
+from ai_engine.rolling_state import RollingFeatureState
+from ai_engine.streaming_detector import HalfSpaceTrees
+from data_layer.collectors.runner import CollectorRunner
+from ai_engine.tree_compiler import compile_isolation_forest, compile_xgb_classifier
+from ai_engine.feature_engineering import (
+    FEATURE_COLUMNS,
+    build_feature_array,
+    build_features,
+    build_features_batch,
+)
+
+
+def _sample_table():
+    return pd.DataFrame({
+        "reserves": [1_000_000.0, 950_000.0, 0.0, 1_200_000.0, np.nan],
+        "supply": [1_200_000.0, 1_200_000.0, 0.0, 1_100_000.0, 1_000_000.0],
+        "whale_supply": [25_000.0, 30_000.0, 0.0, 10_000.0, 5_000.0],
+        "price": [1.0, 0.998, 1.001, 0.0, 1.0],
+        "prev_reserves": [900_000.0, np.nan, 1.0, 2.0, 3.0],
+        "custodians": [[600_000.0, 400_000.0], [], "[1, 2]", None, [1.0]],
+        "market_cap": [1.0, 2.0, 3.0, 4.0, 5.0],
+    })
+
+
+def _detached_engine(iso=None, xgb=None):
+    """Engine with the given models that never loads from models/."""
+    engine = AnomalyEngine()
+    engine.iso = iso
+    engine.xgb = xgb
+    engine._loaded = True
+    return engine
+
+
+class TestFeatureEngineering(unittest.TestCase):
+    def _per_row(self, df):
+        rows = []
+        for i in range(len(df)):
+            snap = df.iloc[i].to_dict()
+            prev = df.iloc[i - 1].to_dict() if i > 0 else None
+            rows.append(build_features(snap, prev))
+        return pd.concat(rows, ignore_index=True)
+
+    def test_batch_matches_per_row(self):
+        df = _sample_table()
+        pd.testing.assert_frame_equal(build_features_batch(df), self._per_row(df))
+
+    def test_batch_without_optional_columns(self):
+        df = pd.DataFrame({"reserves": [10.0, 12.0], "supply": [11.0, 11.0]})
+        pd.testing.assert_frame_equal(build_features_batch(df), self._per_row(df))
+
+    def test_array_matches_frame(self):
+        df = _sample_table()
+        for i in range(len(df)):
+            snap = df.iloc[i].to_dict()
+            prev = df.iloc[i - 1].to_dict() if i > 0 else None
+            x = build_feature_array(snap, prev)
+            self.assertEqual(x.dtype, np.float64)
+            np.testing.assert_array_equal(x, build_features(snap, prev).values[0])
+        self.assertEqual(list(build_features({}).columns), list(FEATURE_COLUMNS))
+
+    def test_batch_grouped_by_entity(self):
+        df = pd.DataFrame({
+            "company": ["A", "B", "A", "B"],
+            "reserves": [100.0, 50.0, 110.0, 40.0],
+            "supply": [100.0, 50.0, 100.0, 50.0],
+        })
+        out = build_features_batch(df, group_by="company")
+        self.assertEqual(out["delta_reserves"].tolist(), [0.0, 0.0, 10.0, -10.0])
+
+        expected = build_features(df.iloc[3].to_dict(), df.iloc[1].to_dict())
+        pd.testing.assert_frame_equal(out.iloc[[3]].reset_index(drop=True), expected)
+
+    def test_batch_empty(self):
+        out = build_features_batch(pd.DataFrame({"reserves": [], "supply": []}))
+        self.assertEqual(len(out), 0)
+        self.assertEqual(list(out.columns), list(build_features({}).columns))
+
+
+class TestEntitySnapshotStore(unittest.TestCase):
+    def test_lru_eviction_and_ttl(self):
+        store = EntitySnapshotStore(max_entities=2, ttl_seconds=60)
+        store.put("A", {"reserves": 1.0, "supply": 2.0})
+        store.put("B", {"reserves": 3.0, "supply": 4.0})
+        store.get("A")
+        store.put("C", {"reserves": 5.0, "supply": 6.0})
+
+        self.assertIsNone(store.get("B"))
+        self.assertEqual(store.get("A"), {"reserves": 1.0, "supply": 2.0})
+
+        store.ttl_seconds = 0
+        time.sleep(0.01)
+        self.assertIsNone(store.get("C"))
+        self.assertEqual(len(store), 1)
+
+    def test_peek_leaves_lru_order(self):
+        store = EntitySnapshotStore(max_entities=2)
+        store.put("A", {"reserves": 1.0})
+        store.put("B", {"reserves": 2.0})
+        self.assertEqual(store.peek_many(["A", "C"]), [{"reserves": 1.0}, None])
+
+        # A is still the least recently used
+        store.put("C", {"reserves": 3.0})
+        self.assertIsNone(store.get("A"))
+
+    def test_persists_to_disk(self):
+        path = os.path.join(tempfile.mkdtemp(), "entities.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+
+        store = EntitySnapshotStore(path=path, flush_every=2)
+        store.put("A", {"reserves": 1.0, "supply": 2.0, "price": 1.0})
+        self.assertFalse(os.path.exists(path))
+        store.put("B", {"reserves": 3.0, "supply": 4.0, "price": 1.0})
+
+        restored = EntitySnapshotStore(path=path)
+        self.assertEqual(restored.get("B"), {"reserves": 3.0, "supply": 4.0, "price": 1.0})
+
+    def test_with_previous_feeds_grouped_batch(self):
+        store = EntitySnapshotStore()
+        store.put("A", {"reserves": 90.0, "supply": 100.0, "price": 1.0})
+        df = pd.DataFrame({
+            "company": ["A", "B", "A"],
+            "reserves": [100.0, 50.0, 120.0],
+            "supply": [100.0, 50.0, 100.0],
+            "price": [1.0, 1.0, 1.0],
+        })
+        out = build_features_batch(store.with_previous(df, "company"), group_by="company")
+        self.assertEqual(out["delta_reserves"].tolist(), [10.0, 0.0, 20.0])
+
+        store.put_many(df.to_dict("records"), "company")
+        self.assertEqual(store.get("A")["reserves"], 120.0)
+        self.assertEqual(store.get("B")["reserves"], 50.0)
+
+
+class TestRollingFeatureState(unittest.TestCase):
+    def setUp(self):
+        self.reserves = np.random.default_rng(4).normal(1000, 10, 300)
+
+    def test_ewm_mean_matches_pandas(self):
+        state = RollingFeatureState(windows=(5, 30))
+        for r in self.reserves:
+            out = state.update({"reserves": r, "supply": 1000, "price": 1.0})
+
+        for window in (5, 30):
+            expected = pd.Series(self.reserves).ewm(span=window, adjust=False).mean().iloc[-1]
+            self.assertAlmostEqual(out[f"reserves_ewm_mean_{window}"], expected)
+        self.assertEqual(out["supply_ewm_std_5"], 0.0)
+        self.assertEqual(out["supply_zscore_5"], 0.0)
+
+    def test_zscore_flags_jump_and_state_round_trips(self):
+        state = RollingFeatureState(windows=(20,))
+        for r in self.reserves:
+            state.update({"reserves": r, "supply": 1000, "price": 1.0})
+        restored = RollingFeatureState.from_dict(json.loads(json.dumps(state.to_dict())))
+
+        jump = {"reserves": 900, "supply": 1000, "price": 1.0}
+        out = state.update(jump)
+        self.assertLess(out["reserves_zscore_20"], -5)
+        self.assertEqual(restored.update(jump), out)
+
+    def test_build_features_appends_rolling_columns(self):
+        snapshot = {"reserves": 10.0, "supply": 12.0, "price": 1.0}
+        state = RollingFeatureState()
+        feats = build_features(snapshot, rolling_state=state)
+
+        self.assertEqual(list(feats.columns), list(FEATURE_COLUMNS) + state.columns())
+        pd.testing.assert_frame_equal(feats[list(FEATURE_COLUMNS)], build_features(snapshot))
+
+
+class TestBatchAnalysis(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        reserves = rng.uniform(900, 1100, 200)
+        table = pd.DataFrame({
+            "reserves": reserves,
+            "supply": reserves + rng.normal(0, 40, 200),
+            "price": 1 + rng.normal(0, 0.01, 200),
+        })
+        self.feats = build_features_batch(table)
+        self.labels = (table["supply"] > table["reserves"] + 40).astype(int).to_numpy()
+
+        # Attach models directly so train() does not overwrite models/ on disk
+        self.engine = _detached_engine(
+            iso=IsolationForest(contamination=0.05, random_state=42).fit(self.feats.values),
+            xgb=XGBClassifier(eval_metric="logloss").fit(self.feats.values, self.labels),
+        )
+
+    def test_batch_matches_model_predictions(self):
+        batch = self.engine.analyze_batch(self.feats)
+        X = self.feats.values
+
+        self.assertEqual(len(batch), len(self.feats))
+        np.testing.assert_array_equal(batch.explanation["risk_class"], self.engine.xgb.predict(X))
+        np.testing.assert_array_equal(batch.explanation["anomaly_flag"], (self.engine.iso.predict(X) == -1).astype(int))
+
+    def test_dict_view_matches_single_row(self):
+        batch = self.engine.analyze_batch(self.feats)
+        for i in (0, 17, 199):
+            single = self.engine.analyze_features(self.feats.iloc[[i]])
+            single.pop("raw_features")
+            self.assertEqual(batch[i], single)
+
+    def test_fallback_without_classifier(self):
+        self.engine.xgb = None
+        batch = self.engine.analyze_batch(self.feats)
+        risky = (self.feats["diff"] > 50) | (self.feats["reserve_supply_ratio"] < 1.0)
+        np.testing.assert_array_equal(batch.explanation["risk_class"], risky.astype(int).to_numpy())
+        self.assertTrue(set(batch.label) <= {"SAFE", "WARNING", "RISKY"})
+
+
+class TestSingleSnapshotPath(unittest.TestCase):
+    def setUp(self):
+        self.engine = _detached_engine()
+        self.snapshot = {"reserves": 1_000_000, "supply": 1_200_000, "price": 1.0, "custodians": [600_000, 400_000]}
+
+    def test_raw_features_only_on_request(self):
+        with_raw = self.engine.analyze_snapshot(self.snapshot)
+        without_raw = self.engine.analyze_snapshot(self.snapshot, include_raw_features=False)
+
+        self.assertEqual(list(with_raw["raw_features"]), list(FEATURE_COLUMNS))
+        self.assertNotIn("raw_features", without_raw)
+        with_raw.pop("raw_features")
+        self.assertEqual(with_raw, without_raw)
+
+    def test_latency_budget(self):
+        timings = []
+        for _ in range(200):
+            start = time.perf_counter()
+            self.engine.analyze_snapshot(self.snapshot)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        self.assertLess(timings[len(timings) // 2], 0.001)
+
+
+class TestLazyLoading(unittest.TestCase):
+    IMPORT_BUDGET_SECONDS = 2.0
+
+    def test_import_time_budget(self):
+        # Fresh interpreter so modules cached by this test run don't hide the cost
+        code = (
+            "import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            "import ai_engine.anomaly_detector\n"
+            "elapsed = time.perf_counter() - start\n"
+            "heavy = [m for m in ('sklearn', 'xgboost', 'joblib') if m in sys.modules]\n"
+            "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+        )
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+        report = json.loads(out.stdout)
+
+        self.assertEqual(report["heavy"], [])
+        self.assertLess(report["elapsed"], self.IMPORT_BUDGET_SECONDS)
+
+    def test_models_load_once_on_first_use(self):
+        engine = AnomalyEngine()
+        self.assertFalse(engine._loaded)
+
+        calls = []
+        engine._load_models = lambda: calls.append(1)
+        threads = [threading.Thread(target=engine.analyze_snapshot, args=({"reserves": 1, "supply": 1},)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+
+
+class TestModelVersioning(unittest.TestCase):
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+
+        rng = np.random.default_rng(1)
+        self.X = rng.normal(size=(100, len(FEATURE_COLUMNS)))
+        self.y = (self.X[:, 0] > 0).astype(int)
+
+    def test_publish_switches_current(self):
+        store = ModelStore(self.model_dir)
+        self.assertIsNone(store.current_version())
+
+        first = store.publish(IsolationForest(random_state=0).fit(self.X), None)
+        second = store.publish(IsolationForest(random_state=1).fit(self.X), None)
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(store.current_version(), second)
+        self.assertEqual(store.load().version, second)
+        self.assertEqual(store.load(first).version, first)
+        self.assertFalse([d for d in os.listdir(store.versions_dir) if d.startswith(".")])
+
+    def test_publish_prunes_old_versions(self):
+        store = ModelStore(self.model_dir, keep=2)
+        iso = IsolationForest(n_estimators=5, random_state=0).fit(self.X)
+        versions = [store.publish(iso, None) for _ in range(4)]
+
+        self.assertEqual(sorted(os.listdir(store.versions_dir)), versions[-2:])
+        self.assertEqual(store.current_version(), versions[-1])
+
+        store.keep = 0
+        store.publish(iso, None)
+        self.assertEqual(len(os.listdir(store.versions_dir)), 3)
+
+    def test_legacy_flat_files(self):
+        import joblib
+        joblib.dump(IsolationForest(random_state=0).fit(self.X), os.path.join(self.model_dir, "iso_model.pkl"))
+
+        engine = AnomalyEngine(model_dir=self.model_dir)
+        engine.warmup()
+        self.assertEqual(engine.model_info()["version"], "legacy")
+        self.assertIsNotNone(engine.iso)
+
+    def test_reload_swaps_new_version(self):
+        engine = AnomalyEngine(model_dir=self.model_dir)
+        self.assertEqual(engine.model_info(), {"version": None, "loaded_at": None, "compiled": False})
+
+        engine.train(pd.DataFrame(self.X), self.y)
+        trained = engine.model_info()["version"]
+        self.assertFalse(engine.reload_if_changed())
+
+        # Simulate a retrain in another process
+        other = AnomalyEngine(model_dir=self.model_dir)
+        other.train(pd.DataFrame(self.X), 1 - self.y)
+        old_xgb = engine.xgb
+
+        self.assertTrue(engine.reload_if_changed())
+        self.assertNotEqual(engine.model_info()["version"], trained)
+        self.assertEqual(engine.model_info()["version"], other.model_info()["version"])
+        self.assertIsNot(engine.xgb, old_xgb)
+
+    def test_watcher_picks_up_new_version(self):
+        engine = AnomalyEngine(model_dir=self.model_dir)
+        engine.warmup()
+        engine.start_watcher(interval=0.01)
+        self.addCleanup(engine.stop_watcher)
+
+        version = ModelStore(self.model_dir).publish(IsolationForest(random_state=0).fit(self.X), None)
+
+        deadline = time.time() + 5
+        while engine.model_info()["version"] != version and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(engine.model_info()["version"], version)
+
+
+class TestRequestCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.engine = _detached_engine()
+        self.coalescer = RequestCoalescer(self.engine, max_wait_ms=50, max_batch_size=8)
+        self.addCleanup(self.coalescer.close)
+
+    def test_concurrent_requests_share_batches(self):
+        snapshots = [{"reserves": 1000 + i, "supply": 1100 - i, "price": 1.0} for i in range(32)]
+        results = [None] * len(snapshots)
+
+        def call(i):
+            results[i] = self.coalescer.submit(snapshots[i])
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(snapshots))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for snapshot, result in zip(snapshots, results):
+            self.assertEqual(result, self.engine.analyze_snapshot(snapshot))
+
+        stats = self.coalescer.stats()
+        self.assertEqual(stats["requests"], len(snapshots))
+        self.assertLess(stats["batches"], len(snapshots))
+        self.assertLessEqual(stats["max_batch_size"], 8)
+        self.assertGreaterEqual(stats["max_queue_delay_ms"], 0.0)
+
+    def test_bad_request_fails_alone(self):
+        with self.assertRaises(ValueError):
+            self.coalescer.submit({"reserves": "not a number"})
+        result = self.coalescer.submit({"reserves": 1, "supply": 1}, include_raw_features=False)
+        self.assertNotIn("raw_features", result)
+
+
+class TestCompiledModels(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.X = rng.normal(size=(500, len(FEATURE_COLUMNS))) * rng.uniform(1, 1e6, len(FEATURE_COLUMNS))
+        self.y = (self.X[:, 0] > 0).astype(int) + (self.X[:, 1] > 2e5).astype(int)
+        self.iso = IsolationForest(contamination=0.05, random_state=42).fit(self.X)
+
+    def test_isolation_forest_matches_library(self):
+        compiled = compile_isolation_forest(self.iso)
+        np.testing.assert_allclose(compiled.score_samples(self.X), self.iso.score_samples(self.X), rtol=1e-9)
+        np.testing.assert_array_equal(compiled.predict(self.X), self.iso.predict(self.X))
+
+    def test_xgb_matches_library(self):
+        for labels in (self.y, (self.y > 0).astype(int)):
+            xgb = XGBClassifier(eval_metric="logloss").fit(self.X, labels)
+            compiled = compile_xgb_classifier(xgb)
+            np.testing.assert_allclose(compiled.predict_proba(self.X), xgb.predict_proba(self.X), atol=1e-5)
+            np.testing.assert_array_equal(compiled.predict(self.X), xgb.predict(self.X))
+
+    def test_engine_scores_with_compiled_models(self):
+        model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, model_dir)
+        AnomalyEngine(model_dir=model_dir).train(pd.DataFrame(self.X), self.y)
+
+        library = AnomalyEngine(model_dir=model_dir)
+        compiled = AnomalyEngine(model_dir=model_dir, use_compiled=True)
+        compiled.warmup()
+
+        self.assertTrue(compiled.model_info()["compiled"])
+        expected = library.analyze_batch(self.X)
+        actual = compiled.analyze_batch(self.X)
+        np.testing.assert_array_equal(actual.label, expected.label)
+        np.testing.assert_allclose(
+            actual.explanation["risk_probability"], expected.explanation["risk_probability"], atol=1e-5
+        )
+
+
+class TestStreamingDetector(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(3)
+
+    def _normal(self, n):
+        return self.rng.normal(size=(n, 4)) * 10 + 100
+
+    def test_flags_shifted_data(self):
+        model = HalfSpaceTrees(n_features=4, window_size=100)
+        self.assertIsNone(model.score_one(self._normal(1)[0]))
+        for x in self._normal(300):
+            model.learn_one(x)
+
+        normal = [model.score_one(x) for x in self._normal(100)]
+        shifted = [model.score_one(x) for x in self._normal(20) + 200]
+        self.assertLess(np.mean([model.is_anomaly(s) for s in normal]), 0.1)
+        self.assertGreater(np.mean([model.is_anomaly(s) for s in shifted]), 0.9)
+
+    def test_checkpoint_round_trip(self):
+        path = os.path.join(tempfile.mkdtemp(), "stream.npz")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+
+        for n_seen in (50, 250):  # mid warm-up, then after the trees are built
+            model = HalfSpaceTrees(n_features=4, window_size=100)
+            for x in self._normal(n_seen):
+                model.learn_one(x)
+            model.save(path, meta={"n_seen": n_seen})
+
+            restored, meta = HalfSpaceTrees.load(path)
+            self.assertEqual(meta, {"n_seen": n_seen})
+
+            stream = self._normal(200)
+            for x in stream:
+                self.assertEqual(model.score_one(x), restored.score_one(x))
+                model.learn_one(x)
+                restored.learn_one(x)
+
+    def test_engine_observe_persists_state(self):
+        model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, model_dir)
+
+        engine = AnomalyEngine(model_dir=model_dir)
+        engine.stream = HalfSpaceTrees(n_features=len(FEATURE_COLUMNS), window_size=20)
+        for i in range(30):
+            out = engine.observe({"reserves": 1000 + i, "supply": 1000, "price": 1.0})
+        self.assertIsNotNone(out["stream_anomaly_score"])
+        engine.save_stream_checkpoint()
+
+        restarted = AnomalyEngine(model_dir=model_dir)
+        self.assertEqual(restarted.last_observed(), {"reserves": 1029.0, "supply": 1000.0, "price": 1.0})
+        self.assertTrue(restarted.stream.ready)
+
+        # Scoring without learning leaves the detector and last snapshot alone
+        count = restarted.stream.count
+        out = restarted.observe({"reserves": 5000, "supply": 1000, "price": 1.0}, learn=False)
+        self.assertIsNotNone(out["stream_anomaly_score"])
+        self.assertEqual(restarted.stream.count, count)
+        self.assertEqual(restarted.last_observed()["reserves"], 1029.0)
+
+
+def _fixed_sources(reserves, supply, price):
+    """Collector sources returning constant data (reserves may be a list, consumed per call)."""
+    values = iter(reserves) if isinstance(reserves, list) else None
+    return {
+        "chain": lambda: {"circulatingSupply": supply, "whale_supply": 0.0},
+        "custodian": lambda: {"totalReserves": next(values) if values else reserves, "custodians": []},
+        "exchange": lambda: {"price": price, "age_s": 0.0, "spread_bps": 1.0},
+    }
+
+
+class TestMultiAsset(unittest.TestCase):
+    def setUp(self):
+        self.model_dirs = [tempfile.mkdtemp() for _ in range(2)]
+        for d in self.model_dirs:
+            self.addCleanup(shutil.rmtree, d)
+
+        X = np.random.default_rng(0).normal(size=(50, len(FEATURE_COLUMNS)))
+        for d in self.model_dirs:
+            ModelStore(d).publish(IsolationForest(n_estimators=5, random_state=0).fit(X), None)
+
+    def test_model_cache_evicts_least_recently_used(self):
+        pinned = _detached_engine()
+        cache = ModelCache(max_bytes=1, pinned={"pinned": pinned})
+        first = cache.get(self.model_dirs[0])
+        self.assertIs(cache.get(self.model_dirs[0]), first)
+        self.assertIsNotNone(first.iso)
+
+        cache.get(self.model_dirs[1])
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"], stats["evictions"]), (1, 1, 2, 1))
+        self.assertGreater(stats["bytes"], 1)
+
+        # Reloaded after eviction; pinned engines are never charged or dropped
+        self.assertIsNot(cache.get(self.model_dirs[0]), first)
+        self.assertIs(cache.get("pinned"), pinned)
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_registry_from_file(self):
+        path = os.path.join(self.model_dirs[0], "assets.json")
+        with open(path, "w") as f:
+            json.dump([{"id": "usdt", "venues": ["kraken"],
+                        "sources": {"chain": "data_layer.collectors.blockchain_fetcher:get_blockchain_data",
+                                    "custodian": "data_layer.collectors.mock_custodian:get_custodian_data"}}], f)
+
+        registry = AssetRegistry.from_file(path)
+        self.assertEqual(registry.ids(), ["USDC", "USDT"])
+        usdt = registry.get("USDT")
+        self.assertEqual(usdt.feed_symbol, "USDTUSD")
+        self.assertEqual(sorted(usdt.sources), ["USDT:chain", "USDT:custodian", "USDT:exchange"])
+        self.assertEqual(sorted(registry.get("usdc").sources), ["chain", "custodian", "exchange"])
+        with self.assertRaises(KeyError):
+            registry.get("DAI")
+
+    def test_asset_config_validation(self):
+        # Without its own chain/custodian data an asset would be scored on USDC's
+        with self.assertRaises(ValueError):
+            AssetConfig("DAI")
+        with self.assertRaises(ValueError):
+            AssetConfig("DAI", sources={"chain": lambda: {}})
+        with self.assertRaises(ValueError):
+            AssetConfig("USDT", feed_symbol="USDTUSDT", sources=_fixed_sources(1.0, 1.0, 1.0))
+        self.assertEqual(AssetConfig("USDC").feed_symbol, "USDCUSD")
+
+    def test_score_all_assets_in_one_tick(self):
+        registry = AssetRegistry([
+            AssetConfig("USDC", model_dir=self.model_dirs[0], sources=_fixed_sources([1000.0, 900.0], 1000.0, 1.0)),
+            AssetConfig("USDT", model_dir=self.model_dirs[0], sources=_fixed_sources(500.0, 1000.0, 0.99)),
+            AssetConfig("DAI", model_dir=self.model_dirs[1], sources=_fixed_sources(2000.0, 1000.0, 1.0)),
+        ])
+        monitor = AssetMonitor(registry, ModelCache(), runner=CollectorRunner(deadline=5.0),
+                               entity_store=EntitySnapshotStore(ttl_seconds=None))
+
+        calls = []
+        original = AnomalyEngine.analyze_batch
+
+        def counting(engine, features):
+            calls.append(len(features))
+            return original(engine, features)
+
+        with patch.object(AnomalyEngine, "analyze_batch", counting):
+            results = monitor.score()
+
+        # One batch per model set, not per asset
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertEqual(list(results), ["USDC", "USDT", "DAI"])
+        self.assertAlmostEqual(results["USDT"]["explanation"]["reserve_supply_ratio"], 0.5)
+        self.assertEqual(results["USDT"]["price_spread_bps"], 1.0)
+        self.assertFalse(results["DAI"]["sources"]["exchange"]["stale"])
+        self.assertEqual(monitor.latest(), results)
+
+        # The next tick takes deltas against each asset's own last snapshot
+        second = monitor.score(["usdc"])
+        self.assertEqual(list(second), ["USDC"])
+        self.assertAlmostEqual(second["USDC"]["explanation"]["delta_reserves"], -100.0)
+
+        # Rolling features are kept per asset across ticks
+        self.assertEqual(results["USDT"]["rolling"]["reserves_ewm_mean_10"], 500.0)
+        self.assertAlmostEqual(second["USDC"]["rolling"]["reserves_ewm_mean_10"], 1000.0 - 100.0 * 2 / 11)
+        self.assertGreater(second["USDC"]["rolling"]["reserves_ewm_std_10"], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
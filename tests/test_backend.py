@@ -1,6 +1,12 @@
 
 import sys
 import os
+import io
+import http.server
+import threading
+import time
+import shutil
+import tempfile
 import unittest
 import json
 from unittest.mock import patch, MagicMock
@@ -9,6 +15,13 @@ from unittest.mock import patch, MagicMock
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from backend.app import create_app
+from backend.collection_setup import configure_collection
+from backend.config import Config
+from backend.http_client import HTTPClientRegistry
+from data_layer.collectors.exchange_fetcher import PRICE_AGGREGATOR, PRICE_CACHE
+from data_layer.collectors.price_aggregator import CircuitBreaker, build_venues
+from data_layer.collectors.runner import COLLECTOR_RUNNER
+from data_layer.snapshot_store import SnapshotStore
 
 class TestBackend(unittest.TestCase):
     def setUp(self):
@@ -20,7 +33,9 @@ class TestBackend(unittest.TestCase):
     def test_health(self):
         response = self.client.get('/health')
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.json, {"status": "healthy"})
+        self.assertEqual(response.json["status"], "healthy")
+        self.assertIn("version", response.json["model"])
+        self.assertIn("loaded_at", response.json["model"])
 
     # --- Data Routes ---
     @patch('backend.routes.data_routes.get_exchange_data')
@@ -60,6 +75,135 @@ class TestBackend(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn("error", response.json)
 
+    @patch('backend.routes.risk_routes.ENGINE.analyze_snapshot')
+    def test_analyze_uses_entity_history(self, mock_analyze):
+        mock_analyze.return_value = {"risk_score": 10, "label": "SAFE", "explanation": {}}
+        payload = {"reserves": 1000, "supply": 1000, "price": 1.0, "entity_id": "USDC"}
+        self.client.post('/api/risk/analyze', json=payload)
+        self.client.post('/api/risk/analyze', json={**payload, "reserves": 900})
+
+        first = mock_analyze.call_args_list[0].args[0]
+        second = mock_analyze.call_args_list[1].args[0]
+        self.assertEqual(first["prev_reserves"], 1000)
+        self.assertEqual(second["prev_reserves"], 1000)
+        self.assertEqual(second["reserves"], 900)
+
+    def test_analyze_excel_streamed(self):
+        csv = "Company,bs_cash_cash_equivalents_and_sti,eqy_float,eqy_sh_out,px_last\n"
+        csv += "".join(f"C{i},{100 + i},90,100,1.0\n" for i in range(5))
+        with patch.object(Config, 'IMPORT_CHUNK_ROWS', 2):
+            app = create_app()
+        response = app.test_client().post(
+            '/api/data/analyze-excel?stream=true',
+            data={'file': (io.BytesIO(csv.encode()), 'drop.csv')},
+            content_type='multipart/form-data',
+        )
+        self.assertEqual(response.status_code, 200)
+
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual([r["company"] for r in lines[:-1]], [f"C{i}" for i in range(5)])
+        self.assertEqual(lines[-1]["total_analyzed"], 5)
+        self.assertEqual(lines[-1]["summary"]["row_count"], 5)
+        self.assertEqual(lines[-1]["summary"]["basic_stats"]["bs_cash_cash_equivalents_and_sti"]["max"], 104)
+
+    def test_upload_excel_streamed(self):
+        csv = "Company,bs_cash_cash_equivalents_and_sti,eqy_float,eqy_sh_out,px_last\n"
+        csv += "".join(f"C{i},{100 + i},90,100,1.0\n" for i in range(5))
+        csv += "C5,oops,90,100,1.0\n"
+        with patch.object(Config, 'IMPORT_CHUNK_ROWS', 2):
+            client = create_app().test_client()
+
+        def upload(body):
+            return client.post('/api/data/upload-excel?stream=true',
+                               data={'file': (io.BytesIO(body.encode()), 'drop.csv')},
+                               content_type='multipart/form-data')
+
+        response = upload(csv)
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual([s["company"] for s in lines[:-1]], [f"C{i}" for i in range(5)])
+        self.assertEqual((lines[-1]["count"], lines[-1]["skipped_rows"]), (5, 1))
+        summary = lines[-1]["summary"]
+        self.assertEqual(summary["row_count"], 6)
+        self.assertEqual(summary["basic_stats"]["px_last"]["p95"], 1.0)
+
+        missing = upload("Company,px_last\nC0,1.0\n")
+        self.assertEqual(missing.status_code, 400)
+        self.assertIn("eqy_float", missing.json["missing_columns"])
+
+    def test_streams_end_with_error_line(self):
+        from data_layer.collectors.excel_importer import EXCEL_IMPORTER
+
+        csv = "Company,bs_cash_cash_equivalents_and_sti,eqy_float,eqy_sh_out,px_last\n"
+        csv += "".join(f"C{i},{100 + i},90,100,1.0\n" for i in range(4))
+        with patch.object(Config, 'IMPORT_CHUNK_ROWS', 2):
+            client = create_app().test_client()
+
+        transform = EXCEL_IMPORTER.transform_equity_to_frame
+        for url in ('/api/data/upload-excel?stream=true', '/api/data/analyze-excel?stream=true'):
+            calls = []
+
+            def flaky(df):
+                # The second chunk fails after the first one was sent
+                calls.append(df)
+                if len(calls) > 1:
+                    raise OSError("read failed")
+                return transform(df)
+
+            with patch.object(EXCEL_IMPORTER, 'transform_equity_to_frame', side_effect=flaky):
+                response = client.post(url, data={'file': (io.BytesIO(csv.encode()), 'drop.csv')},
+                                       content_type='multipart/form-data')
+                lines = [json.loads(line) for line in response.data.decode().splitlines()]
+            self.assertEqual(len(lines), 3)
+            self.assertEqual(lines[-1]["error"], "read failed")
+
+    def test_analyze_excel_cached(self):
+        csv = b"Company,bs_cash_cash_equivalents_and_sti,eqy_float,eqy_sh_out,px_last\nC0,100,90,100,1.0\n"
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        with patch.object(Config, 'UPLOAD_CACHE_DIR', cache_dir):
+            client = create_app().test_client()
+
+        def upload(body):
+            return client.post('/api/data/analyze-excel',
+                               data={'file': (io.BytesIO(body), 'drop.csv')},
+                               content_type='multipart/form-data').json
+
+        # The entity store then holds the upload's own snapshot, which counts
+        # as unchanged; a hit neither parses nor transforms the file
+        first = upload(csv)
+        with patch('backend.routes.data_routes.EXCEL_IMPORTER.transform_equity_to_frame') as transform:
+            responses = [upload(csv) for _ in range(2)]
+        transform.assert_not_called()
+        self.assertEqual([r["cached"] for r in [first] + responses], [False, True, True])
+        self.assertEqual(first["results"], responses[1]["results"])
+
+        # A hit still records the upload as each company's latest snapshot
+        lower = csv.replace(b",100,90", b",50,90")
+        self.assertEqual([upload(body)["cached"] for body in (lower, csv, lower)], [False, False, True])
+        entity_store = client.application.extensions['entity_store']
+        self.assertEqual(entity_store.get("C0")["reserves"], 50.0)
+        self.assertTrue(upload(csv)["cached"])
+
+    def test_analyze_coalesced(self):
+        with patch.object(Config, 'COALESCE_REQUESTS', True):
+            app = create_app()
+        client = app.test_client()
+        self.addCleanup(app.extensions['risk_coalescer'].close)
+
+        payload = {"reserves": 1000000, "supply": 1000000, "price": 1.0}
+        response = client.post('/api/risk/analyze', json=payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("risk_score", response.json)
+
+        stats = client.get('/api/risk/analyze/stats').json
+        self.assertTrue(stats["coalescing"])
+        self.assertEqual(stats["requests"], 1)
+
+    def test_analyze_stats_disabled(self):
+        response = self.client.get('/api/risk/analyze/stats')
+        self.assertEqual(response.json, {"coalescing": False})
+
     def test_debug_alert(self):
         response = self.client.get('/api/risk/debug/alert')
         self.assertEqual(response.status_code, 200)
@@ -73,6 +217,82 @@ class TestBackend(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json['risk_score'], 50)
 
+    def test_all_venues_down(self):
+        # Nothing listens on port 1, so every venue fails at once
+        names = ["binance", "kraken", "coinbase"]
+        chain = lambda: {"circulatingSupply": 1000.0, "whale_supply": 0.0}
+        custodian = lambda: {"totalReserves": 1000.0, "custodians": [1000.0]}
+        with patch.object(PRICE_AGGREGATOR, 'venues', build_venues(names, {n: "http://127.0.0.1:1" for n in names})), \
+                patch.object(PRICE_AGGREGATOR, 'breakers', {n: CircuitBreaker() for n in names}), \
+                patch.dict(PRICE_CACHE._values, clear=True), \
+                patch.dict(COLLECTOR_RUNNER._last_good, clear=True), \
+                patch.dict(COLLECTOR_RUNNER.sources, {"chain": chain, "custodian": custodian}), \
+                patch('backend.routes.data_routes.get_blockchain_data', chain), \
+                patch('backend.routes.data_routes.get_custodian_data', custodian):
+            live = self.client.get('/api/risk/analyze/live')
+            snapshot = self.client.get('/api/data/snapshot')
+
+        # No price is reported rather than a peg that was never observed
+        self.assertEqual(live.status_code, 503)
+        self.assertEqual(live.json["missing_sources"], ["exchange"])
+        self.assertNotIn("risk_score", live.json)
+        self.assertEqual(snapshot.status_code, 200)
+        self.assertIsNone(snapshot.json["price"])
+        self.assertEqual(snapshot.json["missing_sources"], ["exchange"])
+        self.assertEqual(snapshot.json["reserves"], 1000.0)
+
+    def test_collection_settings(self):
+        # The collection daemon applies Config through the same helper as create_app
+        defaults = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+        self.addCleanup(configure_collection, defaults)
+        registry = configure_collection({**defaults, 'COLLECT_DEADLINE_MS': 123, 'COLLECT_MAX_WORKERS': 3,
+                                         'PRICE_VENUES': ['kraken'], 'PRICE_CACHE_TTL': 7.0})
+
+        self.assertEqual(COLLECTOR_RUNNER.deadline, 0.123)
+        self.assertEqual(COLLECTOR_RUNNER.max_workers, 3)
+        self.assertEqual([v.name for v in PRICE_AGGREGATOR.venues], ['kraken'])
+        self.assertEqual(PRICE_CACHE.ttl, 7.0)
+        self.assertEqual(registry.ids(), ['USDC'])
+
+    def test_asset_parameter(self):
+        response = self.client.get('/api/risk/analyze/live?asset=DAI')
+        self.assertEqual(response.status_code, 404)
+
+        monitor = self.app.extensions['asset_monitor']
+        with patch.object(monitor, 'score', return_value={"USDC": {"asset": "USDC", "risk_score": 5}}) as mock_score:
+            response = self.client.get('/api/risk/analyze/live?asset=usdc')
+        mock_score.assert_called_once_with(["USDC"])
+        self.assertEqual(response.json['risk_score'], 5)
+
+        response = self.client.post('/api/risk/analyze', json={"reserves": 1000, "supply": 1000, "asset": "DAI"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_history_query(self):
+        store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, store_dir)
+        SnapshotStore(store_dir).append_many([
+            {"timestamp": f"2025-12-01T00:0{i}:00Z", "reserves": 1000.0 + i, "supply": 1200.0,
+             "whale_supply": 0.0, "price": 1.0, "custodians": [600.0, 400.0 + i]}
+            for i in range(5)
+        ])
+        with patch.object(Config, 'SNAPSHOT_STORE_DIR', store_dir):
+            client = create_app().test_client()
+
+        response = client.get('/api/data/history?from=2025-12-01T00:01:00Z&to=2025-12-01T00:04:00Z'
+                              '&fields=reserves,custodians&limit=2')
+        self.assertEqual(response.status_code, 200)
+        body = response.json
+        self.assertEqual((body["total"], body["next_offset"]), (3, 2))
+        self.assertEqual(body["rows"][0], {"timestamp": "2025-12-01T00:01:00.000000Z",
+                                           "reserves": 1001.0, "custodians": [600.0, 401.0]})
+
+        response = client.get('/api/data/history?from=2025-12-01T00:01:00Z&offset=2&limit=2')
+        self.assertEqual([r["reserves"] for r in response.json["rows"]], [1003.0, 1004.0])
+        self.assertIsNone(response.json["next_offset"])
+
+        self.assertEqual(client.get('/api/data/history?fields=volume').status_code, 400)
+        self.assertEqual(client.get('/api/data/history?from=yesterday').status_code, 400)
+
     def test_rescore_history_no_file(self):
         # Ensure we don't accidentally rely on a file existing on the user's disk
         with patch('os.path.exists', return_value=False):
@@ -116,5 +336,60 @@ class TestBackend(unittest.TestCase):
         self.assertEqual(data['forVotes'], 10)
         self.assertEqual(data['executed'], True)
 
+
+class _PriceHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = b'{"price": "0.9995"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPClientRegistry(unittest.TestCase):
+    def _serve(self, handler=_PriceHandler):
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    def test_keep_alive_reuses_connection(self):
+        base = self._serve()
+        client = HTTPClientRegistry()
+        self.addCleanup(client.close)
+
+        for _ in range(5):
+            self.assertEqual(client.get(f"{base}/price").json()["price"], "0.9995")
+
+        stats = client.stats()[base]
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertEqual(stats["hits"], 4)
+
+    def test_blocking_pool_reports_wait_time(self):
+        handler = type("SlowHandler", (_PriceHandler,), {"delay": 0.1})
+        base = self._serve(handler)
+        client = HTTPClientRegistry(pool_maxsize=1, pool_block=True)
+        self.addCleanup(client.close)
+
+        threads = [threading.Thread(target=client.get, args=(f"{base}/price",)) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = client.stats()[base]
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertGreater(stats["wait_ms_max"], 50)
+
 if __name__ == '__main__':
     unittest.main()
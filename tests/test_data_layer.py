@@ -0,0 +1,939 @@
+import sys
+import os
+import io
+import json
+import contextlib
+import http.server
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai_engine.anomaly_detector import ENGINE
+from backend.http_client import HTTP_CLIENT
+from data_layer.collectors.excel_importer import EXCEL_IMPORTER
+from data_layer.collectors import exchange_fetcher
+from data_layer.collectors.price_feed import PriceFeedClient
+from data_layer.collectors.price_aggregator import CircuitBreaker, PriceAggregator, PriceUnavailable, build_venues
+from data_layer.collectors.runner import CollectorRunner, SourcesUnavailable
+from data_layer.collector_service import CollectorService
+from data_layer.snapshot_segments import CorruptSegment, Segment, compact_snapshots, load_snapshot
+from data_layer.snapshot_store import SnapshotStore, load_history
+from data_layer.summary_stats import QuantileSketch
+from data_layer.ttl_cache import TTLCache
+from data_layer.upload_cache import UploadCache, cache_key
+from scripts.background_rescore import load_watermark, rescore_history
+
+
+def _equity_table():
+    return pd.DataFrame({
+        'Company ': ['AAPL US Equity', 'IBM US Equity', 'BAD US Equity', 'WPP LN Equity'],
+        'bs_cash_cash_equivalents_and_sti': [66907000000, 14417000000, 'n/a', 1437000000],
+        'eqy_float': [14433337344, 933439488, 100, 1078711296],
+        'eqy_sh_out': [14681140000, 934735206, 200, 1078802358],
+        'px_last': [260.58, 256.28, 1.0, np.nan],
+    })
+
+
+class TestEquityTransform(unittest.TestCase):
+    def test_columnar_metrics(self):
+        snapshots = EXCEL_IMPORTER.transform_equity_to_frame(_equity_table())
+        frame = snapshots.frame
+
+        self.assertEqual(list(frame['company']), ['AAPL US Equity', 'IBM US Equity', 'WPP LN Equity'])
+        self.assertEqual(frame['market_cap'][0], 14681140000 * 260.58)
+        self.assertEqual(frame['whale_supply'][1], 934735206 - 933439488)
+        self.assertAlmostEqual(frame['cash_to_market_cap'][0], 66907000000 / (14681140000 * 260.58))
+        self.assertEqual(frame['timestamp'].nunique(), 1)
+
+    def test_unconvertible_rows_are_masked(self):
+        snapshots = EXCEL_IMPORTER.transform_equity_to_frame(_equity_table())
+
+        # A missing price is kept (NaN), a non-numeric cash value is not
+        self.assertEqual(snapshots.invalid.tolist(), [False, False, True, False])
+        self.assertEqual(len(snapshots), 3)
+        self.assertTrue(np.isnan(snapshots.frame['price'][2]))
+
+    def test_dicts_match_list_api(self):
+        snapshots = EXCEL_IMPORTER.transform_equity_to_frame(_equity_table())
+        first = next(iter(snapshots))
+
+        self.assertIsInstance(first['reserves'], float)
+        self.assertEqual(first['custodians'], [])
+        self.assertEqual(first['data_type'], 'equity')
+
+        listed = EXCEL_IMPORTER.transform_equity_to_snapshots(_equity_table())
+        self.assertEqual([s['company'] for s in listed], list(snapshots.frame['company']))
+
+    def test_missing_company_column(self):
+        df = pd.DataFrame({'eqy_sh_out': [10.0, 20.0], 'px_last': [1.0, 2.0]})
+        frame = EXCEL_IMPORTER.transform_equity_to_frame(df).frame
+
+        self.assertEqual(list(frame['company']), ['Company_0', 'Company_1'])
+        self.assertEqual(list(frame['reserves']), [0.0, 0.0])
+
+
+class TestChunkedImport(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'Company': [f'C{i}' for i in range(25)],
+            'eqy_sh_out': np.arange(25, dtype=float) + 1,
+            'px_last': np.full(25, 2.0),
+        })
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def _assert_chunks(self, chunks):
+        self.assertEqual([len(c) for c in chunks], [10, 10, 5])
+        pd.testing.assert_frame_equal(pd.concat(chunks), self.df, check_dtype=False)
+
+    def test_csv_chunks_from_file_object(self):
+        data = self.df.to_csv(index=False).encode()
+        self._assert_chunks(list(EXCEL_IMPORTER.iter_chunks(io.BytesIO(data), 'drop.csv', chunk_rows=10)))
+
+    def test_xlsx_chunks_read_only(self):
+        path = os.path.join(self.tmpdir, 'drop.xlsx')
+        self.df.to_excel(path, index=False)
+        self._assert_chunks(list(EXCEL_IMPORTER.iter_chunks(path, chunk_rows=10)))
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            next(EXCEL_IMPORTER.iter_chunks(io.BytesIO(b''), 'drop.txt'))
+
+
+class TestUploadCache(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_round_trip_and_key(self):
+        cache = UploadCache(self.root)
+        df = pd.DataFrame({'a': [1.0, 2.0]})
+        key = cache_key(b'file bytes', '.xlsx', 0)
+
+        self.assertIsNone(cache.get(key, 'frame'))
+        cache.put(key, 'frame', df)
+        pd.testing.assert_frame_equal(cache.get(key, 'frame'), df)
+
+        self.assertNotEqual(key, cache_key(b'file bytes', '.xlsx', 1))
+        self.assertNotEqual(cache_key('ab', 'c'), cache_key('a', 'bc'))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_evicts_least_recently_used(self):
+        blob = b'x' * 1000
+        cache = UploadCache(self.root, max_bytes=2500)
+        cache.put('a', 'results', blob)
+        cache.put('b', 'results', blob)
+        os.utime(os.path.join(self.root, 'a.results.pkl'), (0, 0))
+        os.utime(os.path.join(self.root, 'b.results.pkl'), (1, 1))
+        cache.get('a', 'results')  # touch: b is now the oldest
+        cache.put('c', 'results', blob)
+
+        self.assertIsNone(cache.get('b', 'results'))
+        self.assertEqual(cache.get('a', 'results'), blob)
+        self.assertLessEqual(cache.size, 2500)
+
+        # A new instance picks up the entries already on disk
+        self.assertEqual(UploadCache(self.root).stats()['entries'], 2)
+
+
+def _minute_snapshots(start, count):
+    stamps = pd.date_range(start, periods=count, freq="min")
+    return [
+        {
+            "timestamp": ts.isoformat() + "Z",
+            "reserves": 1_000_000.0 + i,
+            "supply": 1_200_000.0,
+            "whale_supply": 25_000.0,
+            "price": 1.0,
+            "custodians": [600_000.0, 400_000.0 + i][: 1 + i % 2],
+        }
+        for i, ts in enumerate(stamps)
+    ]
+
+
+class _FlakyStore(SnapshotStore):
+    """
+    Fails the next ``failures`` appends (to ``month``'s partition, or any)
+    while writing ``column``, after the columns before it were written.
+    """
+
+    def __init__(self, root, column="price.f8", failures=0, month=None):
+        super().__init__(root)
+        self.column = column
+        self.failures = failures
+        self.month = month
+
+    def _append_partition(self, month, rows, stamps, fsync):
+        if self.month is not None and month != self.month:
+            return super()._append_partition(month, rows, stamps, fsync)
+
+        def flaky_open(path, mode="r", *args, **kwargs):
+            # Only appends to an existing column file, not the ones _repair creates
+            if (self.failures and mode == "ab" and os.path.basename(path) == self.column
+                    and os.path.exists(path)):
+                self.failures -= 1
+                raise OSError("disk full")
+            return open(path, mode, *args, **kwargs)
+
+        with patch("data_layer.snapshot_store.open", flaky_open, create=True):
+            return super()._append_partition(month, rows, stamps, fsync)
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.store = SnapshotStore(self.root)
+
+    def test_round_trip_across_partitions(self):
+        snapshots = _minute_snapshots("2025-12-31 23:58", 5)
+        self.store.append_many(snapshots[:3])
+        self.store.append(snapshots[3])
+        self.store.append(snapshots[4])
+
+        self.assertEqual([p.name for p in self.store.partitions()], ["2025-12", "2026-01"])
+        df = self.store.read(columns=["timestamp", "reserves", "custodians"])
+        self.assertEqual(len(df), 5)
+        self.assertEqual(df["timestamp"].iloc[2], pd.Timestamp("2026-01-01 00:00"))
+        np.testing.assert_array_equal(df["reserves"], [s["reserves"] for s in snapshots])
+        for row, snapshot in zip(df["custodians"], snapshots):
+            np.testing.assert_array_equal(row, snapshot["custodians"])
+
+    def test_query_time_range(self):
+        self.store.append_many(_minute_snapshots("2025-12-31 23:50", 20))
+
+        df = self.store.query("2025-12-31T23:55:00Z", "2026-01-01 00:05", columns=["timestamp", "custodians"])
+        self.assertEqual(list(df.columns), ["timestamp", "custodians"])
+        self.assertEqual(len(df), 10)
+        self.assertEqual(df["timestamp"].iloc[0], pd.Timestamp("2025-12-31 23:55"))
+        self.assertEqual(df["timestamp"].iloc[-1], pd.Timestamp("2026-01-01 00:04"))
+        np.testing.assert_array_equal(df["custodians"].iloc[0], [600_000.0, 400_005.0])
+        self.assertEqual(self.store.count("2025-12-31 23:55", "2026-01-01 00:05"), 10)
+
+        # Pages across the partition boundary add up to the whole range
+        pages = [self.store.query("2025-12-31 23:55", columns=["reserves"], offset=o, limit=4)
+                 for o in range(0, 16, 4)]
+        self.assertEqual([len(p) for p in pages], [4, 4, 4, 3])
+        np.testing.assert_array_equal(pd.concat(pages)["reserves"], 1_000_000.0 + np.arange(5, 20))
+
+        self.assertEqual(len(self.store.query(end="2025-01-01")), 0)
+        with self.assertRaises(KeyError):
+            self.store.query(columns=["volume"])
+
+    def test_rejects_out_of_order_appends(self):
+        snapshots = _minute_snapshots("2025-06-01", 3)
+        self.store.append_many([snapshots[2], snapshots[1]])  # a batch is sorted first
+        with self.assertRaises(ValueError):
+            self.store.append(snapshots[0])
+        self.assertEqual(len(self.store), 2)
+
+    def test_interrupted_append_is_ignored_and_repaired(self):
+        snapshots = _minute_snapshots("2025-06-01", 3)
+        self.store.append_many(snapshots[:2])
+
+        # A crash after writing some columns but before the timestamp
+        partition = self.store.partitions()[0]
+        with open(os.path.join(partition.path, "reserves.f8"), "ab") as f:
+            f.write(np.float64(-1).tobytes())
+        self.assertEqual(len(SnapshotStore(self.root).read()), 2)
+
+        reopened = SnapshotStore(self.root)
+        reopened.append(snapshots[2])
+        df = reopened.read()
+        np.testing.assert_array_equal(df["reserves"], [s["reserves"] for s in snapshots])
+
+    def test_failed_append_is_repaired_before_the_next(self):
+        snapshots = _minute_snapshots("2025-06-01", 6)
+        store = _FlakyStore(self.root)
+        store.append_many(snapshots[:2])
+
+        # Fails after reserves/supply/whale_supply were written; the same store retries
+        store.failures = 1
+        with self.assertRaises(OSError):
+            store.append_many(snapshots[2:4])
+        self.assertEqual(len(store), 2)
+        store.append_many(snapshots[2:4])
+        store.append_many(snapshots[4:])
+
+        df = store.read(columns=["timestamp", "reserves", "supply", "price", "custodians"])
+        self.assertEqual(len(df), 6)
+        np.testing.assert_array_equal(df["reserves"], [s["reserves"] for s in snapshots])
+        np.testing.assert_array_equal(df["supply"], [s["supply"] for s in snapshots])
+        for row, snapshot in zip(df["custodians"], snapshots):
+            np.testing.assert_array_equal(row, snapshot["custodians"])
+
+    def test_import_and_load_history(self):
+        csv_path = os.path.join(self.root, "history.csv")
+        pd.DataFrame([{**s, "custodians": json.dumps(s["custodians"])}
+                      for s in _minute_snapshots("2025-06-01", 4)]).to_csv(csv_path, index=False)
+
+        # Falls back to the CSV until the store has rows
+        store_root = os.path.join(self.root, "store")
+        self.assertEqual(len(load_history(store_root, csv_path)), 4)
+        self.assertEqual(SnapshotStore(store_root).import_csv(csv_path), 4)
+        history = load_history(store_root, os.path.join(self.root, "missing.csv"))
+        self.assertEqual(history["timestamp"].dtype.kind, "M")
+        self.assertIsNone(load_history(os.path.join(self.root, "empty"), os.path.join(self.root, "missing.csv")))
+
+    def test_year_of_minute_snapshots_loads_fast(self):
+        stamps = pd.date_range("2025-01-01", periods=525_600, freq="min").asi8
+        rows = np.arange(len(stamps), dtype=np.float64)
+        # Write the column files directly; per-row appends are not what is timed
+        months = stamps.view("datetime64[ns]").astype("datetime64[M]").astype(str)
+        for month in np.unique(months):
+            mask = months == month
+            path = os.path.join(self.root, month)
+            os.makedirs(path)
+            for name in ("reserves", "supply", "whale_supply", "price"):
+                rows[mask].tofile(os.path.join(path, f"{name}.f8"))
+            np.arange(1, mask.sum() + 1, dtype=np.int64).tofile(os.path.join(path, "custodians.ends.i8"))
+            rows[mask].tofile(os.path.join(path, "custodians.values.f8"))
+            stamps[mask].tofile(os.path.join(path, "timestamp.i8"))
+
+        start = time.perf_counter()
+        df = self.store.read()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(df), 525_600)
+        self.assertEqual(df["reserves"].iloc[-1], 525_599.0)
+        self.assertLess(elapsed, 1.0)
+
+
+class _SlowStore(SnapshotStore):
+    def __init__(self, root, delay):
+        super().__init__(root)
+        self.delay = delay
+        self.batches = []
+
+    def append_many(self, snapshots, fsync=False):
+        time.sleep(self.delay)
+        self.batches.append(len(snapshots))
+        return super().append_many(snapshots, fsync=fsync)
+
+
+class _BrokenStore(SnapshotStore):
+    def append_many(self, snapshots, fsync=False):
+        raise OSError("disk unavailable")
+
+
+class TestCollectorService(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.runner = CollectorRunner({
+            "chain": lambda: {"circulatingSupply": 1000.0, "whale_supply": 0.0},
+            "custodian": lambda: {"totalReserves": 900.0, "custodians": [500.0, 400.0]},
+            "exchange": lambda: {"price": 1.0},
+        }, deadline=1.0)
+
+    def _run(self, service, ticks):
+        service.start()
+        deadline = time.time() + 10
+        while service.stats()["ticks"] < ticks and time.time() < deadline:
+            time.sleep(0.005)
+        service.stop()
+        return service.stats()
+
+    def test_batched_writes_and_drain_on_stop(self):
+        store = _SlowStore(self.root, delay=0)
+        service = CollectorService(store, runner=self.runner, interval=0.005, jitter=0.5,
+                                   flush_rows=5, flush_interval=30)
+        stats = self._run(service, ticks=12)
+
+        # Nothing buffered is lost on shutdown, and rows go out in batches
+        self.assertEqual(stats["buffered"], 0)
+        self.assertEqual(stats["rows_written"], stats["ticks"])
+        self.assertEqual(len(store), stats["ticks"])
+        self.assertLess(stats["flushes"], stats["ticks"])
+        self.assertTrue(all(n <= 5 for n in store.batches))
+        self.assertIsNotNone(stats["last_tick_ms"])
+
+        df = store.read(columns=["timestamp", "reserves", "custodians"])
+        self.assertTrue(df["timestamp"].is_monotonic_increasing)
+        np.testing.assert_array_equal(df["custodians"].iloc[0], [500.0, 400.0])
+
+    def test_backpressure_bounds_the_buffer(self):
+        store = _SlowStore(self.root, delay=0.05)
+        service = CollectorService(store, runner=self.runner, interval=0, jitter=0,
+                                   buffer_size=2, flush_rows=2, flush_interval=0)
+        stats = self._run(service, ticks=10)
+
+        self.assertGreater(stats["blocked_ms"], 0)
+        self.assertEqual(stats["rows_written"], stats["ticks"])
+        self.assertEqual(len(store), stats["ticks"])
+        self.assertEqual(stats["dropped_rows"], 0)
+
+    def test_stop_gives_up_on_failing_writes(self):
+        service = CollectorService(_BrokenStore(self.root), runner=self.runner, interval=60,
+                                   flush_interval=0, drain_timeout=0.2)
+        service.start()
+        deadline = time.time() + 5
+        while service.stats()["write_errors"] == 0 and time.time() < deadline:
+            time.sleep(0.005)
+
+        start = time.perf_counter()
+        service.stop()
+        self.assertLess(time.perf_counter() - start, 2.0)
+        self.assertFalse(service._writer.is_alive())
+        stats = service.stats()
+        self.assertEqual(stats["dropped_rows"], stats["ticks"])
+        self.assertEqual(stats["buffered"], 0)
+
+    def test_retry_writes_only_uncommitted_rows(self):
+        snapshots = _minute_snapshots("2025-12-31 23:58", 5)
+        store = _FlakyStore(self.root, failures=1, month="2026-01")
+        store.append(snapshots[0])
+        service = CollectorService(store, runner=self.runner)
+
+        # December is committed, then January fails half-written
+        service._flush(snapshots[1:4])
+        service._flush(snapshots[4:])
+
+        stats = service.stats()
+        self.assertEqual((stats["write_errors"], stats["dropped_rows"], stats["rows_written"]), (1, 0, 4))
+        df = store.read(columns=["timestamp", "reserves", "custodians"])
+        self.assertEqual(len(df), 5)
+        np.testing.assert_array_equal(df["reserves"], [s["reserves"] for s in snapshots])
+        for row, snapshot in zip(df["custodians"], snapshots):
+            np.testing.assert_array_equal(row, snapshot["custodians"])
+
+    def test_incomplete_ticks_are_not_stored(self):
+        def down():
+            raise RuntimeError("custodian API down")
+
+        self.runner.sources["custodian"] = down
+        observed = []
+        store = SnapshotStore(self.root)
+        service = CollectorService(store, runner=self.runner, on_snapshot=observed.append)
+        self.assertIsNone(service.collect_once())
+        service.stop()
+
+        self.assertEqual(service.stats()["incomplete_ticks"], 1)
+        self.assertEqual(service.stats()["buffered"], 0)
+        self.assertEqual((len(store), observed), (0, []))
+
+
+class _CountingEngine:
+    def __init__(self, version):
+        self.version = version
+        self.batches = []
+
+    def model_version(self):
+        return self.version
+
+    def analyze_batch(self, features):
+        self.batches.append(len(features))
+        return ENGINE.analyze_batch(features)
+
+
+class TestBackgroundRescore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.store = SnapshotStore(os.path.join(self.dir, "store"))
+        self.snapshots = _minute_snapshots("2025-12-31 23:50", 30)
+        for i, snapshot in enumerate(self.snapshots):
+            snapshot["reserves"] -= 20_000.0 * (i % 7)
+
+    def _rescore(self, engine, name="scores", **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            watermark = rescore_history(root=self.store.root, legacy_csv=os.path.join(self.dir, "none.csv"),
+                                        scores_path=os.path.join(self.dir, f"{name}.csv"),
+                                        watermark_path=os.path.join(self.dir, f"{name}.json"),
+                                        engine=engine, **kwargs)
+        return watermark, pd.read_csv(os.path.join(self.dir, f"{name}.csv"))
+
+    def test_scores_only_new_rows(self):
+        engine = _CountingEngine("v1")
+        self.store.append_many(self.snapshots[:20])
+        self._rescore(engine)
+        inode = os.stat(os.path.join(self.dir, "scores.csv")).st_ino
+        self.store.append_many(self.snapshots[20:])
+        watermark, scores = self._rescore(engine)
+        self._rescore(engine)
+        self.assertEqual(engine.batches, [20, 10])
+        # Appended in place, not rewritten
+        self.assertEqual(os.stat(os.path.join(self.dir, "scores.csv")).st_ino, inode)
+
+        # Same scores as rescoring everything at once
+        _, full = self._rescore(_CountingEngine("v1"), name="full")
+        pd.testing.assert_frame_equal(scores, full)
+        self.assertEqual(watermark["rows"], 30)
+        self.assertEqual(watermark["last_timestamp"], "2026-01-01T00:19:00.000000Z")
+        self.assertEqual(scores["timestamp"].iloc[0], "2025-12-31T23:50:00.000000Z")
+
+    def test_full_rescore_on_model_change(self):
+        self.store.append_many(self.snapshots)
+        self._rescore(_CountingEngine("v1"))
+        engine = _CountingEngine("v2")
+        watermark, scores = self._rescore(engine)
+        self.assertEqual(engine.batches, [30])
+        self.assertEqual(watermark["model_version"], "v2")
+        self.assertEqual(len(scores), 30)
+
+    def test_rows_past_the_watermark_are_dropped(self):
+        engine = _CountingEngine("v1")
+        self.store.append_many(self.snapshots[:20])
+        self._rescore(engine)
+        # A run that died after renaming the scores but before the watermark
+        with open(os.path.join(self.dir, "scores.csv"), "a") as f:
+            f.write("2026-01-01T00:10:00.000000Z,99,CRITICAL\n")
+
+        self.store.append_many(self.snapshots[20:])
+        watermark, scores = self._rescore(engine)
+        self.assertEqual(engine.batches, [20, 10])
+        self.assertEqual(len(scores), 30)
+        self.assertTrue(scores["timestamp"].is_unique)
+        self.assertEqual(load_watermark(os.path.join(self.dir, "scores.json")), watermark)
+
+
+class TestSnapshotSegments(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.snapshots = _minute_snapshots("2025-12-23 19:28:36.344209", 50)
+        self.paths = [self._write_json(s) for s in self.snapshots]
+
+    def _write_json(self, snapshot, age_s=2 * 86_400):
+        # Same naming and formatting as the old collect_snapshot
+        name = "snapshot_" + snapshot["timestamp"].replace(":", "-") + ".json"
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as f:
+            json.dump(snapshot, f, indent=4)
+        old = time.time() - age_s
+        os.utime(path, (old, old))
+        return path
+
+    def test_compact_and_read_back(self):
+        fresh = self._write_json({**self.snapshots[-1], "timestamp": "2026-01-01T00:00:00Z"}, age_s=0)
+        json_bytes = sum(os.path.getsize(p) for p in self.paths)
+
+        segments = compact_snapshots(self.dir)
+        self.assertEqual(len(segments), 1)
+        self.assertFalse(any(os.path.exists(p) for p in self.paths))
+        self.assertTrue(os.path.exists(fresh))  # too recent to compact
+        self.assertLess(os.path.getsize(segments[0]), json_bytes / 3)
+
+        segment = Segment(segments[0])
+        self.assertEqual(len(segment), 50)
+        self.assertEqual(list(segment), self.snapshots)
+        self.assertEqual(load_snapshot(self.paths[17]), self.snapshots[17])
+        self.assertIsNone(segment.get("2020-01-01T00:00:00Z"))
+        with self.assertRaises(FileNotFoundError):
+            load_snapshot(os.path.join(self.dir, "snapshot_2020-01-01T00-00-00Z.json"))
+
+    def test_leftover_originals_are_not_packed_twice(self):
+        compact_snapshots(self.dir)
+        # As if the process died after writing the segment but before deleting this file
+        leftover = self._write_json(self.snapshots[3])
+
+        self.assertEqual(compact_snapshots(self.dir), [])
+        self.assertFalse(os.path.exists(leftover))
+
+    def test_compaction_opens_only_covering_segments(self):
+        segments = compact_snapshots(self.dir, max_per_segment=10)
+        self.assertEqual(len(segments), 5)
+        leftover = self._write_json(self.snapshots[23])
+        for snapshot in _minute_snapshots("2025-12-24", 3):
+            self._write_json(snapshot)
+
+        # The leftover is looked up in the one segment named for its range,
+        # then only the new segment is read back
+        with patch("data_layer.snapshot_segments.Segment", wraps=Segment) as opened:
+            new = compact_snapshots(self.dir)
+        self.assertEqual([c.args[0] for c in opened.call_args_list], [segments[2]] + new)
+        self.assertFalse(os.path.exists(leftover))
+        self.assertEqual(load_snapshot(self.paths[23]), self.snapshots[23])
+
+    def test_corrupt_record_is_detected(self):
+        segment = Segment(compact_snapshots(self.dir)[0])
+        entry = segment.index[5]
+        with open(segment.path, "r+b") as f:
+            f.seek(int(entry["offset"]) + 2)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+        with self.assertRaises(CorruptSegment):
+            Segment(segment.path).get(self.snapshots[5]["timestamp"])
+        self.assertEqual(Segment(segment.path).get(self.snapshots[6]["timestamp"]), self.snapshots[6])
+
+    def test_annotate_reads_from_segment(self):
+        from utils.snapshot_annotator import annotate_snapshot
+
+        compact_snapshots(self.dir)
+        output = os.path.join(self.dir, "annotated.json")
+        annotate_snapshot(self.paths[0], output)
+        with open(output) as f:
+            annotated = json.load(f)
+        self.assertEqual(annotated["reserves"], self.snapshots[0]["reserves"])
+        self.assertIn("risk_score", annotated["risk"])
+
+
+class TestSummaryStats(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.df = pd.DataFrame({
+            'cash': rng.lognormal(size=20_000),
+            'price': rng.normal(100, 5, 20_000),
+            'company': ['X'] * 20_000,
+        })
+        self.df.loc[::9, 'cash'] = np.nan
+
+    def test_chunked_matches_exact(self):
+        exact = EXCEL_IMPORTER.get_data_summary(self.df, exact=True)
+        chunks = (self.df.iloc[i:i + 3000] for i in range(0, len(self.df), 3000))
+        approx = EXCEL_IMPORTER.summarize_chunks(chunks)
+
+        self.assertFalse(approx['exact'])
+        for key in ('row_count', 'column_count', 'columns', 'null_counts', 'numeric_columns'):
+            self.assertEqual(approx[key], exact[key])
+        for col in ('cash', 'price'):
+            for stat in ('min', 'max', 'mean', 'std'):
+                self.assertAlmostEqual(approx['basic_stats'][col][stat], exact['basic_stats'][col][stat])
+
+            values = self.df[col].dropna()
+            for stat, q in (('median', 0.5), ('p5', 0.05), ('p25', 0.25), ('p75', 0.75), ('p95', 0.95)):
+                self.assertAlmostEqual(exact['basic_stats'][col][stat], values.quantile(q))
+                rank = (values < approx['basic_stats'][col][stat]).mean()
+                self.assertAlmostEqual(rank, q, delta=0.01)
+
+    def test_large_tables_default_to_one_pass(self):
+        with patch.object(EXCEL_IMPORTER, 'EXACT_SUMMARY_ROWS', 100):
+            self.assertFalse(EXCEL_IMPORTER.get_data_summary(self.df)['exact'])
+        self.assertTrue(EXCEL_IMPORTER.get_data_summary(self.df)['exact'])
+
+    def test_sketch_stays_small(self):
+        sketch = QuantileSketch(k=128)
+        values = np.random.default_rng(0).uniform(size=200_000)
+        for start in range(0, len(values), 10_000):
+            sketch.update(values[start:start + 10_000])
+
+        self.assertLess(sum(len(level) for level in sketch.levels), 128 * len(sketch.levels) + 1)
+        self.assertAlmostEqual(sketch.quantile(0.9), 0.9, delta=0.02)
+
+
+class TestCollectorRunner(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def _slow_exchange(self):
+        self.calls += 1
+        if self.calls > 1:
+            self.release.wait(5)
+        return {"price": 0.98 if self.calls > 1 else 1.0}
+
+    def _sources(self):
+        return {
+            "chain": lambda: {"circulatingSupply": 1000.0, "whale_supply": 10.0},
+            "custodian": lambda: {"totalReserves": 900.0, "custodians": [900.0]},
+            "exchange": self._slow_exchange,
+        }
+
+    def test_slow_source_is_stale_within_deadline(self):
+        runner = CollectorRunner(self._sources(), deadline=0.05)
+        self.addCleanup(self.release.set)
+
+        first = runner.collect()
+        self.assertEqual(first.stale_sources, [])
+
+        start = time.perf_counter()
+        second = runner.collect()
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(second.stale_sources, ["exchange"])
+        self.assertEqual(second.sources["exchange"]["error"], "deadline exceeded")
+        self.assertEqual(second.snapshot()["price"], 1.0)  # last good value
+        self.assertEqual(second.snapshot()["reserves"], 900.0)
+
+        # The pending call is reused rather than started again
+        runner.collect()
+        self.assertEqual(self.calls, 2)
+
+        self.release.set()
+        time.sleep(0.05)
+        self.assertEqual(runner.collect().data["exchange"]["price"], 0.98)
+
+    def test_failed_source_without_history(self):
+        def broken():
+            raise RuntimeError("node down")
+
+        result = CollectorRunner({"chain": broken}).collect()
+        self.assertTrue(result.sources["chain"]["stale"])
+        self.assertIsNone(result.data["chain"])
+        self.assertEqual(result.missing_sources, ["chain"])
+        self.assertIsNone(result.snapshot()["supply"])
+        with self.assertRaises(SourcesUnavailable):
+            result.require()
+
+    def test_last_good_expires(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) > 1:
+                raise RuntimeError("node down")
+            return {"circulatingSupply": 1000.0, "whale_supply": 0.0}
+
+        runner = CollectorRunner({"chain": flaky}, max_stale=0.05)
+        runner.collect()
+        self.assertEqual(runner.collect().snapshot()["supply"], 1000.0)  # recent enough
+        time.sleep(0.1)
+        result = runner.collect()
+        self.assertEqual(result.missing_sources, ["chain"])
+        self.assertIsNone(result.snapshot()["supply"])
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_stale_while_revalidate(self):
+        cache = TTLCache(ttl=0.05, max_stale=10)
+        release = threading.Event()
+        prices = iter([1.0, 0.99])
+
+        def fetch():
+            price = next(prices)
+            if price != 1.0:
+                release.wait(5)
+            return price
+
+        self.assertEqual(cache.get("USDC", fetch), (1.0, 0.0))
+        time.sleep(0.06)
+
+        # Stale value comes back immediately while the refresh is blocked
+        start = time.perf_counter()
+        value, age = cache.get("USDC", fetch)
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertEqual(value, 1.0)
+        self.assertGreater(age, 0.05)
+
+        release.set()
+        for _ in range(100):
+            if cache.peek("USDC")[0] == 0.99:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get("USDC", fetch)[0], 0.99)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        cache = TTLCache(ttl=10)
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return 1.0
+
+        threads = [threading.Thread(target=cache.get, args=("USDC", fetch)) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_failed_refresh_keeps_old_value(self):
+        cache = TTLCache(ttl=0, max_stale=0)
+        cache.get("USDC", lambda: 1.0)
+
+        def broken():
+            raise ConnectionError("exchange down")
+
+        value, age = cache.get("USDC", broken)
+        self.assertEqual(value, 1.0)
+        with self.assertRaises(ConnectionError):
+            cache.get("USDT", broken)
+
+
+class _VenueHandler(http.server.BaseHTTPRequestHandler):
+    """Stand-in for the venue ticker endpoints; behaviour set per test on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        venue = self.path.split("/")[1]
+        behaviour = self.server.venues[venue]
+        self.server.hits[venue] = self.server.hits.get(venue, 0) + 1
+        time.sleep(behaviour.get("delays", [0.0]).pop(0) if behaviour.get("delays") else 0.0)
+
+        if behaviour.get("fail"):
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        price = behaviour["price"]
+        path = self.path.split("/", 2)[2]
+        if path.startswith("api/v3"):
+            body = {"symbol": "USDCUSD", "price": str(price)}
+        elif path.startswith("0/public"):
+            body = {"error": [], "result": {"USDCUSD": {"c": [str(price), "1"]}}}
+        else:
+            body = {"data": {"amount": str(price), "currency": "USD"}}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _QuietServer(http.server.ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # clients abandoning slow requests is the point of these tests
+
+
+class TestPriceAggregator(unittest.TestCase):
+    def setUp(self):
+        self.server = _QuietServer(("127.0.0.1", 0), _VenueHandler)
+        self.server.venues = {
+            "binance": {"price": 0.9990},
+            "kraken": {"price": 1.0000},
+            "coinbase": {"price": 0.9996},
+        }
+        self.server.hits = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        venues = build_venues(["binance", "kraken", "coinbase"],
+                              {name: f"{base}/{name}" for name in self.server.venues})
+        self.aggregator = PriceAggregator(venues, budget=0.5, hedge_after=0.1,
+                                          failure_threshold=2, reset_timeout=60)
+        self.base = base
+
+    def test_median_and_spread(self):
+        quote = self.aggregator.aggregate()
+        self.assertEqual(quote["price"], 0.9996)
+        self.assertAlmostEqual(quote["spread_bps"], (1.0 - 0.999) / 0.9996 * 1e4)
+        self.assertEqual(quote["venue_count"], 3)
+        self.assertIn(self.base, HTTP_CLIENT.stats())
+
+    def test_slow_venue_is_hedged(self):
+        # The first request stalls past the budget, the hedge answers at once
+        self.server.venues["kraken"]["delays"] = [1.0]
+        start = time.perf_counter()
+        quote = self.aggregator.aggregate()
+
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(quote["venues"]["kraken"]["status"], "ok")
+        self.assertTrue(quote["venues"]["kraken"]["hedged"])
+        self.assertFalse(quote["venues"]["binance"]["hedged"])
+        self.assertEqual(self.server.hits["kraken"], 2)
+
+    def test_budget_and_circuit_breaker(self):
+        self.server.venues["coinbase"]["fail"] = True
+        self.server.venues["binance"]["delays"] = [2.0, 2.0]
+
+        quote = self.aggregator.aggregate()
+        self.assertEqual(quote["venues"]["coinbase"]["status"], "error")
+        self.assertEqual(quote["venues"]["binance"]["status"], "timeout")
+        self.assertEqual(quote["price"], 1.0)
+
+        self.aggregator.aggregate()
+        quote = self.aggregator.aggregate()
+        self.assertEqual(quote["venues"]["coinbase"]["status"], "circuit_open")
+        self.assertEqual(self.server.hits["coinbase"], 2)
+
+    def test_half_open_breaker_allows_one_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # the probe is still out
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())  # re-opened for another period
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+    def test_venues_quote_against_usd(self):
+        paths = {v.name: v.path for v in build_venues(["binance", "kraken", "coinbase"], asset="USDT")}
+        self.assertEqual(paths, {
+            "binance": "/api/v3/ticker/price?symbol=USDTUSD",
+            "kraken": "/0/public/Ticker?pair=USDTUSD",
+            "coinbase": "/v2/prices/USDT-USD/spot",
+        })
+
+    def test_no_venue_raises(self):
+        for venue in self.server.venues.values():
+            venue["fail"] = True
+        with self.assertRaises(PriceUnavailable):
+            self.aggregator.aggregate()
+
+
+class TestPriceFeed(unittest.TestCase):
+    """Runs the client against a local stand-in for the Binance trade stream."""
+
+    def setUp(self):
+        from websockets.sync.server import serve
+
+        self.batches = [[1, 2, 5], [6, 6, 7]]  # trade IDs per connection: 3, 4 missed; 6 repeated
+        self.subscriptions = []
+        done = threading.Event()
+
+        def handler(ws):
+            self.subscriptions.append(json.loads(ws.recv()))
+            trade_ids = self.batches.pop(0) if self.batches else []
+            for trade_id in trade_ids:
+                ws.send(json.dumps({"e": "trade", "s": "USDCUSD", "p": f"0.99{trade_id}", "t": trade_id}))
+            if self.batches:
+                return  # drop the connection; the client has to reconnect
+            done.wait(5)
+
+        self.server = serve(handler, "127.0.0.1", 0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(done.set)
+        self.url = f"ws://127.0.0.1:{self.server.socket.getsockname()[1]}"
+
+    def _wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_reconnects_and_tracks_gaps(self):
+        feed = PriceFeedClient(self.url, reconnect_initial=0.05)
+        feed.start()
+        self.addCleanup(feed.stop)
+
+        self._wait_for(lambda: feed.get("usdcusd") is not None and feed.get("USDCUSD").seq == 7)
+        self.assertEqual(feed.get("USDCUSD").price, 0.997)
+        self.assertEqual(self.subscriptions[0]["params"], ["usdcusd@trade"])
+
+        stats = feed.stats()
+        self.assertEqual(stats["reconnects"], 1)
+        self.assertEqual(stats["missed"], 2)
+        self.assertEqual(stats["out_of_order"], 1)
+
+    def test_exchange_data_reads_from_feed(self):
+        exchange_fetcher.start_price_feed(self.url)
+        self.addCleanup(exchange_fetcher.stop_price_feed)
+        self._wait_for(lambda: exchange_fetcher.PRICE_FEED.get("USDCUSD") is not None)
+
+        with patch.object(exchange_fetcher.PRICE_AGGREGATOR, "aggregate") as aggregate:
+            data = exchange_fetcher.get_exchange_data()
+        aggregate.assert_not_called()
+        self.assertEqual(data["source"], "stream")
+        self.assertLess(data["age_s"], exchange_fetcher.FEED_MAX_AGE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,17 +2,18 @@ import os
 import pandas as pd
 import numpy as np
 from ai_engine.anomaly_detector import AnomalyEngine
-from ai_engine.feature_engineering import build_features
+from ai_engine.feature_engineering import build_features_batch
+from backend.config import Config
+from data_layer.snapshot_store import DEFAULT_ROOT, load_history
 
-DATA_PATH = "data/historical_snapshots.csv"
 MODEL_DIR = "models"
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 def load_training_data():
 
-    if os.path.exists(DATA_PATH):
-        print(f"Loading dataset from {DATA_PATH}")
-        df = pd.read_csv(DATA_PATH)
+    df = load_history()
+    if df is not None:
+        print(f"Loaded {len(df)} snapshots from {DEFAULT_ROOT}")
     else:
         print("No historical dataset found. Generating synthetic training data.")
         np.random.seed(42)
@@ -32,18 +33,14 @@ def load_training_data():
     return df
 
 def build_feature_matrix(df: pd.DataFrame):
-    rows = []
-
-    for i in range(len(df)):
-        snap = df.iloc[i].to_dict()
-        if "label" not in snap or pd.isna(snap["label"]):
-            snap["label"] = int(snap["supply"] > snap["reserves"] + 40)
-
-        prev = df.iloc[i - 1].to_dict() if i > 0 else None
-        feats = build_features(snap, prev)
-        feats["label"] = snap["label"]
-        rows.append(feats)
-    final_df = pd.concat(rows, ignore_index=True)
+    final_df = build_features_batch(df)
+
+    fallback = (df["supply"] > df["reserves"] + 40).astype(int)
+    if "label" in df.columns:
+        labels = df["label"].fillna(fallback)
+    else:
+        labels = fallback
+    final_df["label"] = labels.to_numpy()
     return final_df
 
 
@@ -54,6 +51,7 @@ def train_model(feature_df: pd.DataFrame):
     X = feature_df.drop(columns=["label"])
 
     engine = AnomalyEngine()
+    engine.store.keep = Config.MODEL_KEEP_VERSIONS
 
     if len(set(labels)) < 2:
         print("Only one label class detected. Training unsupervised IsolationForest only.")
@@ -71,13 +69,7 @@ def evaluate_model(engine: AnomalyEngine, feature_df: pd.DataFrame):
     labels = feature_df["label"].values
     X = feature_df.drop(columns=["label"])
 
-    preds = []
-    for i in range(len(X)):
-        snap = X.iloc[i].to_dict()
-        out = engine.analyze_snapshot(snap)
-        preds.append(out["label"])
-
-    preds = np.array(preds)
+    preds = engine.analyze_batch(X).label
     numeric_preds = (preds != "SAFE").astype(int)
 
     accuracy = (numeric_preds == labels).mean()
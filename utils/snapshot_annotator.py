@@ -1,14 +1,11 @@
 import json
-import os
 from ai_engine.anomaly_detector import ENGINE
+from data_layer.snapshot_segments import load_snapshot
 
 
 def annotate_snapshot(input_path: str, output_path: str):
-    if not os.path.exists(input_path):
-        raise FileNotFoundError(f"Snapshot not found: {input_path}")
-
-    with open(input_path, "r") as f:
-        snapshot = json.load(f)
+    # Compacted snapshots are read from the segment that holds them
+    snapshot = load_snapshot(input_path)
 
     result = ENGINE.analyze_snapshot(snapshot)
 